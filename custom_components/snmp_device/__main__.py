@@ -0,0 +1,191 @@
+"""
+Headless poller for SNMP devices.
+
+Polls devices from a YAML or JSON list with the same retrieval code as
+the sensor platform, concurrently across all devices, and reports
+latency and throughput statistics along with retrieved data.
+
+Usage: python -m custom_components.snmp_device devices.yaml [--rounds N]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple
+
+import voluptuous as vol
+from homeassistant.const import CONF_HOST, CONF_PORT, CONF_TYPE, CONF_TIMEOUT
+
+from .client import SNMPClient
+from .const import DOMAIN, SUPPORTED_DEVICE_TYPES, CONF_MAX_REQUESTS, CONF_RATE_LIMIT
+from .ratelimit import RateLimiter
+from .resolver import HostResolver
+from .rows import to_json
+from .schemas import CONFIG_SCHEMA
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DevicePoller:
+    """Polls a single device outside of Home Assistant, keeping latency samples."""
+
+    def __init__(self, config: Dict[str, Any], rate_limiter: RateLimiter, resolver: HostResolver):
+        self.config = config
+        self.host = config[CONF_HOST]
+        self.port = config[CONF_PORT]
+        self.rate_limiter = rate_limiter
+        self.resolver = resolver
+
+        self.client: Optional[SNMPClient] = None
+        self.sensor_class = None
+        self.latencies: List[float] = []
+        self.errors: List[str] = []
+        self.last_data: Optional[Dict[str, Any]] = None
+
+    def __repr__(self):
+        return '<%s %s:%s>' % (self.__class__.__name__, self.host, self.port)
+
+    async def async_setup(self) -> None:
+        from pysnmp.hlapi.asyncio import SnmpEngine, UdpTransportTarget
+        from . import sensor
+        from .usm import async_build_auth_data
+
+        engine = SnmpEngine()
+        address = await self.resolver.async_resolve(self.host)
+        transport_target = UdpTransportTarget((address, self.port), timeout=self.config[CONF_TIMEOUT], retries=0)
+        auth_data = await async_build_auth_data(engine, transport_target, self.config)
+        self.client = SNMPClient(
+            snmp_engine=engine,
+            auth_data=auth_data,
+            transport_target=transport_target,
+            max_requests=self.config[CONF_MAX_REQUESTS],
+            rate_limits=self.rate_limiter.buckets_for(transport_target.transportAddr, self.config[CONF_RATE_LIMIT]),
+        )
+        self.sensor_class = getattr(sensor, SUPPORTED_DEVICE_TYPES[self.config[CONF_TYPE]])
+
+    async def async_poll(self) -> None:
+        started_at = monotonic()
+        try:
+            self.last_data = await self.sensor_class.async_retrieve_data(self.client)
+        except Exception as e:
+            _LOGGER.debug('Polling %s failed', self, exc_info=True)
+            self.errors.append(str(e) or e.__class__.__name__)
+        else:
+            self.latencies.append(monotonic() - started_at)
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    return {
+        'min': min(samples),
+        'mean': sum(samples) / len(samples),
+        'p50': percentile(samples, 0.5),
+        'p95': percentile(samples, 0.95),
+        'max': max(samples),
+    }
+
+
+def load_devices(path: str) -> List[Dict[str, Any]]:
+    """Load and validate a device list, either bare or under the integration domain key."""
+    with open(path) as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+        else:
+            import yaml
+            data = yaml.safe_load(f)
+
+    if isinstance(data, dict) and DOMAIN in data:
+        data = data[DOMAIN]
+
+    return CONFIG_SCHEMA({DOMAIN: data})[DOMAIN]
+
+
+async def async_run(devices: List[Dict[str, Any]], rounds: int, interval: float) -> Tuple[List[DevicePoller], float]:
+    rate_limiter = RateLimiter()
+    resolver = HostResolver()
+    pollers = [DevicePoller(config, rate_limiter, resolver) for config in devices]
+
+    setup_results = await asyncio.gather(*(poller.async_setup() for poller in pollers), return_exceptions=True)
+    for poller, result in zip(list(pollers), setup_results):
+        if isinstance(result, Exception):
+            _LOGGER.error('Could not set up %s: %s', poller, result)
+            pollers.remove(poller)
+
+    started_at = monotonic()
+    for round_number in range(rounds):
+        if round_number and interval:
+            await asyncio.sleep(interval)
+        await asyncio.gather(*(poller.async_poll() for poller in pollers))
+
+    return pollers, monotonic() - started_at
+
+
+def report(pollers: List[DevicePoller], elapsed: float) -> Dict[str, Any]:
+    all_latencies = [latency for poller in pollers for latency in poller.latencies]
+    return {
+        'elapsed': elapsed,
+        'polls': len(all_latencies),
+        'errors': sum(len(poller.errors) for poller in pollers),
+        'requests': sum(poller.client.requests for poller in pollers),
+        'polls_per_second': len(all_latencies) / elapsed if elapsed else None,
+        'latency': latency_stats(all_latencies),
+        'devices': {
+            '%s:%s' % (poller.host, poller.port): {
+                'polls': len(poller.latencies),
+                'errors': poller.errors,
+                'requests': poller.client.requests,
+                'latency': latency_stats(poller.latencies),
+            }
+            for poller in pollers
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m custom_components.' + DOMAIN, description=__doc__.split('\n\n')[1])
+    parser.add_argument('devices', help='YAML or JSON file with a list of device configurations')
+    parser.add_argument('-n', '--rounds', type=int, default=1, help='number of polls per device')
+    parser.add_argument('-i', '--interval', type=float, default=0, help='seconds between poll rounds')
+    parser.add_argument('-o', '--output', help='write retrieved data as JSON to this file ("-" for stdout)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='enable debug logging')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    try:
+        devices = load_devices(args.devices)
+    except (OSError, ValueError, vol.Invalid) as e:
+        parser.error('Invalid device list: %s' % e)
+
+    loop = asyncio.get_event_loop()
+    pollers, elapsed = loop.run_until_complete(async_run(devices, args.rounds, args.interval))
+
+    stats = report(pollers, elapsed)
+    json.dump(stats, sys.stderr, indent=2)
+    sys.stderr.write('\n')
+
+    if args.output:
+        results = {
+            '%s:%s' % (poller.host, poller.port): to_json(poller.last_data)
+            for poller in pollers
+        }
+        if args.output == '-':
+            json.dump(results, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        else:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    return 1 if stats['errors'] or len(pollers) < len(devices) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""Asynchronous SNMP client bound to a single agent"""
+import asyncio
+import logging
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, List, NamedTuple, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+
+from .const import DEFAULT_MAX_REQUESTS, DEFAULT_PROBE_DEADLINE, DEFAULT_MAX_REPETITIONS
+from .discovery import OID_SYS_DESCR, OID_SYS_OBJECT_ID, OID_SYS_UPTIME
+from .ratelimit import TokenBucket, async_acquire
+
+if TYPE_CHECKING:
+    # noinspection PyProtectedMember
+    from pysnmp.hlapi.transport import AbstractTransportTarget
+    from pysnmp.hlapi import SnmpEngine, CommunityData, UsmUserData, ContextData
+
+_LOGGER = logging.getLogger(__name__)
+
+VarBind = Tuple[Any, Any]
+
+ERROR_STATUS_TOO_BIG = 1
+ERROR_STATUS_NO_SUCH_NAME = 2
+
+
+class SNMPError(Exception):
+    """Error indication or error status received from an SNMP agent."""
+
+    def __init__(self, message: str, error_status: int = 0, error_index: int = 0, error_indication: Any = None):
+        super().__init__(message)
+        self.error_status = error_status
+        self.error_index = error_index
+        self.error_indication = error_indication
+
+
+class SNMPClient:
+    """
+    Issues SNMP requests to a single agent on the event loop.
+
+    Requests may be issued concurrently; the number of PDUs awaiting a
+    response at any time is capped by `max_requests`, so that fragile
+    embedded agents are not flooded. Every request additionally takes a
+    token from each of `rate_limits` before it is sent.
+
+    Requests for more variables than the agent accepts in one PDU are split;
+    the learned limit is reported through `max_var_binds_learned`, and the
+    learned GETBULK repetition count through `max_repetitions_learned`.
+
+    Tables of SNMPv2c/v3 agents are walked with GETBULK requests for up to
+    `max_repetitions` rows at once.
+    """
+
+    def __init__(self, snmp_engine: 'SnmpEngine', auth_data: Union['CommunityData', 'UsmUserData'],
+                 transport_target: 'AbstractTransportTarget', max_requests: int = DEFAULT_MAX_REQUESTS,
+                 context_data: Optional['ContextData'] = None, rate_limits: Sequence[TokenBucket] = (),
+                 max_var_binds: Optional[int] = None,
+                 max_var_binds_learned: Optional[Callable[[int], None]] = None,
+                 max_repetitions: Optional[int] = DEFAULT_MAX_REPETITIONS,
+                 max_repetitions_learned: Optional[Callable[[int], None]] = None):
+        if context_data is None:
+            from pysnmp.hlapi import ContextData
+            context_data = ContextData()
+
+        self.snmp_engine = snmp_engine
+        self.auth_data = auth_data
+        self.transport_target = transport_target
+        self.context_data = context_data
+        self.max_requests = max_requests
+        self.rate_limits = tuple(rate_limits)
+        self.max_var_binds = max_var_binds
+        self.max_var_binds_learned = max_var_binds_learned
+        self.max_repetitions = max_repetitions
+        self.max_repetitions_learned = max_repetitions_learned
+        self.requests = 0
+
+        self._semaphore = asyncio.Semaphore(max_requests)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, getattr(self.transport_target, 'transportAddr', None))
+
+    def retarget(self, transport_target: 'AbstractTransportTarget',
+                 rate_limits: Optional[Sequence[TokenBucket]] = None) -> None:
+        """Direct subsequent requests to another address of the same agent."""
+        self.transport_target = transport_target
+        if rate_limits is not None:
+            self.rate_limits = tuple(rate_limits)
+
+    @staticmethod
+    def _check_response(var_binds: Sequence[Any], error_indication, error_status, error_index) -> None:
+        if error_indication:
+            raise SNMPError(str(error_indication), error_indication=error_indication)
+        elif error_status:
+            raise SNMPError('%s at %s' % (
+                error_status.prettyPrint(),
+                error_index and var_binds[int(error_index) - 1][0] or '?'
+            ), int(error_status), int(error_index))
+
+    async def _async_send(self, command: Any, oids: Sequence[Any], *args: Any) -> List[Any]:
+        """Send a single request PDU and return the var binds (or var bind table) of its response."""
+        from pysnmp.hlapi import ObjectType, ObjectIdentity
+
+        var_binds = [ObjectType(ObjectIdentity(oid)) for oid in oids]
+
+        async with self._semaphore:
+            await async_acquire(self.rate_limits)
+            self.requests += 1
+            error_indication, error_status, error_index, var_bind_table = await command(
+                self.snmp_engine, self.auth_data, self.transport_target, self.context_data,
+                *args, *var_binds, lookupMib=False
+            )
+
+        self._check_response(var_binds, error_indication, error_status, error_index)
+        return var_bind_table
+
+    async def _async_request(self, command: Any, oids: Sequence[Any]) -> List[VarBind]:
+        var_bind_table = await self._async_send(command, oids)
+        if var_bind_table and isinstance(var_bind_table[0], list):
+            # GETNEXT responses come as a table of a single row
+            var_bind_table = var_bind_table[0]
+        return [tuple(var_bind) for var_bind in var_bind_table]
+
+    def _learn_max_var_binds(self, max_var_binds: int) -> None:
+        if self.max_var_binds is None or max_var_binds < self.max_var_binds:
+            _LOGGER.debug('Limiting requests to %s to %d variables', self, max_var_binds)
+            self.max_var_binds = max_var_binds
+            if self.max_var_binds_learned is not None:
+                self.max_var_binds_learned(max_var_binds)
+
+    def _learn_max_repetitions(self, max_repetitions: int) -> None:
+        if self.max_repetitions is None or max_repetitions < self.max_repetitions:
+            _LOGGER.debug('Limiting bulk requests to %s to %d repetitions', self, max_repetitions)
+            self.max_repetitions = max_repetitions
+            if self.max_repetitions_learned is not None:
+                self.max_repetitions_learned(max_repetitions)
+
+    async def _async_request_packed(self, command: Any, oids: Sequence[Any]) -> List[VarBind]:
+        """
+        Send as few request PDUs as the agent accepts.
+
+        Requests are split by the learned maximum number of variables; on a
+        tooBig error or a truncated response the maximum is lowered and the
+        request is retried in smaller parts.
+        """
+        max_var_binds = self.max_var_binds
+        if max_var_binds is not None and len(oids) > max_var_binds:
+            parts = await asyncio.gather(*(
+                self._async_request_packed(command, oids[start:start + max_var_binds])
+                for start in range(0, len(oids), max_var_binds)
+            ))
+            return [var_bind for part in parts for var_bind in part]
+
+        try:
+            var_binds = await self._async_request(command, oids)
+        except SNMPError as e:
+            if e.error_status != ERROR_STATUS_TOO_BIG or len(oids) == 1:
+                raise
+            self._learn_max_var_binds(max(1, len(oids) // 2))
+        else:
+            if len(var_binds) == len(oids):
+                return var_binds
+            if len(oids) == 1:
+                raise SNMPError('Truncated response from %s' % self, ERROR_STATUS_TOO_BIG)
+            self._learn_max_var_binds(max(1, min(len(var_binds), len(oids) // 2)))
+
+        return await self._async_request_packed(command, oids)
+
+    async def async_get(self, oids: Sequence[str]) -> List[Any]:
+        """Retrieve values of the given OIDs, in a single GET request if the agent accepts it."""
+        from pysnmp.hlapi.asyncio import getCmd
+
+        return [val_obj for oid_obj, val_obj in await self._async_request_packed(getCmd, list(oids))]
+
+    async def async_next(self, oids: Sequence[Any]) -> List[VarBind]:
+        """Retrieve the successors of the given OIDs, in a single GETNEXT request if the agent accepts it."""
+        from pysnmp.hlapi.asyncio import nextCmd
+
+        return await self._async_request_packed(nextCmd, list(oids))
+
+    async def async_bulk(self, oids: Sequence[Any], max_repetitions: int) -> List[List[VarBind]]:
+        """Retrieve up to `max_repetitions` successors of each of the given OIDs in a single GETBULK request."""
+        from pysnmp.hlapi.asyncio import bulkCmd
+
+        var_bind_table = await self._async_send(bulkCmd, list(oids), 0, max_repetitions)
+        return [[tuple(var_bind) for var_bind in var_binds] for var_binds in var_bind_table]
+
+    async def async_walk(self, oids: Sequence[str], start_names: Optional[Sequence[Any]] = None,
+                         max_rows: Optional[int] = None) -> AsyncIterator[List[VarBind]]:
+        """
+        Walk table columns, yielding a row at a time.
+
+        SNMPv1 agents are walked with GETNEXT requests, others with GETBULK
+        requests for as many rows as `max_repetitions` allows, or `max_rows`
+        when fewer are going to be consumed. Repetitions are halved and
+        reported as learned when the agent reports a response would be too
+        big.
+
+        Columns which left their subtree are replaced with `endOfMibView`;
+        the walk ends once all of them did. A walk stopped early may be
+        resumed by passing names of its last row as `start_names`.
+        """
+        from pyasn1.type.univ import Null
+        from pysnmp.proto.rfc1902 import ObjectName
+        from pysnmp.proto.rfc1905 import endOfMibView
+
+        initial_names = [ObjectName(oid) for oid in oids]
+        current_names = list(start_names) if start_names else list(initial_names)
+        use_bulk = bool(self.max_repetitions) and self.auth_data.mpModel > 0
+        rows_left = max_rows
+
+        while True:
+            try:
+                if use_bulk:
+                    max_repetitions = self.max_repetitions
+                    if rows_left is not None:
+                        max_repetitions = max(1, min(max_repetitions, rows_left))
+                    var_bind_table = await self.async_bulk(current_names, max_repetitions)
+                else:
+                    var_bind_table = [await self.async_next(current_names)]
+            except SNMPError as e:
+                if e.error_status == ERROR_STATUS_NO_SUCH_NAME:
+                    # noSuchName ends a walk with SNMPv1 agents
+                    return
+                if use_bulk and e.error_status == ERROR_STATUS_TOO_BIG:
+                    if max_repetitions > 1:
+                        # Remembered for the agent, so later walks start with requests it accepts
+                        self._learn_max_repetitions(max_repetitions // 2)
+                    else:
+                        use_bulk = False
+                    continue
+                raise
+
+            if not var_bind_table:
+                return
+
+            for var_binds in var_bind_table:
+                stop = True
+                row = []
+                for column, (name, val) in enumerate(var_binds):
+                    if isinstance(val, Null) or not initial_names[column].isPrefixOf(name):
+                        name, val = current_names[column], endOfMibView
+                    else:
+                        stop = False
+                    row.append((name, val))
+
+                if stop:
+                    return
+
+                current_names = [name for name, val in row]
+                if rows_left is not None:
+                    rows_left -= 1
+                yield row
+
+
+class ProbeStatus(Enum):
+    REACHABLE = 'reachable'
+    # Also reported for rejected SNMPv3 credentials
+    WRONG_COMMUNITY = 'wrong_community'
+    TIMEOUT = 'timeout'
+
+
+class ProbeResult(NamedTuple):
+    status: ProbeStatus
+    sys_descr: Optional[str] = None
+    sys_object_id: Optional[str] = None
+    sys_uptime: Optional[int] = None
+
+
+def _is_auth_failure(error_indication: Any) -> bool:
+    from pysnmp.proto import errind
+    return isinstance(error_indication, (
+        errind.UnknownUserName,
+        errind.UnknownSecurityName,
+        errind.WrongDigest,
+        errind.DecryptionError,
+        errind.UnsupportedSecurityLevel,
+    ))
+
+
+async def _async_probe(client: SNMPClient) -> ProbeResult:
+    from pyasn1.type.univ import Null
+    from pysnmp.proto import errind
+    from .usm import async_discover_engine_id
+
+    try:
+        values = await client.async_get((OID_SYS_DESCR, OID_SYS_OBJECT_ID, OID_SYS_UPTIME))
+
+    except SNMPError as e:
+        if e.error_status:
+            # Any response proves the agent accepted the credentials
+            return ProbeResult(ProbeStatus.REACHABLE)
+        if _is_auth_failure(e.error_indication):
+            return ProbeResult(ProbeStatus.WRONG_COMMUNITY)
+        if not isinstance(e.error_indication, errind.RequestTimedOut):
+            raise
+
+        # Agents silently drop requests with a wrong community. An
+        # unauthenticated SNMPv3 discovery tells those apart from agents
+        # which are not there at all, as long as they speak SNMPv3.
+        if client.auth_data.mpModel < 3:
+            if await async_discover_engine_id(client.snmp_engine, client.transport_target, client.rate_limits):
+                return ProbeResult(ProbeStatus.WRONG_COMMUNITY)
+        return ProbeResult(ProbeStatus.TIMEOUT)
+
+    sys_descr, sys_object_id, sys_uptime = (
+        None if isinstance(value, Null) else value
+        for value in values
+    )
+    return ProbeResult(
+        ProbeStatus.REACHABLE,
+        sys_descr=None if sys_descr is None else sys_descr.prettyPrint(),
+        sys_object_id=None if sys_object_id is None else sys_object_id.prettyPrint(),
+        sys_uptime=None if sys_uptime is None else int(sys_uptime),
+    )
+
+
+async def async_probe(client: SNMPClient, deadline: float = DEFAULT_PROBE_DEADLINE) -> ProbeResult:
+    """
+    Check whether an agent answers with a single GET of sysDescr, sysObjectID
+    and sysUpTime, giving up after `deadline` seconds.
+    """
+    try:
+        return await asyncio.wait_for(_async_probe(client), deadline)
+    except asyncio.TimeoutError:
+        return ProbeResult(ProbeStatus.TIMEOUT)
@@ -1,222 +1,332 @@
-"""Config flow for the SNMP Printer component."""
-import logging
-from collections import OrderedDict
-from typing import Optional, TYPE_CHECKING, Type
-
-import voluptuous as vol
-from homeassistant import config_entries
-from homeassistant.const import CONF_PORT, CONF_HOST, \
-    CONF_TIMEOUT, CONF_SCAN_INTERVAL, CONF_NAME, CONF_TYPE
-from homeassistant.helpers import ConfigType
-
-from .const import DOMAIN, DEFAULT_VERSION, SNMP_VERSIONS, CONF_COMMUNITY, CONF_VERSION, DEFAULT_COMMUNITY, \
-    DEFAULT_PORT, DEFAULT_TIMEOUT, DEFAULT_SCAN_INTERVAL, DEVICE_TYPE_PRINTER, DEVICE_TYPE_COMPUTER, \
-    SUPPORTED_DEVICE_TYPES, DATA_DEVICE_CONFIGS
-
-CONF_POLLING = "polling"
-
-_LOGGER = logging.getLogger(__name__)
-
-SKIP_DISCOVERY = "skip_discovery"
-
-@config_entries.HANDLERS.register(DOMAIN)
-class SNMPPrinterFlowHandler(config_entries.ConfigFlow):
-    """Config flow for SNMP Printers."""
-
-    VERSION = 1
-    CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
-
-    type_matchers = {
-        DEVICE_TYPE_COMPUTER: (False, [
-            'linux',
-            'windows',
-        ]),
-        DEVICE_TYPE_PRINTER: (True, [
-            'print',
-        ]),
-    }
-
-    def __init__(self):
-        """Initialize."""
-        self._initial_config = None
-        self._discovered_devices = None
-        self._device_type_options = {
-            device_type: device_type.capitalize()
-            for device_type in SUPPORTED_DEVICE_TYPES
-        }
-
-    @classmethod
-    def _determine_device_from_sys_description(cls, description: str) -> Optional[str]:
-        lower_description = description.lower()
-        for device_type, (rich_name, matchers) in cls.type_matchers.items():
-            if any(x in lower_description for x in matchers):
-                return device_type
-
-        return None
-
-    async def async_step_user(self, user_input=None, skip_discovery=False):
-        """Handle a flow initialized by the user."""
-        if not user_input:
-            return self.async_show_form(
-                step_id="user",
-                data_schema=vol.Schema({
-                    vol.Required(CONF_COMMUNITY, default=DEFAULT_COMMUNITY): str,
-                    vol.Required(CONF_VERSION, default=DEFAULT_VERSION): vol.In(SNMP_VERSIONS),
-                    vol.Required(CONF_PORT, default=DEFAULT_PORT): int,
-                    vol.Optional(SKIP_DISCOVERY, default=False): bool,
-                }),
-            )
-
-        self._initial_config = {
-            CONF_COMMUNITY: user_input.get(CONF_COMMUNITY),
-            CONF_VERSION: user_input.get(CONF_VERSION),
-            CONF_PORT: user_input.get(CONF_PORT)
-        }
-
-        if not user_input.get(SKIP_DISCOVERY):
-            return await self.async_step_discovered_select()
-
-        return await self.async_step_device()
-
-    async def async_step_discovered_select(self, user_input=None):
-        i_c = self._initial_config
-        if user_input is None:
-            from . import discover_devices
-            all_devices = discover_devices(
-                protocol_version=SNMP_VERSIONS[i_c[CONF_VERSION]],
-                community=i_c[CONF_COMMUNITY],
-                port=i_c[CONF_PORT],
-            )
-
-            if all_devices:
-                self._discovered_devices = all_devices
-
-                configured_num = 0
-
-                configured_devices = self.hass.data.get(DATA_DEVICE_CONFIGS)
-                discovered_choices = dict()
-                for (host, port), description in all_devices.items():
-                    if self._check_entity_exists(host, port):
-                        configured_num += 1
-                        continue
-
-                    device_type = self._determine_device_from_sys_description(description)
-                    if not device_type or self.type_matchers[device_type][0] is True:
-                        discovered_choices[host] = description + ' (' + str(host) + ')'
-                    else:
-                        discovered_choices[host] = device_type.capitalize() + ' (' + str(host) + ')'
-
-                if discovered_choices:
-                    return self.async_show_form(
-                        step_id="discovered_select",
-                        data_schema=vol.Schema({
-                            vol.Optional(CONF_HOST): vol.In(discovered_choices),
-                        }),
-                        description_placeholders={
-                            "discovered_num": len(self._discovered_devices),
-                            "configured_num": configured_num,
-                        }
-                    )
-        else:
-            host = user_input.get(CONF_HOST)
-            if host:
-                sys_description = self._discovered_devices[(host, i_c[CONF_PORT])]
-                device_type = self._determine_device_from_sys_description(sys_description)
-                i_c[CONF_HOST] = host
-                i_c[CONF_TYPE] = device_type
-                i_c[CONF_NAME] = (
-                    sys_description
-                    if (not device_type or self.type_matchers[device_type][0] is True) else
-                    device_type.capitalize()
-                )
-
-        return await self.async_step_device()
-
-    async def async_step_device(self, user_input=None):
-        i_c = self._initial_config
-        if not user_input:
-            schema = OrderedDict()
-            schema[vol.Required(CONF_TYPE, default=i_c.get(CONF_TYPE))] = vol.In(self._device_type_options)
-            schema[vol.Optional(CONF_NAME, default=i_c.get(CONF_NAME))] = str
-            schema[vol.Required(CONF_HOST, default=i_c.get(CONF_HOST))] = str
-            schema[vol.Required(CONF_TIMEOUT, default=DEFAULT_TIMEOUT)] = int
-            schema[vol.Required(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL.seconds)] = int
-
-            return self.async_show_form(
-                step_id="device",
-                data_schema=vol.Schema(schema)
-            )
-
-        if self._check_entity_exists(user_input[CONF_HOST], i_c[CONF_PORT]):
-            return self.async_abort(reason='already_configured')
-
-        from pysnmp.hlapi import SnmpEngine, UdpTransportTarget, ContextData, CommunityData
-        from importlib import import_module
-        if TYPE_CHECKING:
-            from .sensor import _SNMPSensor
-
-        host = user_input[CONF_HOST]
-        port = self._initial_config[CONF_PORT]
-        device_type = user_input[CONF_TYPE]
-
-        module_object = import_module('.sensor', package='.'.join(__name__.split('.')[:-1]))
-        target_class: Type['_SNMPSensor'] = getattr(module_object, SUPPORTED_DEVICE_TYPES[device_type])
-
-        snmp_engine = SnmpEngine()
-        community_data = CommunityData(
-            self._initial_config[CONF_COMMUNITY],
-            mpModel=SNMP_VERSIONS[self._initial_config[CONF_VERSION]]
-        )
-        transport_target = UdpTransportTarget((host, port))
-
-        try:
-
-            retrieved_data = target_class.retrieve_data(snmp_engine, community_data, transport_target)
-            _LOGGER.debug('Retrieved data during configuration: %s', retrieved_data)
-
-            i_c.update({
-                CONF_NAME: user_input.get(CONF_NAME) or device_type.capitalize(),
-                CONF_TYPE: device_type,
-                CONF_HOST: host,
-                CONF_TIMEOUT: user_input[CONF_TIMEOUT],
-                CONF_SCAN_INTERVAL: user_input[CONF_SCAN_INTERVAL]
-            })
-
-            _LOGGER.debug('Final initial config %s' % i_c)
-
-        except Exception as e:
-            _LOGGER.exception('Error while connecting to device')
-            return self.async_abort(reason='connection_failed')
-
-        return self._async_final_create_entry(
-            title=i_c[CONF_NAME],
-            data=i_c,
-        )
-
-    def _check_entity_exists(self, host, port):
-        for entry in self.hass.config_entries.async_entries(DOMAIN):
-            if entry.data[CONF_HOST] == host and entry.data[CONF_PORT] == port:
-                return True
-        return False
-
-    def _async_final_create_entry(self, title, data):
-        """Return a set of the configured hosts."""
-        _LOGGER.debug('afce %s %s', title, data)
-        if self._check_entity_exists(data[CONF_HOST], data[CONF_PORT]):
-            return self.async_abort(reason='already_configured')
-        
-        return self.async_create_entry(
-            title=title,
-            data=data
-        )
-
-    async def async_step_import(self, config: ConfigType):
-        """Import a config entry from configuration.yaml."""
-        _LOGGER.debug('Import entry: %s' % config)
-        return self._async_final_create_entry(
-            title=(config.get(CONF_NAME) or config[CONF_HOST]) + ' (yaml)',
-            data={
-                CONF_HOST: config[CONF_HOST],
-                CONF_PORT: config[CONF_PORT],
-            }
-        )
\ No newline at end of file
+"""Config flow for the SNMP Printer component."""
+import logging
+from collections import OrderedDict
+from time import monotonic
+
+import voluptuous as vol
+from homeassistant import config_entries
+from homeassistant.const import CONF_PORT, CONF_HOST, \
+    CONF_TIMEOUT, CONF_SCAN_INTERVAL, CONF_NAME, CONF_TYPE, CONF_USERNAME
+from homeassistant.core import callback
+from homeassistant.helpers import ConfigType
+
+from .const import DOMAIN, DEFAULT_VERSION, SNMP_VERSIONS, CONF_COMMUNITY, CONF_VERSION, DEFAULT_COMMUNITY, \
+    DEFAULT_PORT, DEFAULT_TIMEOUT, DEFAULT_SCAN_INTERVAL, DEVICE_TYPE_PRINTER, DEVICE_TYPE_COMPUTER, \
+    SUPPORTED_DEVICE_TYPES, DATA_DEVICE_CONFIGS, DEVICE_SNMP_VERSIONS, SNMP_VERSION_3, CONF_AUTH_KEY, \
+    CONF_AUTH_PROTOCOL, CONF_PRIV_KEY, CONF_PRIV_PROTOCOL, SNMP_AUTH_PROTOCOLS, SNMP_PRIV_PROTOCOLS, \
+    DEFAULT_AUTH_PROTOCOL, DEFAULT_PRIV_PROTOCOL, DEFAULT_BROADCAST_ADDRESS, CONF_DISCOVERY_COMMUNITIES, \
+    DATA_DISCOVERY_CACHE, DEFAULT_DISCOVERY_CACHE_TTL
+from .discovery import DESCRIPTION_MATCHERS, discovery_credentials
+from .ratelimit import RateLimitExceeded, async_acquire, get_rate_limiter
+from .resolver import HostResolutionError, get_host_resolver
+from .schemas import validate_usm_config
+
+CONF_POLLING = "polling"
+
+_LOGGER = logging.getLogger(__name__)
+
+SKIP_DISCOVERY = "skip_discovery"
+
+@config_entries.HANDLERS.register(DOMAIN)
+class SNMPPrinterFlowHandler(config_entries.ConfigFlow):
+    """Config flow for SNMP Printers."""
+
+    VERSION = 1
+    CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
+
+    type_matchers = {
+        DEVICE_TYPE_COMPUTER: (False, DESCRIPTION_MATCHERS[DEVICE_TYPE_COMPUTER]),
+        DEVICE_TYPE_PRINTER: (True, DESCRIPTION_MATCHERS[DEVICE_TYPE_PRINTER]),
+    }
+
+    def __init__(self):
+        """Initialize."""
+        self._initial_config = None
+        self._discovery_communities = None
+        self._discovered_devices = None
+        self._device_type_options = {
+            device_type: device_type.capitalize()
+            for device_type in SUPPORTED_DEVICE_TYPES
+        }
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return SNMPDeviceOptionsFlowHandler(config_entry)
+
+    @classmethod
+    def _discovered_device_name(cls, device) -> str:
+        device_type = device.device_type
+        if not device_type or cls.type_matchers[device_type][0] is True:
+            return device.sys_descr or device.sys_name or ''
+        return device_type.capitalize()
+
+    async def async_step_user(self, user_input=None, skip_discovery=False):
+        """Handle a flow initialized by the user."""
+        if not user_input:
+            return self.async_show_form(
+                step_id="user",
+                data_schema=vol.Schema({
+                    vol.Required(CONF_COMMUNITY, default=DEFAULT_COMMUNITY): str,
+                    vol.Required(CONF_VERSION, default=DEFAULT_VERSION): vol.In(DEVICE_SNMP_VERSIONS),
+                    vol.Required(CONF_PORT, default=DEFAULT_PORT): int,
+                    vol.Optional(SKIP_DISCOVERY, default=False): bool,
+                    vol.Optional(CONF_DISCOVERY_COMMUNITIES, default=''): str,
+                }),
+            )
+
+        self._initial_config = {
+            CONF_COMMUNITY: user_input.get(CONF_COMMUNITY),
+            CONF_VERSION: user_input.get(CONF_VERSION),
+            CONF_PORT: user_input.get(CONF_PORT)
+        }
+        self._discovery_communities = [self._initial_config[CONF_COMMUNITY]] + [
+            community.strip()
+            for community in user_input.get(CONF_DISCOVERY_COMMUNITIES, '').split(',')
+            if community.strip()
+        ]
+
+        if self._initial_config[CONF_VERSION] == SNMP_VERSION_3:
+            # Broadcast discovery is not available for SNMPv3
+            return await self.async_step_usm()
+
+        if not user_input.get(SKIP_DISCOVERY):
+            return await self.async_step_discovered_select()
+
+        return await self.async_step_device()
+
+    async def async_step_usm(self, user_input=None):
+        """Configure SNMPv3 user-based security model credentials."""
+        errors = {}
+        if user_input:
+            usm_config = {
+                CONF_VERSION: SNMP_VERSION_3,
+                CONF_USERNAME: user_input.get(CONF_USERNAME),
+                CONF_AUTH_PROTOCOL: user_input.get(CONF_AUTH_PROTOCOL, DEFAULT_AUTH_PROTOCOL),
+                CONF_AUTH_KEY: user_input.get(CONF_AUTH_KEY) or None,
+                CONF_PRIV_PROTOCOL: user_input.get(CONF_PRIV_PROTOCOL, DEFAULT_PRIV_PROTOCOL),
+                CONF_PRIV_KEY: user_input.get(CONF_PRIV_KEY) or None,
+            }
+            try:
+                validate_usm_config(usm_config)
+            except vol.Invalid as e:
+                errors[str(e.path[0]) if e.path else 'base'] = 'invalid_usm_config'
+            else:
+                self._initial_config.update(usm_config)
+                return await self.async_step_device()
+
+        return self.async_show_form(
+            step_id="usm",
+            data_schema=vol.Schema({
+                vol.Required(CONF_USERNAME): str,
+                vol.Required(CONF_AUTH_PROTOCOL, default=DEFAULT_AUTH_PROTOCOL): vol.In(SNMP_AUTH_PROTOCOLS),
+                vol.Optional(CONF_AUTH_KEY): str,
+                vol.Required(CONF_PRIV_PROTOCOL, default=DEFAULT_PRIV_PROTOCOL): vol.In(SNMP_PRIV_PROTOCOLS),
+                vol.Optional(CONF_PRIV_KEY): str,
+            }),
+            errors=errors,
+        )
+
+    async def async_step_discovered_select(self, user_input=None):
+        i_c = self._initial_config
+        if user_input is None:
+            from .discovery import discover_devices
+
+            # Every community is tried with every version; agents report
+            # back the most preferred combination they respond to
+            credentials = discovery_credentials(self._discovery_communities, SNMP_VERSIONS)
+
+            # Flows restarted shortly after a broadcast with the same credentials reuse what it found
+            discovery_cache = self.hass.data.setdefault(DATA_DISCOVERY_CACHE, {})
+            cache_key = (i_c[CONF_PORT], tuple(credentials))
+            cached = discovery_cache.get(cache_key)
+            if cached is not None and monotonic() - cached[0] < DEFAULT_DISCOVERY_CACHE_TTL:
+                _LOGGER.debug('Using devices discovered %d seconds ago', monotonic() - cached[0])
+                all_devices = cached[1]
+            else:
+                buckets = get_rate_limiter(self.hass).buckets_for((DEFAULT_BROADCAST_ADDRESS, i_c[CONF_PORT]))
+                try:
+                    for _ in credentials:
+                        await async_acquire(buckets)
+                except RateLimitExceeded:
+                    _LOGGER.warning('Discovery throttled, skipping broadcast')
+                    return await self.async_step_device()
+
+                all_devices = await self.hass.async_add_executor_job(
+                    discover_devices, credentials, i_c[CONF_PORT]
+                )
+                if all_devices:
+                    discovery_cache[cache_key] = (monotonic(), all_devices)
+
+            if all_devices:
+                self._discovered_devices = all_devices
+
+                configured_num = 0
+
+                configured_devices = self.hass.data.get(DATA_DEVICE_CONFIGS)
+                discovered_choices = dict()
+                for (host, port), device in all_devices.items():
+                    if self._check_entity_exists(host, port):
+                        configured_num += 1
+                        continue
+
+                    discovered_choices[host] = self._discovered_device_name(device) + ' (' + str(host) + ')'
+
+                if discovered_choices:
+                    return self.async_show_form(
+                        step_id="discovered_select",
+                        data_schema=vol.Schema({
+                            vol.Optional(CONF_HOST): vol.In(discovered_choices),
+                        }),
+                        description_placeholders={
+                            "discovered_num": len(self._discovered_devices),
+                            "configured_num": configured_num,
+                        }
+                    )
+        else:
+            host = user_input.get(CONF_HOST)
+            if host:
+                device = self._discovered_devices[(host, i_c[CONF_PORT])]
+                i_c[CONF_HOST] = host
+                i_c[CONF_VERSION] = device.version
+                i_c[CONF_COMMUNITY] = device.community
+                i_c[CONF_TYPE] = device.device_type
+                i_c[CONF_NAME] = self._discovered_device_name(device)
+
+        return await self.async_step_device()
+
+    def _show_device_form(self, defaults, errors=None):
+        schema = OrderedDict()
+        schema[vol.Required(CONF_TYPE, default=defaults.get(CONF_TYPE))] = vol.In(self._device_type_options)
+        schema[vol.Optional(CONF_NAME, default=defaults.get(CONF_NAME))] = str
+        schema[vol.Required(CONF_HOST, default=defaults.get(CONF_HOST))] = str
+        schema[vol.Required(CONF_TIMEOUT, default=defaults.get(CONF_TIMEOUT, DEFAULT_TIMEOUT))] = int
+        schema[vol.Required(
+            CONF_SCAN_INTERVAL,
+            default=defaults.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL.seconds)
+        )] = int
+
+        return self.async_show_form(
+            step_id="device",
+            data_schema=vol.Schema(schema),
+            errors=errors or {},
+        )
+
+    async def async_step_device(self, user_input=None):
+        i_c = self._initial_config
+        if not user_input:
+            return self._show_device_form(i_c)
+
+        if self._check_entity_exists(user_input[CONF_HOST], i_c[CONF_PORT]):
+            return self.async_abort(reason='already_configured')
+
+        from pysnmp.hlapi.asyncio import SnmpEngine, UdpTransportTarget
+        from .client import SNMPClient, ProbeStatus, async_probe
+        from .usm import async_get_usm_key_cache, async_build_auth_data
+
+        host = user_input[CONF_HOST]
+        port = self._initial_config[CONF_PORT]
+        device_type = user_input[CONF_TYPE]
+
+        key_cache = await async_get_usm_key_cache(self.hass)
+
+        try:
+            address = await get_host_resolver(self.hass).async_resolve(host)
+        except HostResolutionError as e:
+            _LOGGER.warning('%s', e)
+            return self._show_device_form(user_input, errors={CONF_HOST: 'unknown_host'})
+
+        # Only reachability is validated here; the device profile is
+        # walked in the background once the entry is set up.
+        try:
+            snmp_engine = SnmpEngine()
+            transport_target = UdpTransportTarget((address, port), timeout=user_input[CONF_TIMEOUT], retries=0)
+            rate_limits = get_rate_limiter(self.hass).buckets_for(transport_target.transportAddr)
+            auth_data = await async_build_auth_data(snmp_engine, transport_target,
+                                                    {**i_c, CONF_HOST: host}, key_cache, rate_limits)
+            client = SNMPClient(snmp_engine, auth_data, transport_target, rate_limits=rate_limits)
+            probe_result = await async_probe(client)
+
+        except Exception:
+            _LOGGER.exception('Error while connecting to device')
+            return self.async_abort(reason='connection_failed')
+
+        _LOGGER.debug('Probe result during configuration: %s', probe_result)
+        if probe_result.status != ProbeStatus.REACHABLE:
+            if i_c[CONF_VERSION] == SNMP_VERSION_3:
+                key_cache.forget_engine_id(host, port)
+            return self._show_device_form(user_input, errors={'base': probe_result.status.value})
+
+        i_c.update({
+            CONF_NAME: user_input.get(CONF_NAME) or device_type.capitalize(),
+            CONF_TYPE: device_type,
+            CONF_HOST: host,
+            CONF_TIMEOUT: user_input[CONF_TIMEOUT],
+            CONF_SCAN_INTERVAL: user_input[CONF_SCAN_INTERVAL]
+        })
+
+        _LOGGER.debug('Final initial config %s' % i_c)
+
+        return self._async_final_create_entry(
+            title=i_c[CONF_NAME],
+            data=i_c,
+        )
+
+    def _check_entity_exists(self, host, port):
+        for entry in self.hass.config_entries.async_entries(DOMAIN):
+            if entry.data[CONF_HOST] == host and entry.data[CONF_PORT] == port:
+                return True
+        return False
+
+    def _async_final_create_entry(self, title, data):
+        """Return a set of the configured hosts."""
+        _LOGGER.debug('afce %s %s', title, data)
+        if self._check_entity_exists(data[CONF_HOST], data[CONF_PORT]):
+            return self.async_abort(reason='already_configured')
+        
+        return self.async_create_entry(
+            title=title,
+            data=data
+        )
+
+    async def async_step_import(self, config: ConfigType):
+        """Import a config entry from configuration.yaml."""
+        _LOGGER.debug('Import entry: %s' % config)
+        return self._async_final_create_entry(
+            title=(config.get(CONF_NAME) or config[CONF_HOST]) + ' (yaml)',
+            data={
+                CONF_HOST: config[CONF_HOST],
+                CONF_PORT: config[CONF_PORT],
+            }
+        )
+
+
+class SNMPDeviceOptionsFlowHandler(config_entries.OptionsFlow):
+    """Options flow for SNMP devices, applied to the running poller in place."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry):
+        """Initialize."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage polling and connection options."""
+        if user_input is not None:
+            return self.async_create_entry(title='', data=user_input)
+
+        host, port = self.config_entry.data[CONF_HOST], self.config_entry.data[CONF_PORT]
+        current = self.hass.data.get(DATA_DEVICE_CONFIGS, {}).get((host, port)) or self.config_entry.data
+
+        schema = OrderedDict()
+        schema[vol.Required(
+            CONF_SCAN_INTERVAL,
+            default=current.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL.seconds)
+        )] = vol.All(int, vol.Range(min=1))
+        schema[vol.Required(CONF_TIMEOUT, default=current.get(CONF_TIMEOUT, DEFAULT_TIMEOUT))] = \
+            vol.All(int, vol.Range(min=1))
+        if current.get(CONF_VERSION, DEFAULT_VERSION) != SNMP_VERSION_3:
+            schema[vol.Required(CONF_COMMUNITY, default=current.get(CONF_COMMUNITY, DEFAULT_COMMUNITY))] = str
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(schema),
+        )
@@ -8,9 +8,30 @@ __all__ = [
     "SUPPORTED_DEVICE_TYPES",
     "DEVICE_TYPE_COMPUTER",
     "DEVICE_TYPE_PRINTER",
-    "DATA_DEVICE_ENTITIES",
+    "SENSOR_TYPES",
+    "SENSOR_TYPE_STATUS",
+    "SENSOR_TYPE_MILEAGE",
+    "SENSOR_TYPE_TONER",
+    "SENSOR_TYPE_PAPER_INPUT",
+    "SENSOR_TYPE_CPU_LOAD",
+    "SENSOR_TYPE_PROCESSES",
+    "SENSOR_TYPE_STORAGE",
 
     "SNMP_VERSIONS",
+    "SNMP_VERSION_3",
+    "DEVICE_SNMP_VERSIONS",
+    "SNMP_AUTH_PROTOCOLS",
+    "SNMP_PRIV_PROTOCOLS",
+    "DATA_USM_KEY_CACHE",
+    "DATA_RATE_LIMITER",
+    "DATA_DISCOVERY_CACHE",
+    "DATA_METRICS_VIEW",
+    "DATA_AGENT_IDENTITIES",
+    "DATA_AGENT_ADDRESS_BOOK",
+    "DATA_HOST_RESOLVER",
+    "DATA_UPDATE_LISTENERS",
+    "DATA_HISTORY_BUDGET",
+    "DATA_JSON_VIEWS",
     "CONF_COMMUNITY",
     "CONF_VERSION",
     "CONF_ACCEPT_ERRORS",
@@ -18,29 +39,88 @@ __all__ = [
     "CONF_MAX_DEVICES",
     "CONF_DISCOVERY_INTERVAL",
     "CONF_DISCOVERY_TIMEOUT",
+    "CONF_DISCOVERY_COMMUNITIES",
+    "CONF_AUTH_KEY",
+    "CONF_AUTH_PROTOCOL",
+    "CONF_PRIV_KEY",
+    "CONF_PRIV_PROTOCOL",
+    "CONF_MAX_REQUESTS",
+    "CONF_RATE_LIMIT",
+    "CONF_RATE",
+    "CONF_BURST",
+    "CONF_SUBNET_RATE",
+    "CONF_SUBNET_BURST",
+    "CONF_SUBNET_PREFIX",
+    "CONF_MAX_DELAY",
+    "CONF_EXPORT_METRICS",
+    "CONF_DEADBAND",
+    "CONF_MIN_DELTA",
+    "CONF_MIN_INTERVAL",
+    "CONF_ADAPTIVE_POLLING",
+    "CONF_MAX_INTERVAL",
+    "CONF_BACKOFF_FACTOR",
+    "CONF_WALK_MAX_ROWS",
+    "CONF_REFRESH_MIN_AGE",
+    "CONF_POLL_DEADLINE",
+    "CONF_HISTORY_SIZE",
+    "CONF_TABLES",
+    "CONF_MAX_AGE",
     "DEFAULT_COMMUNITY",
     "DEFAULT_VERSION",
+    "DEFAULT_AUTH_PROTOCOL",
+    "DEFAULT_PRIV_PROTOCOL",
     "DEFAULT_ACCEPT_ERRORS",
     "DEFAULT_PORT",
     "DEFAULT_TIMEOUT",
+    "DEFAULT_MAX_REQUESTS",
+    "DEFAULT_MAX_REPETITIONS",
+    "DEFAULT_PROBE_DEADLINE",
+    "DEFAULT_RATE",
+    "DEFAULT_BURST",
+    "DEFAULT_SUBNET_RATE",
+    "DEFAULT_SUBNET_BURST",
+    "DEFAULT_SUBNET_PREFIX",
+    "DEFAULT_MAX_DELAY",
     "DEFAULT_DISCOVERY_TIMEOUT",
+    "DEFAULT_DISCOVERY_CACHE_TTL",
     "DEFAULT_BROADCAST_ADDRESS",
     "DEFAULT_MAX_DEVICES",
     "DEFAULT_SUPPLIES_ICON",
     "DEFAULT_SCAN_INTERVAL",
+    "DEFAULT_ADAPTIVE_MIN_INTERVAL",
+    "DEFAULT_ADAPTIVE_MAX_INTERVAL",
+    "DEFAULT_BACKOFF_FACTOR",
+    "DEFAULT_REFRESH_MIN_AGE",
+    "DEFAULT_RESOLVE_TTL",
+    "DEFAULT_RESOLVE_NEGATIVE_TTL",
+    "DEFAULT_RESOLVE_TIMEOUT",
+    "DEFAULT_HISTORY_SIZE",
+    "DEFAULT_HISTORY_MAX_SAMPLES",
+    "SERVICE_REFRESH",
     "SUPPLIES_ICONS",
+    "DEFAULT_STORAGE_ICON",
+    "STORAGE_ICONS",
 ]
 
 from datetime import timedelta
 
 from pysnmp.proto.api import protoVersion1, protoVersion2c
-from .enums import SuppliesType
+from .enums import SuppliesType, StorageType
 
 DOMAIN = "snmp_device"
 DATA_DISCOVERY_CONFIG = DOMAIN + "_discovery_config"
 DATA_DEVICE_CONFIGS = DOMAIN + "_device_configs"
 DATA_DEVICE_LISTENERS = DOMAIN + "_device_listeners"
-DATA_DEVICE_ENTITIES = DOMAIN + "_device_entities"
+DATA_USM_KEY_CACHE = DOMAIN + "_usm_key_cache"
+DATA_RATE_LIMITER = DOMAIN + "_rate_limiter"
+DATA_DISCOVERY_CACHE = DOMAIN + "_discovery_cache"
+DATA_METRICS_VIEW = DOMAIN + "_metrics_view"
+DATA_AGENT_IDENTITIES = DOMAIN + "_agent_identities"
+DATA_AGENT_ADDRESS_BOOK = DOMAIN + "_agent_address_book"
+DATA_HOST_RESOLVER = DOMAIN + "_host_resolver"
+DATA_UPDATE_LISTENERS = DOMAIN + "_update_listeners"
+DATA_HISTORY_BUDGET = DOMAIN + "_history_budget"
+DATA_JSON_VIEWS = DOMAIN + "_json_views"
 
 PLATFORM_CREATED_ENTITIES = "created_entities"
 PLATFORM_ADDED_ENTITIES = "added_entities"
@@ -56,10 +136,49 @@ SUPPORTED_DEVICE_TYPES = {
     DEVICE_TYPE_COMPUTER: 'SNMPComputerSensor',
 }
 
+SENSOR_TYPE_STATUS = 'status'
+SENSOR_TYPE_MILEAGE = 'mileage'
+SENSOR_TYPE_TONER = 'toner'
+SENSOR_TYPE_PAPER_INPUT = 'paper_input'
+SENSOR_TYPE_CPU_LOAD = 'cpu_load'
+SENSOR_TYPE_PROCESSES = 'processes'
+SENSOR_TYPE_STORAGE = 'storage'
+
+SENSOR_TYPES = [
+    SENSOR_TYPE_STATUS,
+    SENSOR_TYPE_MILEAGE,
+    SENSOR_TYPE_TONER,
+    SENSOR_TYPE_PAPER_INPUT,
+    SENSOR_TYPE_CPU_LOAD,
+    SENSOR_TYPE_PROCESSES,
+    SENSOR_TYPE_STORAGE,
+]
+
 SNMP_VERSIONS = {
     '1': protoVersion1,
     '2c': protoVersion2c,
 }
+SNMP_VERSION_3 = '3'
+DEVICE_SNMP_VERSIONS = [*SNMP_VERSIONS, SNMP_VERSION_3]
+
+# Values are names of protocol identifiers in `pysnmp.hlapi`
+SNMP_AUTH_PROTOCOLS = {
+    'none': 'usmNoAuthProtocol',
+    'hmac-md5': 'usmHMACMD5AuthProtocol',
+    'hmac-sha': 'usmHMACSHAAuthProtocol',
+    'hmac128-sha224': 'usmHMAC128SHA224AuthProtocol',
+    'hmac192-sha256': 'usmHMAC192SHA256AuthProtocol',
+    'hmac256-sha384': 'usmHMAC256SHA384AuthProtocol',
+    'hmac384-sha512': 'usmHMAC384SHA512AuthProtocol',
+}
+SNMP_PRIV_PROTOCOLS = {
+    'none': 'usmNoPrivProtocol',
+    'des': 'usmDESPrivProtocol',
+    '3des-ede': 'usm3DESEDEPrivProtocol',
+    'aes-cfb-128': 'usmAesCfb128Protocol',
+    'aes-cfb-192': 'usmAesCfb192Protocol',
+    'aes-cfb-256': 'usmAesCfb256Protocol',
+}
 
 CONF_COMMUNITY = 'community'
 CONF_VERSION = 'version'
@@ -68,16 +187,66 @@ CONF_DEFAULT_VALUE = 'default_value'
 CONF_MAX_DEVICES = 'max_devices'
 CONF_DISCOVERY_INTERVAL = 'discovery_interval'
 CONF_DISCOVERY_TIMEOUT = 'discovery_timeout'
+CONF_DISCOVERY_COMMUNITIES = 'discovery_communities'
+CONF_AUTH_KEY = 'auth_key'
+CONF_AUTH_PROTOCOL = 'auth_protocol'
+CONF_PRIV_KEY = 'priv_key'
+CONF_PRIV_PROTOCOL = 'priv_protocol'
+CONF_MAX_REQUESTS = 'max_requests'
+CONF_RATE_LIMIT = 'rate_limit'
+CONF_RATE = 'requests_per_second'
+CONF_BURST = 'burst'
+CONF_SUBNET_RATE = 'subnet_requests_per_second'
+CONF_SUBNET_BURST = 'subnet_burst'
+CONF_SUBNET_PREFIX = 'subnet_prefix'
+CONF_MAX_DELAY = 'max_delay'
+CONF_EXPORT_METRICS = 'export_metrics'
+CONF_DEADBAND = 'deadband'
+CONF_MIN_DELTA = 'min_delta'
+CONF_MIN_INTERVAL = 'min_interval'
+CONF_ADAPTIVE_POLLING = 'adaptive_polling'
+CONF_MAX_INTERVAL = 'max_interval'
+CONF_BACKOFF_FACTOR = 'backoff_factor'
+CONF_WALK_MAX_ROWS = 'walk_max_rows'
+CONF_REFRESH_MIN_AGE = 'refresh_min_age'
+CONF_POLL_DEADLINE = 'poll_deadline'
+CONF_HISTORY_SIZE = 'history_size'
+CONF_TABLES = 'tables'
+CONF_MAX_AGE = 'max_age'
 
 DEFAULT_ACCEPT_ERRORS = True
 DEFAULT_COMMUNITY = 'public'
 DEFAULT_PORT: str = '161'
 DEFAULT_VERSION = '2c'
+DEFAULT_AUTH_PROTOCOL = 'none'
+DEFAULT_PRIV_PROTOCOL = 'none'
 DEFAULT_TIMEOUT = 1
+DEFAULT_MAX_REQUESTS = 3
+DEFAULT_MAX_REPETITIONS = 25
+DEFAULT_PROBE_DEADLINE = 3
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 5
+DEFAULT_SUBNET_RATE = 50.0
+DEFAULT_SUBNET_BURST = 50
+DEFAULT_SUBNET_PREFIX = 24
+DEFAULT_MAX_DELAY = 10.0
 DEFAULT_DISCOVERY_TIMEOUT = 2
+DEFAULT_DISCOVERY_CACHE_TTL = 300
 DEFAULT_MAX_DEVICES = 10
 DEFAULT_BROADCAST_ADDRESS = "255.255.255.255"
 DEFAULT_SCAN_INTERVAL = timedelta(seconds=30)
+DEFAULT_ADAPTIVE_MIN_INTERVAL = timedelta(seconds=5)
+DEFAULT_ADAPTIVE_MAX_INTERVAL = timedelta(minutes=10)
+DEFAULT_BACKOFF_FACTOR = 2.0
+DEFAULT_REFRESH_MIN_AGE = timedelta(seconds=5)
+DEFAULT_RESOLVE_TTL = 300
+DEFAULT_RESOLVE_NEGATIVE_TTL = 30
+DEFAULT_RESOLVE_TIMEOUT = 5
+DEFAULT_HISTORY_SIZE = 256
+# Samples kept across all devices, 16 bytes each
+DEFAULT_HISTORY_MAX_SAMPLES = 1000000
+
+SERVICE_REFRESH = 'refresh'
 
 def key_tuple_to_tuple_keys(input_dict):
     return {
@@ -100,4 +269,14 @@ SUPPLIES_ICONS = key_tuple_to_tuple_keys({
     'mdi:book-open-variant': (SuppliesType.INSERTS,),
     'mdi:gift': (SuppliesType.PAPER_WRAP, SuppliesType.SHRINK_WRAP),
     'mdi:lightbulb': (SuppliesType.FUSER,),
-})
\ No newline at end of file
+})
+
+DEFAULT_STORAGE_ICON = 'mdi:harddisk'
+STORAGE_ICONS = key_tuple_to_tuple_keys({
+    DEFAULT_STORAGE_ICON: (StorageType.OTHER, StorageType.FIXED_DISK, StorageType.REMOVABLE_DISK),
+    'mdi:memory': (StorageType.RAM, StorageType.VIRTUAL_MEMORY, StorageType.RAM_DISK),
+    'mdi:floppy': (StorageType.FLOPPY_DISK,),
+    'mdi:disc': (StorageType.COMPACT_DISC,),
+    'mdi:micro-sd': (StorageType.FLASH_MEMORY,),
+    'mdi:nas': (StorageType.NETWORK_DISK,),
+})
@@ -0,0 +1,49 @@
+"""Diagnostics of running device pollers"""
+from typing import Any, Dict, TYPE_CHECKING
+
+from homeassistant.const import CONF_USERNAME
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .const import DATA_DEVICE_CONFIGS, CONF_COMMUNITY, CONF_AUTH_KEY, CONF_PRIV_KEY
+from .rows import to_json
+
+if TYPE_CHECKING:
+    from .poller import SNMPDevicePoller
+
+REDACTED = '**REDACTED**'
+TO_REDACT = (CONF_COMMUNITY, CONF_USERNAME, CONF_AUTH_KEY, CONF_PRIV_KEY)
+
+
+def _redact(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: REDACTED if key in TO_REDACT and value else to_json(value)
+        for key, value in config.items()
+    }
+
+
+def get_device_diagnostics(hass: HomeAssistantType, poller: 'SNMPDevicePoller') -> Dict[str, Any]:
+    """Return redacted configuration, polling state, last data and history of a device."""
+    config = hass.data.get(DATA_DEVICE_CONFIGS, {}).get((poller.host, poller.port), {})
+
+    return {
+        'config': _redact(config),
+        'poller': {
+            'identity': poller.identity,
+            'addresses': sorted('%s:%s' % address for address in poller.addresses),
+            'scan_interval': poller.scan_interval.total_seconds(),
+            'current_interval': poller.current_interval.total_seconds(),
+            'failures': poller.failures,
+            'data_ages': poller.data_ages(),
+            'row_ages': to_json(poller.row_ages()),
+        },
+        'entities': [
+            {
+                'entity_id': entity.entity_id,
+                'sensor_type': entity.sensor_type,
+                'static_attributes': to_json(entity.static_attributes),
+            }
+            for entity in poller.entities
+        ],
+        'last_data': to_json(poller.last_data or {}),
+        'history': poller.history.as_dict() if poller.history is not None else None,
+    }
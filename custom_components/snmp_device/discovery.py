@@ -0,0 +1,273 @@
+"""Broadcast discovery and classification of SNMP devices"""
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .const import DEFAULT_COMMUNITY, DEFAULT_PORT, DEFAULT_DISCOVERY_TIMEOUT, DEFAULT_MAX_DEVICES, \
+    DEFAULT_BROADCAST_ADDRESS, DEFAULT_VERSION, DEVICE_TYPE_PRINTER, DEVICE_TYPE_COMPUTER, SNMP_VERSIONS
+
+_LOGGER = logging.getLogger(__name__)
+
+OID_SYS_DESCR = '1.3.6.1.2.1.1.1.0'
+OID_SYS_OBJECT_ID = '1.3.6.1.2.1.1.2.0'
+OID_SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+OID_SYS_NAME = '1.3.6.1.2.1.1.5.0'
+
+DISCOVERY_OIDS = (OID_SYS_DESCR, OID_SYS_OBJECT_ID, OID_SYS_NAME, OID_SYS_UPTIME)
+
+# SNMPv2c is preferred for GETBULK support
+VERSION_PREFERENCE = ('2c', '1')
+
+OID = Tuple[int, ...]
+
+
+def oid_to_tuple(oid: Union[str, Iterable[int]]) -> OID:
+    if isinstance(oid, str):
+        return tuple(int(arc) for arc in oid.strip('.').split('.'))
+    return tuple(oid)
+
+
+class OIDPrefixTrie:
+    """Maps OID prefixes to values, looked up by longest matching prefix."""
+    __slots__ = ('_root',)
+
+    _VALUE = object()
+
+    def __init__(self, items: Optional[Iterable[Tuple[Union[str, OID], Any]]] = None):
+        self._root: Dict[Any, Any] = {}
+        for prefix, value in items or ():
+            self.insert(prefix, value)
+
+    def insert(self, prefix: Union[str, OID], value: Any) -> None:
+        node = self._root
+        for arc in oid_to_tuple(prefix):
+            node = node.setdefault(arc, {})
+        node[self._VALUE] = value
+
+    def longest_match(self, oid: Union[str, OID], default: Any = None) -> Any:
+        node = self._root
+        result = node.get(self._VALUE, default)
+        for arc in oid_to_tuple(oid):
+            node = node.get(arc)
+            if node is None:
+                break
+            result = node.get(self._VALUE, result)
+        return result
+
+
+# sysObjectID prefixes of well-known device families
+DEVICE_TYPE_OID_PREFIXES = OIDPrefixTrie([
+    # Printer vendors
+    ('1.3.6.1.4.1.11.2.3.9', DEVICE_TYPE_PRINTER),  # HP JetDirect
+    ('1.3.6.1.4.1.236.11.5', DEVICE_TYPE_PRINTER),  # Samsung printers
+    ('1.3.6.1.4.1.253', DEVICE_TYPE_PRINTER),  # Xerox
+    ('1.3.6.1.4.1.367', DEVICE_TYPE_PRINTER),  # Ricoh
+    ('1.3.6.1.4.1.641', DEVICE_TYPE_PRINTER),  # Lexmark
+    ('1.3.6.1.4.1.1129', DEVICE_TYPE_PRINTER),  # Toshiba TEC
+    ('1.3.6.1.4.1.1248', DEVICE_TYPE_PRINTER),  # Epson
+    ('1.3.6.1.4.1.1347', DEVICE_TYPE_PRINTER),  # Kyocera
+    ('1.3.6.1.4.1.1602', DEVICE_TYPE_PRINTER),  # Canon
+    ('1.3.6.1.4.1.2001', DEVICE_TYPE_PRINTER),  # OKI Data
+    ('1.3.6.1.4.1.2385', DEVICE_TYPE_PRINTER),  # Sharp
+    ('1.3.6.1.4.1.2435', DEVICE_TYPE_PRINTER),  # Brother
+    ('1.3.6.1.4.1.18334', DEVICE_TYPE_PRINTER),  # Konica Minolta
+    # Operating systems
+    ('1.3.6.1.4.1.311.1.1.3', DEVICE_TYPE_COMPUTER),  # Microsoft Windows
+    ('1.3.6.1.4.1.8072.3.2', DEVICE_TYPE_COMPUTER),  # Net-SNMP agents on Linux, BSD, macOS
+])
+
+# Lowercase sysDescr substrings used when sysObjectID is not recognized
+DESCRIPTION_MATCHERS = {
+    DEVICE_TYPE_COMPUTER: [
+        'linux',
+        'windows',
+    ],
+    DEVICE_TYPE_PRINTER: [
+        'print',
+    ],
+}
+
+
+def classify_device(sys_object_id: Optional[str], sys_descr: Optional[str]) -> Optional[str]:
+    """Determine device type from sysObjectID, falling back to sysDescr matching."""
+    if sys_object_id:
+        device_type = DEVICE_TYPE_OID_PREFIXES.longest_match(sys_object_id)
+        if device_type is not None:
+            return device_type
+
+    if sys_descr:
+        lower_description = sys_descr.lower()
+        for device_type, matchers in DESCRIPTION_MATCHERS.items():
+            if any(x in lower_description for x in matchers):
+                return device_type
+
+    return None
+
+
+class DiscoveredDevice(NamedTuple):
+    sys_descr: Optional[str]
+    sys_object_id: Optional[str] = None
+    sys_name: Optional[str] = None
+    sys_uptime: Optional[int] = None
+    device_type: Optional[str] = None
+    version: Optional[str] = None
+    community: Optional[str] = None
+
+
+def _parse_discovery_response(var_binds: List[Tuple[Any, Any]]) -> DiscoveredDevice:
+    from pyasn1.type.univ import Null
+
+    values = {}
+    for oid, val in var_binds:
+        if not isinstance(val, Null):
+            values[str(oid)] = val
+
+    sys_descr = values.get(OID_SYS_DESCR)
+    sys_object_id = values.get(OID_SYS_OBJECT_ID)
+    sys_name = values.get(OID_SYS_NAME)
+    sys_uptime = values.get(OID_SYS_UPTIME)
+
+    sys_descr = None if sys_descr is None else sys_descr.prettyPrint()
+    sys_object_id = None if sys_object_id is None else sys_object_id.prettyPrint()
+
+    return DiscoveredDevice(
+        sys_descr=sys_descr,
+        sys_object_id=sys_object_id,
+        sys_name=None if sys_name is None else sys_name.prettyPrint(),
+        sys_uptime=None if sys_uptime is None else int(sys_uptime),
+        device_type=classify_device(sys_object_id, sys_descr),
+    )
+
+
+def discovery_credentials(communities: Iterable[str],
+                          versions: Iterable[str] = VERSION_PREFERENCE) -> List[Tuple[str, str]]:
+    """List version and community pairs to probe, most preferred first."""
+    versions = list(versions)
+    communities = list(OrderedDict.fromkeys(communities))
+    return [
+        (version, community)
+        for version in VERSION_PREFERENCE if version in versions
+        for community in communities
+    ]
+
+
+def discover_devices(credentials: Sequence[Tuple[str, str]] = ((DEFAULT_VERSION, DEFAULT_COMMUNITY),),
+                     port: int = DEFAULT_PORT, response_timeout: int = DEFAULT_DISCOVERY_TIMEOUT,
+                     max_responses: int = DEFAULT_MAX_DEVICES,
+                     broadcast_address: str = DEFAULT_BROADCAST_ADDRESS) -> Dict[Tuple[str, int], DiscoveredDevice]:
+    """
+    Broadcast a GET for sysDescr, sysObjectID, sysName and sysUpTime with
+    every (version, community) pair of `credentials` from a single socket,
+    and return classified devices keyed by responding address.
+
+    Each device records the first pair of `credentials` it responded to.
+    """
+    from pysnmp.proto import api
+    for version, community in credentials:
+        if SNMP_VERSIONS.get(version) not in api.protoModules:
+            raise ValueError('Version "%s" is invalid. Supported values: %s'
+                             % (version, ', '.join(SNMP_VERSIONS)))
+
+    all_devices = dict()
+    preferences: Dict[Tuple[str, int], int] = dict()
+
+    from pysnmp.carrier.asyncore.dispatch import AsyncoreDispatcher
+    from pysnmp.carrier.asyncore.dgram import udp
+    from pyasn1.codec.ber import encoder, decoder
+    from pyasn1.error import PyAsn1Error
+    from time import time
+
+    # Build one message per credential pair, told apart by request ID
+    messages = []
+    requests = dict()
+    for preference, (version, community) in enumerate(credentials):
+        protocol = api.protoModules[SNMP_VERSIONS[version]]
+
+        request = protocol.GetRequestPDU()
+        protocol.apiPDU.setDefaults(request)
+        protocol.apiPDU.setVarBinds(request, [(oid, protocol.Null('')) for oid in DISCOVERY_OIDS])
+
+        message = protocol.Message()
+        protocol.apiMessage.setDefaults(message)
+        protocol.apiMessage.setCommunity(message, community)
+        protocol.apiMessage.setPDU(message, request)
+
+        requests[int(protocol.apiPDU.getRequestID(request))] = (preference, version, community)
+        messages.append(encoder.encode(message))
+
+    started_at = time()
+    last_found = None
+
+    class StopWaiting(Exception):
+        pass
+
+    def callback_timer(now):
+        if last_found is not None:
+            if now - last_found > response_timeout:
+                raise StopWaiting()
+        elif now - started_at > response_timeout:
+            raise StopWaiting()
+
+    # noinspection PyUnusedLocal,PyUnusedLocal
+    def callback_receive(_dispatcher, _domain, _address, _message):
+        nonlocal last_found
+        while _message:
+            try:
+                message_version = int(api.decodeMessageVersion(_message))
+            except PyAsn1Error:
+                _LOGGER.debug('Ignoring malformed response from %s', _address)
+                return b''
+            if message_version not in api.protoModules:
+                _LOGGER.debug('Ignoring response from %s with unsupported version %s', _address, message_version)
+                return b''
+
+            protocol = api.protoModules[message_version]
+            try:
+                response_message, _message = decoder.decode(_message, asn1Spec=protocol.Message())
+            except PyAsn1Error as e:
+                _LOGGER.debug('Ignoring malformed response from %s: %s', _address, e)
+                return b''
+            response = protocol.apiMessage.getPDU(response_message)
+
+            # Match response to request
+            request_info = requests.get(int(protocol.apiPDU.getRequestID(response)))
+            if request_info is None:
+                continue
+
+            preference, version, community = request_info
+            # Check for SNMP errors reported
+            error_status = protocol.apiPDU.getErrorStatus(response)
+            if error_status:
+                _LOGGER.debug('Ignoring response from %s: %s', _address, error_status.prettyPrint())
+            elif preference < preferences.get(_address, len(credentials)):
+                device = _parse_discovery_response(protocol.apiPDU.getVarBinds(response))
+                device = device._replace(version=version, community=community)
+                _LOGGER.debug('Discovered %s on %s', device, _address)
+                all_devices[_address] = device
+                preferences[_address] = preference
+                last_found = time()
+
+            _dispatcher.jobFinished(1)
+
+        return _message
+
+    dispatcher = AsyncoreDispatcher()
+
+    dispatcher.registerRecvCbFun(callback_receive)
+    dispatcher.registerTimerCbFun(callback_timer)
+
+    transport = udp.UdpSocketTransport().openClientMode().enableBroadcast()
+    dispatcher.registerTransport(udp.domainName, transport)
+    for message in messages:
+        dispatcher.sendMessage(message, udp.domainName, (broadcast_address, port))
+    dispatcher.jobStarted(1, max_responses * len(messages))
+
+    # Dispatcher will finish as all jobs counter reaches zero
+    try:
+        dispatcher.runDispatcher()
+    except StopWaiting:
+        dispatcher.closeDispatcher()
+    else:
+        raise
+
+    return all_devices
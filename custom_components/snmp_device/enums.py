@@ -124,6 +124,29 @@ class PrinterDetectedErrorState(_FriendlyEnum):
         converted_error = sum(error_value)
         return [e for e in cls if e.value & converted_error]
 
+# Last sub-identifiers of hrStorageTypes (HOST-RESOURCES-TYPES)
+class StorageType(_FriendlyEnum):
+    OTHER = 1
+    RAM = 2
+    VIRTUAL_MEMORY = 3
+    FIXED_DISK = 4
+    REMOVABLE_DISK = 5
+    FLOPPY_DISK = 6
+    COMPACT_DISC = 7
+    RAM_DISK = 8
+    FLASH_MEMORY = 9
+    NETWORK_DISK = 10
+
+    @classmethod
+    def from_oid(cls, type_oid: 'univ.ObjectIdentifier') -> 'StorageType':
+        sub_ids = tuple(type_oid)
+        if sub_ids[:-1] != (1, 3, 6, 1, 2, 1, 25, 2, 1):
+            return cls.OTHER
+        try:
+            return cls(sub_ids[-1])
+        except ValueError:
+            return cls.OTHER
+
 # https://www.iana.org/assignments/ianaiftype-mib/ianaiftype-mib
 # overkill, though
 class NetworkConnectionType(_FriendlyEnum):
@@ -0,0 +1,130 @@
+"""Incremental forecasts of supply consumption"""
+from typing import Any, Dict, Optional
+
+# Share of the weight of earlier observations kept with every new one
+DEFAULT_DECAY = 0.9
+
+# Rise of a supply level, in percent of its capacity, taken as the supply having been replaced
+REPLACEMENT_JUMP = 10.0
+
+SECONDS_PER_DAY = 86400
+
+
+class EWRegression:
+    """
+    Exponentially weighted least squares fit of `y` against `x`, updated
+    one observation at a time in constant memory.
+    """
+    __slots__ = ('decay', 'samples', 'weight', 'mean_x', 'mean_y', 'var_x', 'cov_xy')
+
+    def __init__(self, decay: float = DEFAULT_DECAY):
+        self.decay = decay
+        self.samples = 0
+        self.weight = 0.0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.var_x = 0.0
+        self.cov_xy = 0.0
+
+    def update(self, x: float, y: float) -> None:
+        self.samples += 1
+        self.weight = self.decay * self.weight + 1.0
+        alpha = 1.0 / self.weight
+
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += alpha * dx
+        self.mean_y += alpha * dy
+        self.var_x = (1.0 - alpha) * (self.var_x + alpha * dx * dx)
+        self.cov_xy = (1.0 - alpha) * (self.cov_xy + alpha * dx * dy)
+
+    @property
+    def slope(self) -> Optional[float]:
+        if self.samples < 2 or self.var_x <= 0:
+            return None
+        return self.cov_xy / self.var_x
+
+    def as_dict(self) -> Dict[str, float]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, float]) -> 'EWRegression':
+        regression = cls()
+        for slot in cls.__slots__:
+            if slot in data:
+                setattr(regression, slot, data[slot])
+        return regression
+
+
+class SupplyForecast:
+    """
+    Consumption estimates of a single supply from its level over time and
+    over the printer mileage.
+
+    Observations are taken whenever the level changes, so that idle periods
+    do not accumulate samples. A level rising by `REPLACEMENT_JUMP` percent
+    or more starts the estimates over for the new supply.
+    """
+    __slots__ = ('by_time', 'by_mileage', 'level', 'origin_time', 'origin_mileage')
+
+    def __init__(self):
+        self.by_time = EWRegression()
+        self.by_mileage = EWRegression()
+        self.level: Optional[float] = None
+        self.origin_time: Optional[float] = None
+        self.origin_mileage: Optional[int] = None
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def update(self, level: float, timestamp: float, mileage: Optional[int] = None) -> bool:
+        """Observe a level in percent of capacity; return whether the estimates changed."""
+        if self.level is not None:
+            if level == self.level:
+                return False
+            if level - self.level >= REPLACEMENT_JUMP:
+                self.reset()
+
+        if self.origin_time is None:
+            # Regressions run on offsets from the first observation to keep their sums small
+            self.origin_time = timestamp
+            self.origin_mileage = mileage
+
+        self.level = level
+        self.by_time.update((timestamp - self.origin_time) / SECONDS_PER_DAY, level)
+        if mileage is not None and self.origin_mileage is not None:
+            self.by_mileage.update(mileage - self.origin_mileage, level)
+        return True
+
+    @property
+    def days_until_empty(self) -> Optional[float]:
+        slope = self.by_time.slope
+        if slope is None or slope >= 0 or self.level is None:
+            return None
+        return round(self.level / -slope, 1)
+
+    @property
+    def pages_per_percent(self) -> Optional[float]:
+        slope = self.by_mileage.slope
+        if slope is None or slope >= 0:
+            return None
+        return round(-1.0 / slope, 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'by_time': self.by_time.as_dict(),
+            'by_mileage': self.by_mileage.as_dict(),
+            'level': self.level,
+            'origin_time': self.origin_time,
+            'origin_mileage': self.origin_mileage,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SupplyForecast':
+        forecast = cls()
+        forecast.by_time = EWRegression.from_dict(data.get('by_time', {}))
+        forecast.by_mileage = EWRegression.from_dict(data.get('by_mileage', {}))
+        forecast.level = data.get('level')
+        forecast.origin_time = data.get('origin_time')
+        forecast.origin_mileage = data.get('origin_mileage')
+        return forecast
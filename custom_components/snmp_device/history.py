@@ -0,0 +1,129 @@
+"""In-memory history of recently retrieved numeric values"""
+import logging
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .const import DATA_HISTORY_BUDGET, DEFAULT_HISTORY_MAX_SAMPLES
+from .rows import Row, Table, numeric_value
+
+_LOGGER = logging.getLogger(__name__)
+
+SeriesKey = Tuple[str, Any, str]
+
+
+class RingBuffer:
+    """Fixed number of most recent timestamped samples, stored in preallocated arrays."""
+    __slots__ = ('size', 'count', 'position', 'timestamps', 'values')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0
+        self.position = 0
+        self.timestamps = array('d', bytes(8 * size))
+        self.values = array('d', bytes(8 * size))
+
+    def append(self, timestamp: float, value: float) -> None:
+        position = self.position
+        self.timestamps[position] = timestamp
+        self.values[position] = value
+        self.position = (position + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def samples(self) -> List[Tuple[float, float]]:
+        """Return samples from the oldest to the newest."""
+        start = (self.position - self.count) % self.size
+        return [
+            (self.timestamps[position % self.size], self.values[position % self.size])
+            for position in range(start, start + self.count)
+        ]
+
+
+class HistoryBudget:
+    """Total number of samples history buffers of all devices may hold."""
+
+    def __init__(self, max_samples: int = DEFAULT_HISTORY_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.allocated = 0
+
+    def allocate(self, size: int) -> Optional[RingBuffer]:
+        if self.allocated + size > self.max_samples:
+            return None
+        self.allocated += size
+        return RingBuffer(size)
+
+    def release(self, size: int) -> None:
+        self.allocated = max(0, self.allocated - size)
+
+
+def get_history_budget(hass: HomeAssistantType) -> HistoryBudget:
+    budget = hass.data.get(DATA_HISTORY_BUDGET)
+    if budget is None:
+        budget = HistoryBudget()
+        hass.data[DATA_HISTORY_BUDGET] = budget
+    return budget
+
+
+class DeviceHistory:
+    """
+    Last `size` values of every numeric column retrieved from a device.
+
+    A buffer is allocated from the shared budget the first time a column is
+    seen; columns retrieved after the budget ran out are not recorded.
+    """
+
+    def __init__(self, budget: HistoryBudget, size: int):
+        self.budget = budget
+        self.size = size
+        self._buffers: Dict[SeriesKey, Optional[RingBuffer]] = {}
+        self._exhausted = False
+
+    def _buffer(self, series_key: SeriesKey) -> Optional[RingBuffer]:
+        try:
+            return self._buffers[series_key]
+        except KeyError:
+            pass
+
+        buffer = self.budget.allocate(self.size)
+        if buffer is None and not self._exhausted:
+            self._exhausted = True
+            _LOGGER.warning('History memory budget of %d samples is used up, not recording %s and further columns',
+                            self.budget.max_samples, '.'.join(str(part) for part in series_key if part is not None))
+        self._buffers[series_key] = buffer
+        return buffer
+
+    def _append_row(self, key: str, index: Any, row: Row, timestamp: float) -> None:
+        for column, value in zip(row.columns, row.values()):
+            sample_value = numeric_value(value)
+            if sample_value is None:
+                continue
+            buffer = self._buffer((key, index, column))
+            if buffer is not None:
+                buffer.append(timestamp, sample_value)
+
+    def record(self, retrieved_data: Dict[str, Any], timestamp: float) -> None:
+        """Append numeric values of freshly retrieved data."""
+        for key, data in retrieved_data.items():
+            if isinstance(data, Table):
+                for index, row in data.items():
+                    self._append_row(key, index, row, timestamp)
+            elif isinstance(data, Row):
+                self._append_row(key, None, data, timestamp)
+
+    def as_dict(self) -> Dict[str, List[Tuple[float, float]]]:
+        """Return samples by series name, e.g. `supplies.1.level` or `info.mileage`."""
+        return {
+            '.'.join(str(part) for part in series_key if part is not None): buffer.samples()
+            for series_key, buffer in self._buffers.items()
+            if buffer is not None
+        }
+
+    def clear(self) -> None:
+        """Drop all samples and return their memory to the budget."""
+        for buffer in self._buffers.values():
+            if buffer is not None:
+                self.budget.release(buffer.size)
+        self._buffers.clear()
+        self._exhausted = False
@@ -0,0 +1,204 @@
+"""Stable identities of SNMP agents reachable through multiple or changing addresses"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .client import SNMPClient, SNMPError
+from .const import DOMAIN, DATA_AGENT_ADDRESS_BOOK, DEFAULT_BROADCAST_ADDRESS
+from .discovery import discover_devices
+from .ratelimit import RateLimitExceeded, async_acquire, get_rate_limiter
+from .rows import Table
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = DOMAIN + '_agent_addresses'
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10
+
+OID_SNMP_ENGINE_ID = '1.3.6.1.6.3.10.2.1.1.0'
+
+_EMPTY_MACS = ('', '00:00:00:00:00:00')
+
+Address = Tuple[str, int]
+
+
+async def async_get_engine_identity(client: SNMPClient) -> Optional[str]:
+    """Identify an agent by its snmpEngineID, if it exposes one."""
+    from pyasn1.type.univ import Null
+
+    try:
+        engine_id, = await client.async_get([OID_SNMP_ENGINE_ID])
+    except SNMPError as e:
+        _LOGGER.debug('Could not retrieve engine ID from %s: %s', client, e)
+        return None
+
+    if isinstance(engine_id, Null) or not engine_id:
+        return None
+    return 'engine:' + bytes(engine_id).hex()
+
+
+def identity_from_macs(received_data: Optional[Mapping[str, Any]]) -> Optional[str]:
+    """Identify an agent by the lowest MAC address among its network interfaces."""
+    network_info = received_data.get('network_info') if received_data else None
+    if not isinstance(network_info, Table):
+        return None
+
+    mac_addresses = sorted(
+        row.phys_address
+        for row in network_info.values()
+        if row.phys_address not in _EMPTY_MACS and row.phys_address is not None
+    )
+    if not mac_addresses:
+        return None
+    return 'mac:' + mac_addresses[0]
+
+
+class AgentAddressBook:
+    """
+    Persisted identities, last known addresses, learned request size
+    limits and supply forecast states of configured agents.
+
+    Entries are keyed by the configured address, which remains the identity
+    of config entries and entities even after the agent has moved.
+    """
+
+    def __init__(self, hass: Optional[HomeAssistantType] = None):
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY) if hass else None
+        self._load_task: Optional[asyncio.Task] = None
+
+        self._identities: Dict[str, str] = {}
+        self._addresses: Dict[str, Tuple[str, int]] = {}
+        self._max_var_binds: Dict[str, int] = {}
+        self._max_repetitions: Dict[str, int] = {}
+        self._forecasts: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    async def async_load(self) -> None:
+        if self._store is None:
+            return
+        if self._load_task is None:
+            self._load_task = self._hass.async_create_task(self._async_load())
+        await self._load_task
+
+    async def _async_load(self) -> None:
+        data = await self._store.async_load()
+        if data:
+            self._identities.update(data.get('identities', {}))
+            self._addresses.update({
+                agent_key: (host, port)
+                for agent_key, (host, port) in data.get('addresses', {}).items()
+            })
+            self._max_var_binds.update(data.get('max_var_binds', {}))
+            self._max_repetitions.update(data.get('max_repetitions', {}))
+            self._forecasts.update(data.get('forecasts', {}))
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            'identities': dict(self._identities),
+            'addresses': {agent_key: list(address) for agent_key, address in self._addresses.items()},
+            'max_var_binds': dict(self._max_var_binds),
+            'max_repetitions': dict(self._max_repetitions),
+            'forecasts': dict(self._forecasts),
+        }
+
+    def _schedule_save(self) -> None:
+        if self._store is not None:
+            self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    @staticmethod
+    def _agent_key(host: str, port: int) -> str:
+        return '%s:%s' % (host, port)
+
+    def get_identity(self, host: str, port: int) -> Optional[str]:
+        return self._identities.get(self._agent_key(host, port))
+
+    def set_identity(self, host: str, port: int, identity: str) -> None:
+        agent_key = self._agent_key(host, port)
+        if self._identities.get(agent_key) != identity:
+            self._identities[agent_key] = identity
+            self._schedule_save()
+
+    def get_address(self, host: str, port: int) -> Address:
+        """Return the last known address of an agent configured at the given address."""
+        return self._addresses.get(self._agent_key(host, port), (host, port))
+
+    def set_address(self, host: str, port: int, address: Address) -> None:
+        agent_key = self._agent_key(host, port)
+        address = (address[0], address[1])
+        if address == (host, port):
+            if self._addresses.pop(agent_key, None) is not None:
+                self._schedule_save()
+        elif self._addresses.get(agent_key) != address:
+            self._addresses[agent_key] = address
+            self._schedule_save()
+
+    def get_max_var_binds(self, host: str, port: int) -> Optional[int]:
+        return self._max_var_binds.get(self._agent_key(host, port))
+
+    def set_max_var_binds(self, host: str, port: int, max_var_binds: int) -> None:
+        agent_key = self._agent_key(host, port)
+        if self._max_var_binds.get(agent_key) != max_var_binds:
+            self._max_var_binds[agent_key] = max_var_binds
+            self._schedule_save()
+
+    def get_max_repetitions(self, host: str, port: int) -> Optional[int]:
+        return self._max_repetitions.get(self._agent_key(host, port))
+
+    def set_max_repetitions(self, host: str, port: int, max_repetitions: int) -> None:
+        agent_key = self._agent_key(host, port)
+        if self._max_repetitions.get(agent_key) != max_repetitions:
+            self._max_repetitions[agent_key] = max_repetitions
+            self._schedule_save()
+
+    def get_forecasts(self, host: str, port: int) -> Dict[str, Dict[str, Any]]:
+        return self._forecasts.get(self._agent_key(host, port), {})
+
+    def set_forecasts(self, host: str, port: int, forecasts: Dict[str, Dict[str, Any]]) -> None:
+        self._forecasts[self._agent_key(host, port)] = forecasts
+        self._schedule_save()
+
+
+async def async_get_agent_address_book(hass: HomeAssistantType) -> AgentAddressBook:
+    address_book = hass.data.get(DATA_AGENT_ADDRESS_BOOK)
+    if address_book is None:
+        address_book = AgentAddressBook(hass)
+        hass.data[DATA_AGENT_ADDRESS_BOOK] = address_book
+    await address_book.async_load()
+    return address_book
+
+
+async def async_locate_agent(hass: HomeAssistantType, identity: str,
+                             credentials: Sequence[Tuple[str, str]], port: int,
+                             resolve_identity: Callable[[Address], Awaitable[Optional[str]]],
+                             exclude: Iterable[Address] = ()) -> Optional[Address]:
+    """
+    Find the current address of an agent by broadcasting a discovery request
+    and resolving identities of responding devices.
+    """
+    buckets = get_rate_limiter(hass).buckets_for((DEFAULT_BROADCAST_ADDRESS, port))
+    try:
+        for _ in credentials:
+            await async_acquire(buckets)
+    except RateLimitExceeded:
+        _LOGGER.debug('Discovery throttled, not locating %s', identity)
+        return None
+
+    discovered = await hass.async_add_executor_job(discover_devices, credentials, port)
+    exclude = {(address[0], address[1]) for address in exclude}
+    candidates = [address for address in discovered if (address[0], address[1]) not in exclude]
+    _LOGGER.debug('Resolving identities of %s to locate %s', candidates, identity)
+
+    identities = await asyncio.gather(
+        *(resolve_identity((address[0], address[1])) for address in candidates),
+        return_exceptions=True
+    )
+    for address, candidate_identity in zip(candidates, identities):
+        if candidate_identity == identity:
+            return address[0], address[1]
+
+    return None
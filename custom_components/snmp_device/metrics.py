@@ -0,0 +1,226 @@
+"""Prometheus text exposition, JSON history and diagnostics of data cached by device pollers"""
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Tuple, TYPE_CHECKING
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .const import DOMAIN, DATA_DEVICE_LISTENERS, DATA_METRICS_VIEW, DATA_RATE_LIMITER, DATA_JSON_VIEWS
+from .diagnostics import get_device_diagnostics
+from .rows import Row, Table, numeric_value
+
+if TYPE_CHECKING:
+    from .poller import SNMPDevicePoller
+
+_LOGGER = logging.getLogger(__name__)
+
+METRICS_URL = '/api/' + DOMAIN + '/metrics'
+HISTORY_URL = '/api/' + DOMAIN + '/history'
+DIAGNOSTICS_URL = '/api/' + DOMAIN + '/diagnostics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_INVALID_NAME_CHARACTERS = re.compile(r'[^a-zA-Z0-9_]')
+
+Labels = Tuple[Tuple[str, Any], ...]
+
+
+def metric_name(*parts: str) -> str:
+    return _INVALID_NAME_CHARACTERS.sub('_', '_'.join((DOMAIN,) + parts).rstrip('_'))
+
+
+def _escape_label_value(value: Any) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def format_sample(name: str, labels: Labels, value: float) -> str:
+    return '%s{%s} %s\n' % (
+        name,
+        ','.join('%s="%s"' % (label, _escape_label_value(label_value)) for label, label_value in labels),
+        repr(value),
+    )
+
+
+def _device_labels(poller: 'SNMPDevicePoller') -> Labels:
+    return ('host', poller.host), ('port', poller.port)
+
+
+def device_families(pollers: Iterable['SNMPDevicePoller']) -> Dict[str, Tuple[str, str]]:
+    """Map names of metrics found in poller snapshots to their data key and column."""
+    families: Dict[str, Tuple[str, str]] = {}
+    for poller in pollers:
+        for key, data in (poller.last_data or {}).items():
+            row = next(iter(data.values()), None) if isinstance(data, Table) else data
+            if isinstance(row, Row):
+                for column in row.columns:
+                    families.setdefault(metric_name(key, column), (key, column))
+    return families
+
+
+def iter_column_samples(pollers: Iterable['SNMPDevicePoller'], key: str, column: str) -> Iterable[Tuple[Labels, float]]:
+    """Yield numeric values of a single column from the last snapshots of pollers."""
+    for poller in pollers:
+        data = poller.last_data.get(key) if poller.last_data else None
+        if isinstance(data, Table):
+            device_labels = _device_labels(poller)
+            for index, row in data.items():
+                sample_value = numeric_value(getattr(row, column, None))
+                if sample_value is not None:
+                    yield device_labels + (('index', index),), sample_value
+
+        elif isinstance(data, Row):
+            sample_value = numeric_value(getattr(data, column, None))
+            if sample_value is not None:
+                yield _device_labels(poller), sample_value
+
+
+def iter_age_samples(pollers: Iterable['SNMPDevicePoller']) -> Iterable[Tuple[Labels, float]]:
+    for poller in pollers:
+        for key, age in poller.data_ages().items():
+            yield _device_labels(poller) + (('key', key),), age
+
+
+def iter_row_age_samples(pollers: Iterable['SNMPDevicePoller']) -> Iterable[Tuple[Labels, float]]:
+    for poller in pollers:
+        for key, ages in poller.row_ages().items():
+            for index, age in ages.items():
+                yield _device_labels(poller) + (('key', key), ('index', index)), age
+
+
+def iter_device_families(pollers: List['SNMPDevicePoller']) \
+        -> Iterable[Tuple[str, str, Iterable[Tuple[Labels, float]]]]:
+    """
+    Yield metric families of devices, each with a lazy iterator over its
+    samples across all pollers.
+    """
+    for name, (key, column) in device_families(pollers).items():
+        yield name, 'untyped', iter_column_samples(pollers, key, column)
+    yield metric_name('data_age_seconds'), 'gauge', iter_age_samples(pollers)
+    yield metric_name('row_age_seconds'), 'gauge', iter_row_age_samples(pollers)
+
+
+def iter_rate_limit_samples(hass: HomeAssistantType) -> Iterable[Tuple[str, Labels, float]]:
+    rate_limiter = hass.data.get(DATA_RATE_LIMITER)
+    if rate_limiter is None:
+        return
+
+    for bucket_name, stats in rate_limiter.stats().items():
+        labels = (('bucket', bucket_name),)
+        yield metric_name('rate_limit', 'acquired_total'), labels, float(stats['acquired'])
+        yield metric_name('rate_limit', 'throttled_total'), labels, float(stats['throttled'])
+        yield metric_name('rate_limit', 'throttle_delay_seconds_total'), labels, float(stats['throttle_delay'])
+        yield metric_name('rate_limit', 'dropped_total'), labels, float(stats['dropped'])
+
+
+def group_samples(samples: Iterable[Tuple[str, Labels, float]]) -> Dict[str, List[str]]:
+    """Group formatted samples by metric, as the exposition format requires."""
+    families: Dict[str, List[str]] = {}
+    for name, labels, value in samples:
+        families.setdefault(name, []).append(format_sample(name, labels, value))
+    return families
+
+
+class SNMPMetricsView(HomeAssistantView):
+    """
+    Serve the latest retrieved data of devices with metrics export enabled.
+
+    Samples are rendered from poller snapshots only when scraped, without
+    creating entities or touching the state machine.
+    """
+
+    url = METRICS_URL
+    name = 'api:' + DOMAIN + ':metrics'
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.StreamResponse:
+        hass = request.app['hass']
+        pollers: Dict[Any, 'SNMPDevicePoller'] = hass.data.get(DATA_DEVICE_LISTENERS, {})
+
+        response = web.StreamResponse(headers={'Content-Type': CONTENT_TYPE})
+        await response.prepare(request)
+
+        # Pollers shared between addresses of one agent are listed once
+        exported_pollers = [poller for poller in dict.fromkeys(pollers.values()) if poller.export_metrics]
+
+        # Families are formatted and written one at a time, so memory does not grow with the fleet
+        for name, metric_type, samples in iter_device_families(exported_pollers):
+            family = ''.join(format_sample(name, labels, value) for labels, value in samples)
+            if family:
+                await response.write(('# TYPE %s %s\n' % (name, metric_type) + family).encode())
+
+        for name, samples in group_samples(iter_rate_limit_samples(hass)).items():
+            metric_type = 'counter' if name.endswith('_total') else 'gauge'
+            await response.write(('# TYPE %s %s\n' % (name, metric_type)).encode() + ''.join(samples).encode())
+
+        await response.write_eof()
+        return response
+
+
+def async_register_metrics_view(hass: HomeAssistantType) -> None:
+    if hass.data.get(DATA_METRICS_VIEW):
+        return
+    if getattr(hass, 'http', None) is None:
+        _LOGGER.warning('HTTP component is not loaded, metrics will not be exported')
+        return
+    _LOGGER.debug('Registering metrics view at %s', METRICS_URL)
+    hass.http.register_view(SNMPMetricsView)
+    hass.data[DATA_METRICS_VIEW] = True
+
+
+def _filter_pollers(request: web.Request) -> Iterable['SNMPDevicePoller']:
+    """Return pollers matching `host` and `port` query parameters, each listed once."""
+    pollers: Dict[Any, 'SNMPDevicePoller'] = request.app['hass'].data.get(DATA_DEVICE_LISTENERS, {})
+    host = request.query.get('host')
+    port = request.query.get('port')
+    return [
+        poller for poller in dict.fromkeys(pollers.values())
+        if (host is None or poller.host == host)
+        and (port is None or str(poller.port) == port)
+    ]
+
+
+class SNMPHistoryView(HomeAssistantView):
+    """
+    Serve recent numeric values recorded by device pollers as JSON, keyed
+    by `host:port` and series name. `host` and `port` query parameters
+    narrow the response down to a single device.
+    """
+
+    url = HISTORY_URL
+    name = 'api:' + DOMAIN + ':history'
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        return self.json({
+            '%s:%s' % (poller.host, poller.port): poller.history.as_dict()
+            for poller in _filter_pollers(request)
+            if poller.history is not None
+        })
+
+
+class SNMPDiagnosticsView(HomeAssistantView):
+    """Serve redacted configuration, polling state, last data and history of devices as JSON."""
+
+    url = DIAGNOSTICS_URL
+    name = 'api:' + DOMAIN + ':diagnostics'
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        hass = request.app['hass']
+        return self.json({
+            '%s:%s' % (poller.host, poller.port): get_device_diagnostics(hass, poller)
+            for poller in _filter_pollers(request)
+        })
+
+
+def async_register_json_views(hass: HomeAssistantType) -> None:
+    if hass.data.get(DATA_JSON_VIEWS):
+        return
+    if getattr(hass, 'http', None) is None:
+        _LOGGER.debug('HTTP component is not loaded, history and diagnostics will not be served')
+        return
+    _LOGGER.debug('Registering views at %s and %s', HISTORY_URL, DIAGNOSTICS_URL)
+    hass.http.register_view(SNMPHistoryView)
+    hass.http.register_view(SNMPDiagnosticsView)
+    hass.data[DATA_JSON_VIEWS] = True
@@ -0,0 +1,466 @@
+"""Per-device polling and update fan-out for SNMP entities"""
+import asyncio
+import logging
+from datetime import timedelta
+from numbers import Number
+from time import monotonic, time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple, \
+    TYPE_CHECKING
+
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .client import SNMPError
+from .const import CONF_MIN_DELTA, CONF_MIN_INTERVAL, CONF_MAX_INTERVAL, CONF_BACKOFF_FACTOR, DEFAULT_REFRESH_MIN_AGE, \
+    DATA_DEVICE_LISTENERS, DATA_AGENT_IDENTITIES, DATA_RATE_LIMITER
+from .rows import diff_snapshots
+
+if TYPE_CHECKING:
+    from .history import DeviceHistory
+    from .sensor import _SNMPSensor
+
+_LOGGER = logging.getLogger(__name__)
+
+DataSource = Tuple[str, Hashable]
+
+# Consecutive failed polls after which the agent is looked for at another address
+RELOCATE_AFTER_FAILURES = 3
+
+# Polls between retrievals of data no enabled entity depends on, so new rows are still discovered
+FULL_RETRIEVAL_EVERY = 10
+
+
+class SNMPDevicePoller:
+    """
+    Polls a single SNMP device and dispatches changes to its entities.
+
+    Every poll is compared against the previous snapshot once; only entities
+    registered for changed table rows or scalar columns are updated. State
+    changes passing the per-sensor-type deadband are written in one batch.
+
+    With `adaptive_polling` set, polls are scheduled one at a time: at the
+    minimum interval while `is_active` holds for retrieved data, and backing
+    off towards the maximum interval while it does not.
+
+    With `retrieval_plan` set, only data keys enabled entities depend on are
+    retrieved on most polls; the rest are carried over from the previous
+    snapshot and refreshed every `FULL_RETRIEVAL_EVERY` polls.
+
+    Scheduled polls and on-demand refreshes share a single retrieval in
+    flight at a time. Retrievals run under a deadline, which defaults to
+    the current poll interval; data not retrieved in time keeps its
+    previous value and age.
+
+    Changed settings are applied with `async_reconfigure` without recreating
+    entities or retrieving everything again.
+
+    With `history` set, numeric values of every retrieval are recorded in it.
+    """
+
+    def __init__(self, hass: HomeAssistantType, host: str, port: int,
+                 retrieve_data: Callable[..., Awaitable[Dict[str, Any]]], scan_interval: timedelta,
+                 received_data: Optional[Dict[str, Any]] = None,
+                 deadbands: Optional[Dict[str, Dict[str, Any]]] = None,
+                 export_metrics: bool = False,
+                 relocate: Optional[Callable[[], Awaitable[bool]]] = None,
+                 adaptive_polling: Optional[Dict[str, Any]] = None,
+                 is_active: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 retrieval_plan: Optional[Callable[[Iterable[str]], FrozenSet[str]]] = None,
+                 refresh_min_age: timedelta = DEFAULT_REFRESH_MIN_AGE,
+                 poll_deadline: Optional[timedelta] = None,
+                 reconfigure: Optional[Callable[[], Awaitable[None]]] = None,
+                 history: Optional['DeviceHistory'] = None,
+                 row_ages: Optional[Callable[[], Dict[str, Dict[Any, float]]]] = None):
+        self.hass = hass
+        self.host = host
+        self.port = port
+        self.scan_interval = scan_interval
+        self.last_data = received_data
+        self.deadbands = deadbands or {}
+        self.export_metrics = export_metrics
+        self.adaptive_polling = adaptive_polling
+        self.current_interval = scan_interval
+        self.refresh_min_age = refresh_min_age
+        self.poll_deadline = poll_deadline
+        self.history = history
+
+        # Agent identity and addresses of all config entries sharing this poller
+        self.identity: Optional[str] = None
+        self.addresses: Set[Tuple[str, int]] = {(host, port)}
+
+        self._retrieve_data = retrieve_data
+        self._relocate = relocate
+        self._reconfigure = reconfigure
+        self._row_ages = row_ages
+        self._failures = 0
+        self._is_active = is_active or (lambda retrieved_data: False)
+        self._retrieval_plan = retrieval_plan
+        self._retrieved_keys: Optional[FrozenSet[str]] = None
+        self._polls_since_full_retrieval = 0
+        self._retrieved_at: Dict[str, float] = dict.fromkeys(received_data or (), monotonic())
+        self._update_task: Optional[asyncio.Task] = None
+        self._update_keys: Optional[FrozenSet[str]] = None
+        self._entities: List['_SNMPSensor'] = []
+        self._entity_sources: Dict['_SNMPSensor', Tuple[DataSource, ...]] = {}
+        self._source_index: Dict[DataSource, Set['_SNMPSensor']] = {}
+        self._tracker_stop: Optional[Callable[[], None]] = None
+        # Set once the last entity is removed or the entry is unloaded, until an entity is added again
+        self.stopped = False
+        self._written: Dict['_SNMPSensor', Tuple[Any, ...]] = {}
+        self._pending: Set['_SNMPSensor'] = set()
+
+        if adaptive_polling is not None:
+            self.current_interval = max(
+                adaptive_polling[CONF_MIN_INTERVAL],
+                min(scan_interval, adaptive_polling[CONF_MAX_INTERVAL])
+            )
+            if received_data is not None:
+                self._adapt_interval(received_data)
+
+    def __repr__(self):
+        return '<%s %s:%s>' % (self.__class__.__name__, self.host, self.port)
+
+    @property
+    def entities(self) -> List['_SNMPSensor']:
+        return self._entities
+
+    def _index_entity(self, entity: '_SNMPSensor') -> None:
+        new_sources = tuple(entity.data_sources)
+        old_sources = self._entity_sources.get(entity, ())
+        if new_sources == old_sources:
+            return
+
+        for source in old_sources:
+            indexed = self._source_index.get(source)
+            if indexed is not None:
+                indexed.discard(entity)
+                if not indexed:
+                    del self._source_index[source]
+
+        for source in new_sources:
+            self._source_index.setdefault(source, set()).add(entity)
+
+        self._entity_sources[entity] = new_sources
+
+    def _unindex_entity(self, entity: '_SNMPSensor') -> None:
+        for source in self._entity_sources.pop(entity, ()):
+            indexed = self._source_index.get(source)
+            if indexed is not None:
+                indexed.discard(entity)
+                if not indexed:
+                    del self._source_index[source]
+
+    @staticmethod
+    def _written_values(entity: '_SNMPSensor') -> Tuple[Any, ...]:
+        return entity.state, entity.name, entity.icon, entity.unit_of_measurement
+
+    def _passes_deadband(self, entity: '_SNMPSensor', now: float) -> bool:
+        deadband = self.deadbands.get(entity.sensor_type)
+        written = self._written.get(entity)
+        if not deadband or written is None:
+            return True
+
+        written_values, written_at = written
+        state, *descriptors = self._written_values(entity)
+        written_state, *written_descriptors = written_values
+        if descriptors != written_descriptors:
+            return True
+
+        if state != written_state:
+            if not (isinstance(state, Number) and isinstance(written_state, Number)):
+                return True
+            if abs(state - written_state) < deadband.get(CONF_MIN_DELTA, 0):
+                return False
+
+        min_interval = deadband.get(CONF_MIN_INTERVAL)
+        if min_interval is not None:
+            if isinstance(min_interval, timedelta):
+                min_interval = min_interval.total_seconds()
+            if now - written_at < min_interval:
+                return False
+
+        return True
+
+    def _mark_written(self, entity: '_SNMPSensor', now: float) -> None:
+        self._written[entity] = (self._written_values(entity), now)
+        self._pending.discard(entity)
+
+    def _adapt_interval(self, retrieved_data: Dict[str, Any]) -> None:
+        adaptive_polling = self.adaptive_polling
+        if self._is_active(retrieved_data):
+            interval = adaptive_polling[CONF_MIN_INTERVAL]
+        else:
+            interval = min(
+                self.current_interval * adaptive_polling[CONF_BACKOFF_FACTOR],
+                adaptive_polling[CONF_MAX_INTERVAL]
+            )
+
+        if interval != self.current_interval:
+            _LOGGER.debug('Adjusting poll interval for %s:%d to %s', self.host, self.port, interval)
+            self.current_interval = interval
+
+    def _track_adaptive_interval(self) -> Callable[[], None]:
+        """Schedule polls one after another, each after the currently adapted interval."""
+        cancel_call: Optional[Callable[[], None]] = None
+        stopped = False
+
+        async def async_scheduled_update(*_):
+            nonlocal cancel_call
+            cancel_call = None
+            try:
+                await self.async_update()
+            finally:
+                if not stopped:
+                    schedule_update()
+
+        def schedule_update():
+            nonlocal cancel_call
+            cancel_call = async_call_later(self.hass, self.current_interval.total_seconds(), async_scheduled_update)
+
+        def stop():
+            nonlocal stopped
+            stopped = True
+            if cancel_call is not None:
+                cancel_call()
+
+        schedule_update()
+        return stop
+
+    def _update_retrieval_plan(self) -> None:
+        if self._retrieval_plan is None:
+            return
+        retrieved_keys = self._retrieval_plan({entity.sensor_type for entity in self._entities})
+        if retrieved_keys != self._retrieved_keys:
+            _LOGGER.debug('Retrieving %s from %s:%d', ', '.join(sorted(retrieved_keys)), self.host, self.port)
+            self._retrieved_keys = retrieved_keys
+
+    def add_entity(self, entity: '_SNMPSensor') -> None:
+        self._entities.append(entity)
+        self._index_entity(entity)
+        self._mark_written(entity, monotonic())
+        self._update_retrieval_plan()
+        self.stopped = False
+
+        if self._tracker_stop is None:
+            _LOGGER.debug('Starting update checker for %s:%d', self.host, self.port)
+            if self.adaptive_polling is None:
+                self._tracker_stop = async_track_time_interval(self.hass, self.async_update, self.scan_interval)
+            else:
+                self._tracker_stop = self._track_adaptive_interval()
+
+    def remove_entity(self, entity: '_SNMPSensor') -> None:
+        self._entities.remove(entity)
+        self._unindex_entity(entity)
+        self._written.pop(entity, None)
+        self._pending.discard(entity)
+        self._update_retrieval_plan()
+
+        if not self._entities:
+            self.stop()
+
+    async def async_reconfigure(self, scan_interval: timedelta) -> None:
+        """Apply changed settings in place, keeping the cached snapshot and entities."""
+        if self._reconfigure is not None:
+            await self._reconfigure()
+
+        if scan_interval == self.scan_interval:
+            return
+        _LOGGER.debug('Changing scan interval for %s:%d to %s', self.host, self.port, scan_interval)
+        self.scan_interval = scan_interval
+
+        if self.adaptive_polling is not None:
+            # Backoff continues from the new interval after the poll already scheduled
+            self.current_interval = max(
+                self.adaptive_polling[CONF_MIN_INTERVAL],
+                min(scan_interval, self.adaptive_polling[CONF_MAX_INTERVAL])
+            )
+            return
+
+        self.current_interval = scan_interval
+        if self._tracker_stop is not None:
+            self._tracker_stop()
+            self._tracker_stop = async_track_time_interval(self.hass, self.async_update, scan_interval)
+
+    def stop(self) -> None:
+        self.stopped = True
+        if self._tracker_stop is not None:
+            _LOGGER.debug('Stopping update checker for %s:%d', self.host, self.port)
+            self._tracker_stop()
+            self._tracker_stop = None
+
+    async def async_update(self, *_) -> None:
+        """Poll the device on schedule."""
+        if not self._entities:
+            _LOGGER.debug('Added entities for %s:%d is empty, not updating', self.host, self.port)
+            return
+
+        retrieved_keys = self._retrieved_keys
+        self._polls_since_full_retrieval += 1
+        if not self.last_data or self._polls_since_full_retrieval >= FULL_RETRIEVAL_EVERY:
+            retrieved_keys = None
+            self._polls_since_full_retrieval = 0
+
+        await self._async_single_flight(retrieved_keys)
+
+    async def async_refresh(self, keys: Optional[Iterable[str]] = None, max_age: Optional[float] = None) -> None:
+        """
+        Retrieve data on demand, unless it is younger than `max_age` seconds.
+
+        Only `keys` are retrieved when given, otherwise all data. A request
+        covered by a retrieval already in flight waits for it instead.
+        """
+        if max_age is None:
+            max_age = self.refresh_min_age.total_seconds()
+
+        now = monotonic()
+        if keys is not None:
+            keys = frozenset(keys)
+            stale_keys = frozenset(key for key in keys if now - self._retrieved_at.get(key, -max_age) >= max_age)
+            if not stale_keys:
+                _LOGGER.debug('Data %s of %s:%d is fresh, not refreshing', ', '.join(sorted(keys)), self.host, self.port)
+                return
+            await self._async_single_flight(stale_keys)
+
+        elif not self._retrieved_at or any(now - retrieved_at >= max_age
+                                           for retrieved_at in self._retrieved_at.values()):
+            await self._async_single_flight(None)
+
+        else:
+            _LOGGER.debug('Data of %s:%d is fresh, not refreshing', self.host, self.port)
+
+    async def _async_single_flight(self, keys: Optional[FrozenSet[str]]) -> None:
+        """Run a retrieval of `keys`, or join one in flight which covers them."""
+        while self._update_task is not None:
+            task, task_keys = self._update_task, self._update_keys
+            await asyncio.shield(task)
+            if task_keys is None or (keys is not None and keys <= task_keys):
+                return
+
+        task = self.hass.async_create_task(self._async_retrieve_and_dispatch(keys))
+        self._update_task, self._update_keys = task, keys
+        try:
+            await asyncio.shield(task)
+        finally:
+            if self._update_task is task:
+                self._update_task, self._update_keys = None, None
+
+    @property
+    def failures(self) -> int:
+        """Number of polls which failed in a row."""
+        return self._failures
+
+    def data_ages(self) -> Dict[str, float]:
+        """Return seconds since each data key was last retrieved."""
+        now = monotonic()
+        return {key: now - retrieved_at for key, retrieved_at in self._retrieved_at.items()}
+
+    def row_ages(self) -> Dict[str, Dict[Any, float]]:
+        """Return seconds since each row of tables walked in chunks was last retrieved."""
+        return self._row_ages() if self._row_ages is not None else {}
+
+    async def _async_retrieve_and_dispatch(self, retrieved_keys: Optional[FrozenSet[str]]) -> None:
+        if not self.last_data:
+            retrieved_keys = None
+
+        deadline = (self.poll_deadline or self.current_interval).total_seconds()
+        try:
+            retrieved_data = await self._retrieve_data(retrieved_keys, deadline)
+        except SNMPError as e:
+            self._failures += 1
+            _LOGGER.warning('Could not poll %s:%d (%d failures in a row): %s', self.host, self.port, self._failures, e)
+            if self._relocate is None or self._failures % RELOCATE_AFTER_FAILURES:
+                return
+            if not await self._relocate():
+                return
+            try:
+                retrieved_data = await self._retrieve_data(retrieved_keys, deadline)
+            except (SNMPError, asyncio.TimeoutError) as e:
+                _LOGGER.warning('Could not poll %s:%d at its new address: %s',
+                                self.host, self.port, str(e) or e.__class__.__name__)
+                return
+
+        self._failures = 0
+        now = monotonic()
+        for key in retrieved_data:
+            self._retrieved_at[key] = now
+
+        if self.history is not None:
+            self.history.record(retrieved_data, time())
+
+        if self.last_data:
+            missing_keys = (retrieved_keys or self.last_data.keys()) - retrieved_data.keys()
+            if missing_keys:
+                ages = self.data_ages()
+                _LOGGER.warning('Keeping previous data for %s:%d: %s', self.host, self.port, ', '.join(
+                    '%s (%d seconds old)' % (key, ages[key]) if key in ages else key
+                    for key in sorted(missing_keys)
+                ))
+            retrieved_data = {**self.last_data, **retrieved_data}
+        _LOGGER.debug('Received update data: %s', retrieved_data)
+
+        if self.adaptive_polling is not None:
+            self._adapt_interval(retrieved_data)
+
+        changed_sources = diff_snapshots(self.last_data, retrieved_data)
+        self.last_data = retrieved_data
+
+        if not changed_sources and not self._pending:
+            _LOGGER.debug('No changes for %s:%d', self.host, self.port)
+            return
+
+        affected_entities = set()
+        for source in changed_sources:
+            affected_entities.update(self._source_index.get(source, ()))
+
+        now = monotonic()
+        write_entities = []
+        for entity in self._entities:
+            if entity in affected_entities:
+                if entity.update_sensor_attributes(retrieved_data):
+                    self._pending.add(entity)
+                self._index_entity(entity)
+
+            if entity not in self._pending:
+                continue
+
+            if self._passes_deadband(entity, now):
+                write_entities.append(entity)
+            else:
+                _LOGGER.debug('Deferring state write for %s within deadband', entity)
+
+        if write_entities:
+            _LOGGER.debug('Writing states for %d entities of %s:%d', len(write_entities), self.host, self.port)
+            for entity in write_entities:
+                entity.async_write_ha_state()
+                self._mark_written(entity, now)
+
+
+def release_poller(hass: HomeAssistantType, host: str, port: int) -> None:
+    """Detach an unloaded entry from its poller, stopping the poller along with the entry owning it."""
+    rate_limiter = hass.data.get(DATA_RATE_LIMITER)
+    if rate_limiter is not None:
+        rate_limiter.release((host, port))
+
+    device_listeners = hass.data.get(DATA_DEVICE_LISTENERS, {})
+    poller: Optional[SNMPDevicePoller] = device_listeners.pop((host, port), None)
+    if poller is None:
+        return
+
+    poller.addresses.discard((host, port))
+    if (poller.host, poller.port) != (host, port):
+        _LOGGER.debug('Poller of %s:%d is still used by %s', poller.host, poller.port, poller.addresses)
+        return
+
+    poller.stop()
+    if poller.history is not None:
+        poller.history.clear()
+    agent_identities = hass.data.get(DATA_AGENT_IDENTITIES, {})
+    if poller.identity is not None and agent_identities.get(poller.identity) is poller:
+        del agent_identities[poller.identity]
+
+    for address in poller.addresses:
+        if device_listeners.get(address) is poller:
+            del device_listeners[address]
+            _LOGGER.warning('Device at %s:%d shared the poller of unloaded %s:%d, reload it to resume polling',
+                            address[0], address[1], host, port)
+    poller.addresses.clear()
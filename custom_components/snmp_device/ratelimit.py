@@ -0,0 +1,199 @@
+"""Token-bucket rate limiting of SNMP traffic per agent and per subnet"""
+import asyncio
+import ipaddress
+import logging
+from time import monotonic
+from typing import Any, Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .const import DATA_RATE_LIMITER, CONF_RATE, CONF_BURST, CONF_SUBNET_RATE, CONF_SUBNET_BURST, CONF_SUBNET_PREFIX, \
+    CONF_MAX_DELAY, DEFAULT_RATE, DEFAULT_BURST, DEFAULT_SUBNET_RATE, DEFAULT_SUBNET_BURST, DEFAULT_SUBNET_PREFIX, \
+    DEFAULT_MAX_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Request dropped because it would wait longer than allowed for a token."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `burst` tokens.
+
+    Tokens are reserved in advance, so concurrent waiters are served in
+    arrival order without a lock: the bucket may go into debt, and each
+    caller sleeps until its own token would have been refilled.
+
+    Devices sharing a bucket each set their own limits, and the strictest
+    of them apply; the initial limits apply while none are set.
+    """
+
+    def __init__(self, rate: float, burst: int, max_delay: float = DEFAULT_MAX_DELAY):
+        self.rate = rate
+        self.burst = burst
+        self.max_delay = max_delay
+
+        self.acquired = 0
+        self.throttled = 0
+        self.throttle_delay = 0.0
+        self.dropped = 0
+
+        self._tokens = float(burst)
+        self._updated = monotonic()
+
+        self._default_limits = (rate, burst, max_delay)
+        self._limits: Dict[Hashable, Tuple[float, int, float]] = {}
+
+    def __repr__(self):
+        return '<%s rate=%s burst=%s tokens=%.2f>' % (self.__class__.__name__, self.rate, self.burst, self._tokens)
+
+    def _apply_limits(self) -> None:
+        limits = list(self._limits.values()) or [self._default_limits]
+        self.rate = min(rate for rate, _, _ in limits)
+        self.burst = min(burst for _, burst, _ in limits)
+        self.max_delay = min(max_delay for _, _, max_delay in limits)
+        self._tokens = min(self._tokens, float(self.burst))
+
+    def set_limits(self, owner: Hashable, rate: float, burst: int, max_delay: float) -> None:
+        """Replace limits requested by a user of the bucket."""
+        self._limits[owner] = (rate, burst, max_delay)
+        self._apply_limits()
+
+    def release(self, owner: Hashable) -> None:
+        """Drop limits requested by a user of the bucket, possibly relaxing the effective ones."""
+        if self._limits.pop(owner, None) is not None:
+            self._apply_limits()
+
+    def reserve(self) -> float:
+        """Take a token, returning the delay before it may be used."""
+        now = monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self) -> None:
+        self._tokens += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'acquired': self.acquired,
+            'throttled': self.throttled,
+            'throttle_delay': round(self.throttle_delay, 3),
+            'dropped': self.dropped,
+        }
+
+
+async def async_acquire(buckets: Sequence[TokenBucket]) -> float:
+    """
+    Take a token from every bucket, sleeping until all of them allow sending.
+
+    Raises `RateLimitExceeded` without consuming tokens when the wait would
+    exceed the shortest `max_delay` of the buckets.
+    """
+    if not buckets:
+        return 0.0
+
+    delays = [bucket.reserve() for bucket in buckets]
+    delay = max(delays)
+    if delay > min(bucket.max_delay for bucket in buckets):
+        for bucket, bucket_delay in zip(buckets, delays):
+            bucket.refund()
+            if bucket_delay == delay:
+                bucket.dropped += 1
+        _LOGGER.debug('Dropping request delayed by %.2f seconds by %s', delay, buckets)
+        raise RateLimitExceeded('Request would be delayed by %.2f seconds' % delay)
+
+    for bucket, bucket_delay in zip(buckets, delays):
+        bucket.acquired += 1
+        if bucket_delay:
+            bucket.throttled += 1
+            bucket.throttle_delay += bucket_delay
+
+    if delay:
+        await asyncio.sleep(delay)
+    return delay
+
+
+def subnet_of(address: str, prefix: int) -> Optional[str]:
+    """Return the network an IP address belongs to, or None for host names."""
+    try:
+        return str(ipaddress.ip_network('%s/%d' % (address, prefix), strict=False))
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Registry of token buckets shared by all SNMP traffic of an instance."""
+
+    def __init__(self):
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    def _bucket(self, key: Hashable, default_limits: Tuple[float, int, float],
+                limits: Tuple[float, int, float], owner: Optional[Hashable]) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*default_limits)
+            self._buckets[key] = bucket
+        if owner is not None:
+            bucket.set_limits(owner, *limits)
+        return bucket
+
+    def buckets_for(self, address: Tuple[str, int], config: Optional[Mapping[str, Any]] = None,
+                    owner: Optional[Hashable] = None) -> Tuple[TokenBucket, ...]:
+        """
+        Return agent and subnet buckets traffic to the given address passes through.
+
+        Limits from `config` replace those `owner` (the address itself by
+        default) set earlier; without configuration, buckets keep the limits
+        they have.
+        """
+        if config is None:
+            owner = None
+        elif owner is None:
+            owner = tuple(address[:2])
+        config = config or {}
+        host, port = address[0], address[1]
+        max_delay = config.get(CONF_MAX_DELAY, DEFAULT_MAX_DELAY)
+
+        buckets = [self._bucket(
+            ('agent', host, port),
+            (DEFAULT_RATE, DEFAULT_BURST, DEFAULT_MAX_DELAY),
+            (config.get(CONF_RATE, DEFAULT_RATE), config.get(CONF_BURST, DEFAULT_BURST), max_delay),
+            owner
+        )]
+
+        subnet = subnet_of(host, config.get(CONF_SUBNET_PREFIX, DEFAULT_SUBNET_PREFIX))
+        if subnet is not None:
+            buckets.append(self._bucket(
+                ('subnet', subnet),
+                (DEFAULT_SUBNET_RATE, DEFAULT_SUBNET_BURST, DEFAULT_MAX_DELAY),
+                (config.get(CONF_SUBNET_RATE, DEFAULT_SUBNET_RATE),
+                 config.get(CONF_SUBNET_BURST, DEFAULT_SUBNET_BURST), max_delay),
+                owner
+            ))
+
+        return tuple(buckets)
+
+    def release(self, owner: Hashable) -> None:
+        """Drop limits set by a device which is no longer polled."""
+        for bucket in self._buckets.values():
+            bucket.release(owner)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            ':'.join(map(str, key[1:])) if key[0] == 'agent' else key[1]: bucket.as_dict()
+            for key, bucket in self._buckets.items()
+        }
+
+
+def get_rate_limiter(hass: HomeAssistantType) -> RateLimiter:
+    rate_limiter = hass.data.get(DATA_RATE_LIMITER)
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+        hass.data[DATA_RATE_LIMITER] = rate_limiter
+    return rate_limiter
@@ -0,0 +1,123 @@
+"""Asynchronous host name resolution with a shared cache"""
+import asyncio
+import ipaddress
+import logging
+import socket
+from time import monotonic
+from typing import Dict, Optional, Tuple, Union
+
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .const import DATA_HOST_RESOLVER, DEFAULT_RESOLVE_TTL, DEFAULT_RESOLVE_NEGATIVE_TTL, DEFAULT_RESOLVE_TIMEOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+# Cached entries are resolved again in the background once this share of their TTL has passed
+REFRESH_AFTER = 0.8
+
+
+class HostResolutionError(OSError):
+    """Host name could not be resolved, possibly reported from the cache."""
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class HostResolver:
+    """
+    Resolves host names without blocking the event loop.
+
+    Results are cached for `ttl` seconds and failures for `negative_ttl`
+    seconds, so an unresponsive DNS server delays at most one lookup per
+    name at a time. Concurrent lookups of a name share a single query, and
+    entries close to expiry are refreshed in the background while the
+    cached address is still returned.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_RESOLVE_TTL, negative_ttl: float = DEFAULT_RESOLVE_NEGATIVE_TTL,
+                 timeout: float = DEFAULT_RESOLVE_TIMEOUT):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+
+        self._cache: Dict[str, Tuple[Union[str, HostResolutionError], float, float]] = {}
+        self._lookups: Dict[str, asyncio.Future] = {}
+
+    async def _async_lookup(self, host: str) -> str:
+        loop = asyncio.get_event_loop()
+        try:
+            address_info = await asyncio.wait_for(
+                loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_DGRAM),
+                self.timeout
+            )
+            result = address_info[0][4][0]
+            ttl = self.ttl
+        except (OSError, IndexError, asyncio.TimeoutError) as e:
+            result = HostResolutionError('Could not resolve %s: %s' % (host, str(e) or e.__class__.__name__))
+            ttl = self.negative_ttl
+
+        now = monotonic()
+        previous = self._cache.get(host)
+        if previous is not None and previous[0] != result and not isinstance(result, HostResolutionError):
+            _LOGGER.info('Host %s now resolves to %s', host, result)
+        self._cache[host] = (result, now + ttl * REFRESH_AFTER, now + ttl)
+
+        if isinstance(result, HostResolutionError):
+            raise result
+        return result
+
+    def _lookup(self, host: str) -> asyncio.Future:
+        lookup = self._lookups.get(host)
+        if lookup is None:
+            lookup = asyncio.ensure_future(self._async_lookup(host))
+            self._lookups[host] = lookup
+            lookup.add_done_callback(lambda _: self._lookups.pop(host, None))
+            # Failures are reported to waiters and cached; background refreshes have none
+            lookup.add_done_callback(lambda future: future.cancelled() or future.exception())
+        return lookup
+
+    def cached(self, host: str) -> Optional[str]:
+        """Return the cached address of a host, refreshing it in the background when stale."""
+        if is_ip_address(host):
+            return host
+
+        entry = self._cache.get(host)
+        if entry is None:
+            self._lookup(host)
+            return None
+
+        result, refresh_at, expires_at = entry
+        if monotonic() >= refresh_at:
+            self._lookup(host)
+        return None if isinstance(result, HostResolutionError) else result
+
+    async def async_resolve(self, host: str) -> str:
+        """Return the address of a host, from the cache when possible."""
+        if is_ip_address(host):
+            return host
+
+        entry = self._cache.get(host)
+        if entry is not None:
+            result, refresh_at, expires_at = entry
+            now = monotonic()
+            if now < expires_at:
+                if now >= refresh_at:
+                    self._lookup(host)
+                if isinstance(result, HostResolutionError):
+                    raise result
+                return result
+
+        return await asyncio.shield(self._lookup(host))
+
+
+def get_host_resolver(hass: HomeAssistantType) -> HostResolver:
+    resolver = hass.data.get(DATA_HOST_RESOLVER)
+    if resolver is None:
+        resolver = HostResolver()
+        hass.data[DATA_HOST_RESOLVER] = resolver
+    return resolver
@@ -0,0 +1,280 @@
+"""Compact row storage for retrieved SNMP data"""
+from datetime import timedelta
+from enum import Enum
+from numbers import Number
+from time import monotonic
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Sequence, Set, Tuple, Type
+
+__all__ = [
+    "ChunkedWalk",
+    "Row",
+    "StaticColumnCache",
+    "Table",
+    "diff_snapshots",
+    "make_row_type",
+    "numeric_value",
+    "to_json",
+]
+
+
+class Row:
+    """Base class for slotted row types generated from column lists."""
+    __slots__ = ()
+    columns: Tuple[str, ...] = ()
+
+    def __init__(self, *values):
+        for column, value in zip(self.columns, values):
+            setattr(self, column, value)
+        for column in self.columns[len(values):]:
+            setattr(self, column, None)
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[str, Any]) -> 'Row':
+        return cls(*(mapping.get(column) for column in cls.columns))
+
+    def values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, column) for column in self.columns)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.columns, self.values()))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.values())
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.values() == other.values()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (
+            self.__class__.__name__,
+            ', '.join('%s=%r' % item for item in zip(self.columns, self.values()))
+        )
+
+
+def make_row_type(name: str, columns: Iterable[str]) -> Type[Row]:
+    """Generate a slotted row type for the given column list."""
+    columns = tuple(columns)
+    return type(name, (Row,), {'__slots__': columns, 'columns': columns})
+
+
+class Table:
+    """Index-keyed array of rows retrieved from an SNMP table."""
+    __slots__ = ('indexes', 'rows')
+
+    def __init__(self, indexes: Iterable[Any] = (), rows: Iterable[Row] = ()):
+        self.indexes: Tuple[Any, ...] = tuple(indexes)
+        self.rows: Tuple[Row, ...] = tuple(rows)
+
+    def get(self, index: Any, default: Optional[Row] = None) -> Optional[Row]:
+        try:
+            return self.rows[self.indexes.index(index)]
+        except ValueError:
+            return default
+
+    def keys(self) -> Tuple[Any, ...]:
+        return self.indexes
+
+    def values(self) -> Tuple[Row, ...]:
+        return self.rows
+
+    def items(self) -> Iterator[Tuple[Any, Row]]:
+        return zip(self.indexes, self.rows)
+
+    def as_dict(self) -> Dict[Any, Dict[str, Any]]:
+        return {index: row.as_dict() for index, row in self.items()}
+
+    def __contains__(self, index: Any) -> bool:
+        return index in self.indexes
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.indexes)
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def __eq__(self, other):
+        if not isinstance(other, Table):
+            return NotImplemented
+        return self.indexes == other.indexes and self.rows == other.rows
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Table(%r)' % (dict(self.items()),)
+
+
+class ChunkedWalk:
+    """
+    Merged view of a table walked at most `max_rows` rows per poll.
+
+    The walk position is kept between polls as names of the last retrieved
+    row. Rows retrieved in earlier polls stay in the view until a complete
+    pass over the table no longer returns them. The first pass is not
+    bounded, so that entities are created for every row.
+    """
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.position: Optional[Sequence[Any]] = None
+        self.passes = 0
+
+        self._rows: Dict[Any, Row] = {}
+        self._order: Dict[Any, Tuple[int, ...]] = {}
+        self._retrieved_at: Dict[Any, float] = {}
+        self._pass_indexes: Set[Any] = set()
+
+    @property
+    def row_limit(self) -> Optional[int]:
+        """Maximum number of rows to retrieve in this poll, or None until the first pass completes."""
+        return self.max_rows if self.passes else None
+
+    def update(self, index: Any, row: Row, names: Sequence[Any]) -> None:
+        self._rows[index] = row
+        self._order[index] = tuple(names[0])
+        self._retrieved_at[index] = monotonic()
+        self._pass_indexes.add(index)
+        self.position = names
+
+    def finish_pass(self) -> None:
+        """Drop rows not returned by the pass which has just completed, and restart at the beginning."""
+        for index in [index for index in self._rows if index not in self._pass_indexes]:
+            del self._rows[index], self._order[index], self._retrieved_at[index]
+        self._pass_indexes = set()
+        self.position = None
+        self.passes += 1
+
+    def row_ages(self) -> Dict[Any, float]:
+        """Return seconds since each row in the view was last retrieved."""
+        now = monotonic()
+        return {index: now - retrieved_at for index, retrieved_at in self._retrieved_at.items()}
+
+    def table(self) -> Table:
+        indexes = sorted(self._rows, key=self._order.__getitem__)
+        return Table(indexes, (self._rows[index] for index in indexes))
+
+
+class StaticColumnCache:
+    """
+    Values of table columns which rarely change, e.g. storage descriptions
+    and sizes, so that polls only need to walk the remaining columns.
+
+    Cached values are retrieved again once a walked row is not cached, or
+    after `max_age` seconds.
+    """
+
+    def __init__(self, columns: Sequence[str], max_age: float):
+        self.columns = tuple(columns)
+        self.max_age = max_age
+
+        self._values: Dict[Any, Tuple[Any, ...]] = {}
+        self._retrieved_at: Optional[float] = None
+
+    @property
+    def fresh(self) -> bool:
+        return self._retrieved_at is not None and monotonic() - self._retrieved_at < self.max_age
+
+    def update(self, table: Table) -> None:
+        columns = self.columns
+        self._values = {
+            index: tuple(getattr(row, column) for column in columns)
+            for index, row in table.items()
+        }
+        self._retrieved_at = monotonic()
+
+    def merge(self, walked: Table, row_type: Type[Row]) -> Optional[Table]:
+        """Complete walked rows with cached columns, or return None if any of them is not cached."""
+        values = self._values
+        if any(index not in values for index in walked.indexes):
+            return None
+
+        rows = []
+        for index, walked_row in walked.items():
+            mapping = dict(zip(self.columns, values[index]))
+            mapping.update(zip(walked_row.columns, walked_row.values()))
+            rows.append(row_type.from_mapping(mapping))
+        return Table(walked.indexes, rows)
+
+
+def numeric_value(value: Any) -> Optional[float]:
+    """Convert a retrieved value to a float, or return None if it is not numeric."""
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, (bool, Number)):
+        return float(value)
+    return None
+
+
+def to_json(value: Any) -> Any:
+    """Convert retrieved data, including tables and rows, to JSON serializable values."""
+    if isinstance(value, (Table, Row)):
+        value = value.as_dict()
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_json(item) for item in value]
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Enum):
+        return value.name
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def diff_snapshots(old_data: Optional[Mapping[str, Any]], new_data: Mapping[str, Any]) -> Set[Tuple[str, Any]]:
+    """
+    Compare two retrieved snapshots.
+
+    Changed table rows are reported as `(key, index)` pairs, changed scalar
+    columns as `(key, column)` pairs.
+    """
+    if not old_data:
+        old_data = {}
+
+    changed = set()
+    for key, new_value in new_data.items():
+        old_value = old_data.get(key)
+        if old_value is new_value:
+            continue
+
+        if isinstance(new_value, Table):
+            if not isinstance(old_value, Table):
+                changed.update((key, index) for index in new_value.indexes)
+                continue
+            if old_value.indexes == new_value.indexes:
+                changed.update(
+                    (key, index)
+                    for index, old_row, new_row in zip(new_value.indexes, old_value.rows, new_value.rows)
+                    if old_row != new_row
+                )
+                continue
+            for index, new_row in new_value.items():
+                if old_value.get(index) != new_row:
+                    changed.add((key, index))
+            changed.update((key, index) for index in old_value.indexes if index not in new_value)
+
+        elif isinstance(new_value, Row):
+            if old_value.__class__ is not new_value.__class__:
+                changed.update((key, column) for column in new_value.columns)
+                continue
+            changed.update(
+                (key, column)
+                for column, old_column_value, new_column_value in zip(
+                    new_value.columns, old_value.values(), new_value.values()
+                )
+                if old_column_value != new_column_value
+            )
+
+    return changed
@@ -1,29 +1,107 @@
-import voluptuous as vol
-from homeassistant.const import CONF_TIMEOUT, CONF_HOST, CONF_PORT, CONF_NAME, \
-    CONF_SCAN_INTERVAL, CONF_TYPE
-from homeassistant.helpers import config_validation as cv
-
-from .const import CONF_VERSION, DEFAULT_VERSION, SNMP_VERSIONS, DEFAULT_PORT, \
-    CONF_COMMUNITY, \
-    DEFAULT_COMMUNITY, DEFAULT_TIMEOUT, DOMAIN, DEFAULT_SCAN_INTERVAL, SUPPORTED_DEVICE_TYPES
-
-SNMP_DISCOVERY_OPTIONS = {
-    'discover_v' + version: version
-    for version in SNMP_VERSIONS
-}
-
-DEVICE_SCHEMA = vol.Schema({
-    vol.Optional(CONF_NAME): cv.string,
-    vol.Required(CONF_TYPE): vol.In(SUPPORTED_DEVICE_TYPES),
-    vol.Required(CONF_HOST): cv.string,
-    vol.Optional(CONF_PORT, default=DEFAULT_PORT): cv.port,
-    vol.Optional(CONF_COMMUNITY, default=DEFAULT_COMMUNITY): cv.string,
-    vol.Optional(CONF_VERSION, default=DEFAULT_VERSION): vol.In(SNMP_VERSIONS),
-    vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.socket_timeout,
-    vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): cv.time_period,
-})
-
-
-CONFIG_SCHEMA = vol.Schema({
-    DOMAIN: vol.All(cv.ensure_list,[DEVICE_SCHEMA]),
-}, extra=vol.ALLOW_EXTRA)
\ No newline at end of file
+import voluptuous as vol
+from homeassistant.const import CONF_TIMEOUT, CONF_HOST, CONF_PORT, CONF_NAME, \
+    CONF_SCAN_INTERVAL, CONF_TYPE, CONF_USERNAME
+from homeassistant.helpers import config_validation as cv
+
+from .const import CONF_VERSION, DEFAULT_VERSION, SNMP_VERSIONS, DEFAULT_PORT, \
+    CONF_COMMUNITY, \
+    DEFAULT_COMMUNITY, DEFAULT_TIMEOUT, DOMAIN, DEFAULT_SCAN_INTERVAL, SUPPORTED_DEVICE_TYPES, \
+    SENSOR_TYPES, CONF_DEADBAND, CONF_MIN_DELTA, CONF_MIN_INTERVAL, DEVICE_SNMP_VERSIONS, SNMP_VERSION_3, \
+    CONF_AUTH_KEY, CONF_AUTH_PROTOCOL, CONF_PRIV_KEY, CONF_PRIV_PROTOCOL, SNMP_AUTH_PROTOCOLS, SNMP_PRIV_PROTOCOLS, \
+    DEFAULT_AUTH_PROTOCOL, DEFAULT_PRIV_PROTOCOL, CONF_MAX_REQUESTS, DEFAULT_MAX_REQUESTS, CONF_RATE_LIMIT, \
+    CONF_RATE, CONF_BURST, CONF_SUBNET_RATE, CONF_SUBNET_PREFIX, CONF_MAX_DELAY, DEFAULT_RATE, DEFAULT_BURST, \
+    DEFAULT_SUBNET_RATE, DEFAULT_SUBNET_PREFIX, DEFAULT_MAX_DELAY, CONF_EXPORT_METRICS, CONF_ADAPTIVE_POLLING, \
+    CONF_MAX_INTERVAL, CONF_BACKOFF_FACTOR, DEFAULT_ADAPTIVE_MIN_INTERVAL, DEFAULT_ADAPTIVE_MAX_INTERVAL, \
+    DEFAULT_BACKOFF_FACTOR, CONF_WALK_MAX_ROWS, CONF_REFRESH_MIN_AGE, DEFAULT_REFRESH_MIN_AGE, CONF_TABLES, \
+    CONF_MAX_AGE, CONF_POLL_DEADLINE, CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE, CONF_SUBNET_BURST, DEFAULT_SUBNET_BURST
+
+SNMP_DISCOVERY_OPTIONS = {
+    'discover_v' + version: version
+    for version in SNMP_VERSIONS
+}
+
+DEADBAND_SCHEMA = vol.Schema({
+    vol.Optional(CONF_MIN_DELTA): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional(CONF_MIN_INTERVAL): cv.time_period,
+})
+
+RATE_LIMIT_SCHEMA = vol.Schema({
+    vol.Optional(CONF_RATE, default=DEFAULT_RATE): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    vol.Optional(CONF_BURST, default=DEFAULT_BURST): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    vol.Optional(CONF_SUBNET_RATE, default=DEFAULT_SUBNET_RATE): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    vol.Optional(CONF_SUBNET_BURST, default=DEFAULT_SUBNET_BURST): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    vol.Optional(CONF_SUBNET_PREFIX, default=DEFAULT_SUBNET_PREFIX): vol.All(vol.Coerce(int), vol.Range(min=0, max=128)),
+    vol.Optional(CONF_MAX_DELAY, default=DEFAULT_MAX_DELAY): vol.All(vol.Coerce(float), vol.Range(min=0)),
+})
+
+def validate_adaptive_polling(config):
+    """Validate that the fast poll interval does not exceed the slow one."""
+    if config[CONF_MIN_INTERVAL] > config[CONF_MAX_INTERVAL]:
+        raise vol.Invalid('Minimum interval must not exceed maximum interval', path=[CONF_MIN_INTERVAL])
+    return config
+
+
+ADAPTIVE_POLLING_SCHEMA = vol.All(vol.Schema({
+    vol.Optional(CONF_MIN_INTERVAL, default=DEFAULT_ADAPTIVE_MIN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_MAX_INTERVAL, default=DEFAULT_ADAPTIVE_MAX_INTERVAL): cv.time_period,
+    vol.Optional(CONF_BACKOFF_FACTOR, default=DEFAULT_BACKOFF_FACTOR): vol.All(vol.Coerce(float), vol.Range(min=1)),
+}), validate_adaptive_polling)
+
+DEVICE_SCHEMA = vol.Schema({
+    vol.Optional(CONF_NAME): cv.string,
+    vol.Required(CONF_TYPE): vol.In(SUPPORTED_DEVICE_TYPES),
+    vol.Required(CONF_HOST): cv.string,
+    vol.Optional(CONF_PORT, default=DEFAULT_PORT): cv.port,
+    vol.Optional(CONF_COMMUNITY, default=DEFAULT_COMMUNITY): cv.string,
+    vol.Optional(CONF_VERSION, default=DEFAULT_VERSION): vol.In(DEVICE_SNMP_VERSIONS),
+    vol.Optional(CONF_USERNAME): cv.string,
+    vol.Optional(CONF_AUTH_KEY): cv.string,
+    vol.Optional(CONF_AUTH_PROTOCOL, default=DEFAULT_AUTH_PROTOCOL): vol.In(SNMP_AUTH_PROTOCOLS),
+    vol.Optional(CONF_PRIV_KEY): cv.string,
+    vol.Optional(CONF_PRIV_PROTOCOL, default=DEFAULT_PRIV_PROTOCOL): vol.In(SNMP_PRIV_PROTOCOLS),
+    vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.socket_timeout,
+    vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_MAX_REQUESTS, default=DEFAULT_MAX_REQUESTS): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    vol.Optional(CONF_RATE_LIMIT, default={}): RATE_LIMIT_SCHEMA,
+    vol.Optional(CONF_EXPORT_METRICS, default=False): cv.boolean,
+    vol.Optional(CONF_ADAPTIVE_POLLING): ADAPTIVE_POLLING_SCHEMA,
+    vol.Optional(CONF_WALK_MAX_ROWS): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    vol.Optional(CONF_REFRESH_MIN_AGE, default=DEFAULT_REFRESH_MIN_AGE): cv.time_period,
+    vol.Optional(CONF_POLL_DEADLINE): cv.time_period,
+    vol.Optional(CONF_HISTORY_SIZE, default=DEFAULT_HISTORY_SIZE): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional(CONF_DEADBAND, default={}): {
+        vol.Optional(sensor_type): DEADBAND_SCHEMA
+        for sensor_type in SENSOR_TYPES
+    },
+})
+
+
+
+def validate_usm_config(config):
+    """Validate presence of SNMPv3 credentials required by selected protocols."""
+    if config[CONF_VERSION] != SNMP_VERSION_3:
+        return config
+
+    if not config.get(CONF_USERNAME):
+        raise vol.Invalid('SNMPv3 requires a username', path=[CONF_USERNAME])
+    if config[CONF_AUTH_PROTOCOL] != 'none' and not config.get(CONF_AUTH_KEY):
+        raise vol.Invalid('Authentication protocol requires an authentication key', path=[CONF_AUTH_KEY])
+    if config[CONF_PRIV_PROTOCOL] != 'none':
+        if config[CONF_AUTH_PROTOCOL] == 'none':
+            raise vol.Invalid('Privacy protocol requires an authentication protocol', path=[CONF_AUTH_PROTOCOL])
+        if not config.get(CONF_PRIV_KEY):
+            raise vol.Invalid('Privacy protocol requires a privacy key', path=[CONF_PRIV_KEY])
+
+    return config
+
+
+CONFIG_SCHEMA = vol.Schema({
+    DOMAIN: vol.All(cv.ensure_list,[vol.All(DEVICE_SCHEMA, validate_usm_config)]),
+}, extra=vol.ALLOW_EXTRA)
+
+REFRESH_SERVICE_SCHEMA = vol.Schema({
+    vol.Required(CONF_HOST): cv.string,
+    vol.Optional(CONF_PORT, default=DEFAULT_PORT): cv.port,
+    vol.Optional(CONF_TABLES): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(CONF_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+})
@@ -7,7 +7,10 @@ https://home-assistant.io/components/sensor.snmp/
 import asyncio
 import logging
 from datetime import timedelta
-from typing import Optional, Dict, Any, Union, Tuple, List, TYPE_CHECKING, Type
+from functools import partial
+from time import time
+from typing import Optional, Dict, Any, Union, Tuple, List, TYPE_CHECKING, Type, Iterable, Collection, \
+    FrozenSet, Awaitable
 
 from homeassistant.components.sensor import PLATFORM_SCHEMA, DOMAIN as SENSOR_DOMAIN
 from homeassistant.config_entries import ConfigEntry
@@ -17,32 +20,37 @@ from homeassistant.const import (
     STATE_PROBLEM, STATE_IDLE, CONF_TYPE, EVENT_HOMEASSISTANT_START, STATE_OK)
 from homeassistant.exceptions import PlatformNotReady
 from homeassistant.helpers.device_registry import CONNECTION_NETWORK_MAC
-from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.typing import HomeAssistantType
 
-from .const import DOMAIN, SUPPORTED_DEVICE_TYPES, SNMP_VERSIONS, CONF_VERSION, \
-    CONF_COMMUNITY, DATA_DEVICE_CONFIGS, DEFAULT_SCAN_INTERVAL, SUPPLIES_ICONS, DEFAULT_SUPPLIES_ICON, \
-    DATA_DEVICE_LISTENERS, DATA_DEVICE_ENTITIES
+from .const import DOMAIN, SUPPORTED_DEVICE_TYPES, SNMP_VERSION_3, CONF_VERSION, CONF_COMMUNITY, \
+    DATA_DEVICE_CONFIGS, DEFAULT_SCAN_INTERVAL, SUPPLIES_ICONS, DEFAULT_SUPPLIES_ICON, \
+    DATA_DEVICE_LISTENERS, SENSOR_TYPE_STATUS, SENSOR_TYPE_MILEAGE, SENSOR_TYPE_TONER, SENSOR_TYPE_PAPER_INPUT, \
+    CONF_DEADBAND, CONF_MIN_INTERVAL, CONF_MAX_REQUESTS, DEFAULT_MAX_REQUESTS, CONF_RATE_LIMIT, CONF_EXPORT_METRICS, \
+    DATA_AGENT_IDENTITIES, CONF_ADAPTIVE_POLLING, CONF_WALK_MAX_ROWS, CONF_REFRESH_MIN_AGE, DEFAULT_REFRESH_MIN_AGE, \
+    CONF_POLL_DEADLINE, SENSOR_TYPE_CPU_LOAD, SENSOR_TYPE_PROCESSES, SENSOR_TYPE_STORAGE, STORAGE_ICONS, \
+    DEFAULT_STORAGE_ICON, CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE, DEFAULT_MAX_REPETITIONS
 from .enums import CapacityLevelType, CapacityUnitType, PrinterDeviceStatus, PrinterActionStatus, SuppliesClass, \
-    SuppliesType, CAPACITY_LEVEL_TYPE, PaperInputType, PrinterDetectedErrorState
+    SuppliesType, CAPACITY_LEVEL_TYPE, PaperInputType, PrinterDetectedErrorState, StorageType
+from .client import SNMPClient, SNMPError, ERROR_STATUS_NO_SUCH_NAME
+from .forecast import SupplyForecast
+from .history import DeviceHistory, get_history_budget
+from .identity import async_get_engine_identity, async_get_agent_address_book, async_locate_agent, \
+    identity_from_macs
+from .poller import SNMPDevicePoller, DataSource
+from .ratelimit import get_rate_limiter
+from .resolver import get_host_resolver
+from .rows import ChunkedWalk, Row, StaticColumnCache, Table, make_row_type
 from .schemas import DEVICE_SCHEMA
+from .usm import async_get_usm_key_cache, async_build_auth_data
 
 if TYPE_CHECKING:
     from .enums import _FriendlyEnum
-    # noinspection PyProtectedMember
-    from pysnmp.hlapi.transport import AbstractTransportTarget
-    from pysnmp.hlapi import SnmpEngine, CommunityData, ContextData
 
 REQUIREMENTS = ['pysnmp==4.4.12']
 
 _LOGGER = logging.getLogger(__name__)
 
-SENSOR_TYPE_STATUS = 'status'
-SENSOR_TYPE_MILEAGE = 'mileage'
-SENSOR_TYPE_TONER = 'toner'
-SENSOR_TYPE_PAPER_INPUT = 'paper_input'
-
 STATE_MAPPING = {
     PrinterDeviceStatus.UNKNOWN: STATE_UNKNOWN,
     PrinterDeviceStatus.WARNING: STATE_PROBLEM,
@@ -54,6 +62,12 @@ STATE_MAPPING = {
     PrinterActionStatus.OFFLINE: STATE_OFF,
 }
 
+# Printer states in which supply levels and counters change quickly
+ACTIVE_PRINTER_STATUSES = (PrinterActionStatus.PRINTING, PrinterActionStatus.WARMUP)
+
+# Seconds after which static table columns are retrieved again, e.g. to notice resized volumes
+STATIC_COLUMNS_MAX_AGE = 3600
+
 INFO_KEY = 'info_key'
 ENTITY = 'entity'
 ATTR_ATTRIBUTES = 'attributes'
@@ -65,6 +79,9 @@ SENSOR_OID_DEFINITIONS = {
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(DEVICE_SCHEMA.schema)
 
+AdditionalInfoRow = make_row_type('AdditionalInfoRow', ('manufacturer', 'model', 'sw_version'))
+ForecastRow = make_row_type('ForecastRow', ('days_until_empty', 'pages_per_percent'))
+
 def level_capacity(level: Union[CapacityLevelType, int], capacity: Union[CapacityLevelType, int]) -> Tuple[Union[str, int], Optional[str], Union[str, int]]:
     unit_of_measurement = None
 
@@ -83,101 +100,141 @@ def level_capacity(level: Union[CapacityLevelType, int], capacity: Union[Capacit
     return level, unit_of_measurement, capacity
 
 
-def pysnmp_get(snmp_engine: 'SnmpEngine', community_obj: 'CommunityData', target_obj: 'AbstractTransportTarget',
-               context_obj: 'ContextData', sub_keys):
-    from pysnmp.hlapi import ObjectType, ObjectIdentity, getCmd
-    #from pysnmp.proto.rfc1905 import endOfMibView
-
-    return_data = {}
-    var_binds = [
-        ObjectType(ObjectIdentity(oid))
-        for oid, converter in sub_keys.values()
-    ]
-
-    for (error_indication,
-         error_status,
-         error_index,
-         var_bind_table) in getCmd(snmp_engine,
-                                 community_obj,
-                                 target_obj,
-                                 context_obj,
-                                 *var_binds,
-                                 lexicographicalMode=False,
-                                 lookupMib=False):
-        if error_indication:
-            raise Exception(error_indication)
-        elif error_status:
-            raise Exception('%s at %s' % (
-                error_status.prettyPrint(),
-                error_index and var_binds[int(error_index) - 1][0] or '?'
-            ))
-        else:
-            for (oid_obj, val_obj), (sub_key_name, (oid, converter)) in zip(var_bind_table, sub_keys.items()):
-                return_data[sub_key_name] = converter(val_obj)
+def optional_int(value) -> Optional[int]:
+    """Convert a retrieved integer, or return None for objects the agent does not implement."""
+    from pyasn1.type.univ import Null
+    return None if isinstance(value, Null) else int(value)
+
+
+def unsigned_int(value) -> int:
+    """Convert an Integer32 some agents wrap around when reporting large unsigned values."""
+    return int(value) % 2 ** 32
 
-    return return_data
 
-def pysnmp_next(snmp_engine: 'SnmpEngine', community_obj: 'CommunityData', target_obj: 'AbstractTransportTarget',
-                context_obj: 'ContextData', sub_keys, index_oid=None):
-    from pysnmp.hlapi import ObjectType, ObjectIdentity, nextCmd
+async def async_pysnmp_get(client: SNMPClient, sub_keys) -> Tuple[Any, ...]:
+    values = await client.async_get([oid for oid, converter in sub_keys.values()])
+
+    return tuple(
+        converter(val_obj)
+        for val_obj, (oid, converter) in zip(values, sub_keys.values())
+    )
+
+async def async_pysnmp_next(client: SNMPClient, sub_keys, row_type: Type[Row], index_oid=None,
+                            chunked_walk: Optional[ChunkedWalk] = None) -> Table:
+    """
+    Walk a table. With `chunked_walk`, the walk resumes from its position,
+    stops after its row limit and the merged view of the table is returned.
+    """
     from pysnmp.proto.rfc1905 import endOfMibView
 
-    return_data = {}
-    var_binds = [
-        ObjectType(ObjectIdentity(oid))
-        for oid, converter in sub_keys.values()
-    ]
+    indexes = []
+    rows = []
+    oids = [oid for oid, converter in sub_keys.values()]
     index_converter = None
     if isinstance(index_oid, tuple):
-        var_binds.insert(0, ObjectType(ObjectIdentity(index_oid[0])))
+        oids.insert(0, index_oid[0])
         index_converter = index_oid[1]
 
-    for (error_indication,
-         error_status,
-         error_index,
-         var_bind_table) in nextCmd(snmp_engine,
-                                    community_obj,
-                                    target_obj,
-                                    context_obj,
-                                    *var_binds,
-                                    lexicographicMode=False,
-                                    lookupMib=False):
-
-        if error_indication:
-            raise Exception(error_indication)
-        elif error_status:
-            raise Exception('%s at %s' % (
-                error_status.prettyPrint(),
-                error_index and var_binds[int(error_index) - 1][0] or '?'
-            ))
+    start_names = None
+    row_limit = None
+    if chunked_walk is not None:
+        start_names = chunked_walk.position
+        row_limit = chunked_walk.row_limit
+
+    async for var_bind_table in client.async_walk(oids, start_names, row_limit):
+        current_index = None
+        current_values = []
+        var_bind_iter = iter(var_bind_table)
+
+        if index_converter is not None:
+            oid_obj, val_obj = next(var_bind_iter)
+            if val_obj.isSameTypeWith(endOfMibView):
+                break
+            current_index = index_converter(val_obj)
+
+        for (oid_obj, val_obj), (sub_key_name, (oid, converter)) in zip(var_bind_iter, sub_keys.items()):
+            if val_obj.isSameTypeWith(endOfMibView):
+                break
+
+            if current_index is None:
+                current_index = converter(val_obj) if sub_key_name == '_index' else oid_obj[-1]
+
+            current_values.append(converter(val_obj))
+
+        indexes.append(current_index)
+        rows.append(row_type(*current_values))
+
+        if chunked_walk is not None:
+            chunked_walk.update(current_index, rows[-1], [name for name, val in var_bind_table])
+            if row_limit is not None and len(rows) >= row_limit:
+                return chunked_walk.table()
+
+    if chunked_walk is not None:
+        chunked_walk.finish_pass()
+        return chunked_walk.table()
+
+    return Table(indexes, rows)
+
+
+async def async_gather_partial(fetches: Dict[str, Awaitable[Any]], deadline: float,
+                               raise_empty: bool = True) -> Dict[str, Any]:
+    """
+    Run fetches concurrently for at most `deadline` seconds and return results
+    of those which succeeded in time, keyed like `fetches`.
+    """
+    tasks = {key: asyncio.ensure_future(fetch) for key, fetch in fetches.items()}
+    if not tasks:
+        return {}
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=max(deadline, 0))
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    errors = {}
+    for key, task in tasks.items():
+        if task in pending:
+            errors[key] = SNMPError('Not retrieved within %.1f seconds' % deadline)
+        elif task.exception() is not None:
+            errors[key] = task.exception()
         else:
-            current_index = None
-            current_data = dict()
-            var_bind_iter = iter(var_bind_table)
+            results[key] = task.result()
 
-            if index_converter is not None:
-                oid_obj, val_obj = next(var_bind_iter)
-                if val_obj.isSameTypeWith(endOfMibView):
-                    break
-                current_index = index_converter(val_obj)
+    if errors:
+        _LOGGER.debug('Keeping previous data for %s: %s', ', '.join(errors), errors)
+        if not results and raise_empty:
+            error = next(iter(errors.values()))
+            raise error if isinstance(error, SNMPError) else SNMPError(str(error) or error.__class__.__name__)
 
-            for (oid_obj, val_obj), (sub_key_name, (oid, converter)) in zip(var_bind_iter, sub_keys.items()):
-                if val_obj.isSameTypeWith(endOfMibView):
-                    break
+    return results
 
-                if current_index is None:
-                    current_index = converter(val_obj) if sub_key_name == '_index' else oid_obj[-1]
 
-                current_data[sub_key_name] = converter(val_obj)
+async def async_identify_agent(client: SNMPClient, sensor_class: Type['_SNMPSensor'],
+                               known_identities: Iterable[str] = (), keys: Optional[Collection[str]] = None) \
+        -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Identify the agent behind a client along with data retrieved on the way.
 
-            return_data[current_index] = current_data
+    Data is retrieved when the agent has no engine ID to identify it with,
+    or when its engine ID is not one of `known_identities`; only `keys` of
+    it when given.
+    """
+    identity = await async_get_engine_identity(client)
+    if identity is not None and identity in known_identities:
+        return identity, None
 
-    return return_data
+    if keys is not None:
+        keys = [key_name for key_name, _ in sensor_class.update_oid_mapping if key_name in keys]
+        if not keys:
+            return identity, None
+
+    retrieved_data = await sensor_class.async_retrieve_data(client, keys)
+    return identity or identity_from_macs(retrieved_data), retrieved_data
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the SNMP sensor."""
-    from pysnmp.hlapi import SnmpEngine, CommunityData, UdpTransportTarget
+    from pysnmp.hlapi.asyncio import SnmpEngine, UdpTransportTarget
 
     _LOGGER.debug('config: %s', config)
 
@@ -190,62 +247,206 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
     if isinstance(scan_interval, int):
         scan_interval = timedelta(seconds=scan_interval)
 
-    community = config[CONF_COMMUNITY]
-    timeout = config[CONF_TIMEOUT]
-    snmp_version = SNMP_VERSIONS[config[CONF_VERSION]]
+    key_cache = await async_get_usm_key_cache(hass)
+
+    address_book = await async_get_agent_address_book(hass)
+    rate_limiter = get_rate_limiter(hass)
+    resolver = get_host_resolver(hass)
 
     try:
         engine = SnmpEngine()
-        community_data = CommunityData(community, mpModel=snmp_version)
-        transport_target = UdpTransportTarget((host, port), timeout=timeout, retries=0)
+        # Agents that moved since the entry was configured are polled at their last known address
+        connect_host, connect_port = address_book.get_address(host, port)
+        resolved_host = await resolver.async_resolve(connect_host)
+        transport_target = UdpTransportTarget((resolved_host, connect_port), timeout=config[CONF_TIMEOUT], retries=0)
+        rate_limits = rate_limiter.buckets_for(
+            transport_target.transportAddr, config.get(CONF_RATE_LIMIT), (host, port)
+        )
+        auth_data = await async_build_auth_data(engine, transport_target, config, key_cache, rate_limits)
+        client = SNMPClient(
+            snmp_engine=engine,
+            auth_data=auth_data,
+            transport_target=transport_target,
+            max_requests=config.get(CONF_MAX_REQUESTS, DEFAULT_MAX_REQUESTS),
+            rate_limits=rate_limits,
+            max_var_binds=address_book.get_max_var_binds(host, port),
+            max_var_binds_learned=partial(address_book.set_max_var_binds, host, port),
+            max_repetitions=address_book.get_max_repetitions(host, port) or DEFAULT_MAX_REPETITIONS,
+            max_repetitions_learned=partial(address_book.set_max_repetitions, host, port),
+        )
 
         sensor_class: Type[_SNMPSensor] = globals()[SUPPORTED_DEVICE_TYPES[device_type]]
 
-        def create_entities():
-            _LOGGER.debug('Creating entities with name %s, host %s, port %s' % (name, host, port))
-            first_retrieved_data = sensor_class.retrieve_data(
-                snmp_engine=engine,
-                community_data=community_data,
-                transport_target=transport_target
-            )
-            return sensor_class.create_sensors(
-                host=host, port=port,
-                base_name=name,
-                sensor_types=None,
-                received_data=first_retrieved_data
-            )
+        chunked_walks = None
+        if config.get(CONF_WALK_MAX_ROWS):
+            chunked_walks = sensor_class.create_chunked_walks(config[CONF_WALK_MAX_ROWS])
+        static_caches = sensor_class.create_static_column_caches()
 
-        created_entities: List[_SNMPSensor] = await hass.async_add_executor_job(create_entities)
-        added_entities: List[_SNMPSensor] = list()
+        forecasts = {
+            int(index): SupplyForecast.from_dict(state)
+            for index, state in address_book.get_forecasts(host, port).items()
+        }
 
-        async def update_entities(*_):
-            if not added_entities:
-                _LOGGER.debug('Added entities for %s:%d is empty, not updating', host, port)
+        def update_forecasts(received_data: Dict[str, Union[Table, Row]]) -> None:
+            if sensor_class.update_forecasts(forecasts, received_data, time()):
+                address_book.set_forecasts(host, port, {
+                    str(index): forecast.as_dict()
+                    for index, forecast in forecasts.items()
+                })
+
+        def follow_host_address() -> None:
+            """Re-point the client when the configured host name resolves to another address."""
+            nonlocal resolved_host
+            address = resolver.cached(connect_host)
+            if address is None or address == resolved_host:
                 return
 
-            retrieved_data = sensor_class.retrieve_data(
-                snmp_engine=engine,
-                community_data=community_data,
-                transport_target=transport_target
+            _LOGGER.warning('Host %s now resolves to %s, polling it there', connect_host, address)
+            resolved_host = address
+            client.retarget(
+                UdpTransportTarget((address, connect_port), timeout=config[CONF_TIMEOUT], retries=0),
+                rate_limiter.buckets_for((address, connect_port), config.get(CONF_RATE_LIMIT), (host, port)),
             )
 
-            _LOGGER.debug('Received update data: %s', retrieved_data)
+        async def retrieve_data(keys: Optional[Collection[str]] = None, deadline: Optional[float] = None):
+            follow_host_address()
+            received_data = await sensor_class.async_retrieve_data(client, keys, chunked_walks, deadline, static_caches)
+            update_forecasts(received_data)
+            return received_data
 
-            tasks = []
-            for entity in added_entities:
-                if entity.update_sensor_attributes(retrieved_data):
-                    _LOGGER.debug('Updating attributes for %s', entity)
-                    tasks.append(entity.async_update_ha_state())
-                else:
-                    _LOGGER.debug('Skipping attribute update for %s', entity)
-            if tasks:
-                await asyncio.wait(tasks)
+        async def resolve_identity(address: Tuple[str, int]) -> Optional[str]:
+            candidate_client = SNMPClient(
+                snmp_engine=engine,
+                auth_data=auth_data,
+                transport_target=UdpTransportTarget(address, timeout=config[CONF_TIMEOUT], retries=0),
+                max_requests=client.max_requests,
+                rate_limits=rate_limiter.buckets_for(address),
+                max_var_binds=client.max_var_binds,
+                max_repetitions=client.max_repetitions,
+            )
+            # Interface addresses are all that is needed to tell agents without an engine ID apart
+            candidate_identity, _ = await async_identify_agent(candidate_client, sensor_class, keys=('network_info',))
+            return candidate_identity
+
+        async def relocate() -> bool:
+            """Look for the agent on the network by its identity and re-point the client to it."""
+            known_identity = address_book.get_identity(host, port)
+            if known_identity is None or config[CONF_VERSION] == SNMP_VERSION_3:
+                return False
+
+            current_address = tuple(client.transport_target.transportAddr[:2])
+            new_address = await async_locate_agent(
+                hass, known_identity, [(config[CONF_VERSION], config[CONF_COMMUNITY])], port,
+                resolve_identity, exclude=[current_address]
+            )
+            if new_address is None:
+                _LOGGER.debug('Agent %s configured at %s:%s was not found on the network',
+                              known_identity, host, port)
+                return False
+
+            _LOGGER.warning('Agent configured at %s:%s moved from %s:%s to %s:%s',
+                            host, port, current_address[0], current_address[1], new_address[0], new_address[1])
+            client.retarget(
+                UdpTransportTarget(new_address, timeout=config[CONF_TIMEOUT], retries=0),
+                rate_limiter.buckets_for(new_address, config.get(CONF_RATE_LIMIT), (host, port)),
+            )
+            address_book.set_address(host, port, new_address)
+            return True
+
+        async def reconfigure() -> None:
+            """Adopt changed timeout, credentials and rate limits on the running client."""
+            nonlocal auth_data
+            address = tuple(client.transport_target.transportAddr[:2])
+            client.retarget(
+                UdpTransportTarget(address, timeout=config[CONF_TIMEOUT], retries=0),
+                rate_limiter.buckets_for(address, config.get(CONF_RATE_LIMIT), (host, port)),
+            )
+            auth_data = await async_build_auth_data(engine, client.transport_target, config, key_cache,
+                                                    client.rate_limits)
+            client.auth_data = auth_data
+
+        # Entries pointing at different addresses of one agent share a single poller
+        agent_identities: Dict[str, SNMPDevicePoller] = hass.data.setdefault(DATA_AGENT_IDENTITIES, dict())
+        try:
+            identity, first_retrieved_data = await async_identify_agent(client, sensor_class, agent_identities)
+        except SNMPError:
+            if not await relocate():
+                raise
+            identity, first_retrieved_data = await async_identify_agent(client, sensor_class, agent_identities)
+
+        shared_poller = agent_identities.get(identity) if identity else None
+        if shared_poller is not None and (
+                shared_poller.stopped
+                or (shared_poller.host, shared_poller.port) == (host, port)
+                or shared_poller not in hass.data.get(DATA_DEVICE_LISTENERS, {}).values()):
+            # Left behind by an entry which failed to unload cleanly, possibly this one
+            _LOGGER.debug('Discarding stale poller of %s:%s for %s', shared_poller.host, shared_poller.port, identity)
+            shared_poller.stop()
+            del agent_identities[identity]
+            shared_poller = None
+            # Data was not retrieved for an identity which was already known
+            identity, first_retrieved_data = await async_identify_agent(client, sensor_class)
+
+        if shared_poller is not None:
+            _LOGGER.warning('Device at %s:%s is the same agent as %s:%s (%s), sharing its poller',
+                            host, port, shared_poller.host, shared_poller.port, identity)
+            shared_poller.addresses.add((host, port))
+            hass.data.setdefault(DATA_DEVICE_LISTENERS, dict())
+            hass.data[DATA_DEVICE_LISTENERS][(host, port)] = shared_poller
+            return True
+
+        if first_retrieved_data is not None:
+            update_forecasts(first_retrieved_data)
+
+        _LOGGER.debug('Creating entities with name %s, host %s, port %s' % (name, host, port))
+        created_entities = sensor_class.create_sensors(
+            host=host, port=port,
+            base_name=name,
+            sensor_types=None,
+            received_data=first_retrieved_data
+        )
+
+        deadbands = {
+            sensor_type: dict(deadband)
+            for sensor_type, deadband in sensor_class.default_deadbands.items()
+        }
+        for sensor_type, deadband in config.get(CONF_DEADBAND, {}).items():
+            deadbands.setdefault(sensor_type, {}).update(deadband)
+
+        # Entries created in the UI do not pass the YAML schema supplying the default
+        history_size = config.get(CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE)
+        poller = SNMPDevicePoller(
+            hass=hass,
+            host=host,
+            port=port,
+            retrieve_data=retrieve_data,
+            scan_interval=scan_interval,
+            received_data=first_retrieved_data,
+            deadbands=deadbands,
+            export_metrics=config.get(CONF_EXPORT_METRICS, False),
+            relocate=relocate,
+            adaptive_polling=config.get(CONF_ADAPTIVE_POLLING),
+            is_active=sensor_class.is_active,
+            retrieval_plan=sensor_class.retrieval_plan,
+            refresh_min_age=config.get(CONF_REFRESH_MIN_AGE, DEFAULT_REFRESH_MIN_AGE),
+            poll_deadline=config.get(CONF_POLL_DEADLINE),
+            reconfigure=reconfigure,
+            history=DeviceHistory(get_history_budget(hass), history_size) if history_size else None,
+            row_ages=(lambda: {key: walk.row_ages() for key, walk in chunked_walks.items()}) if chunked_walks else None,
+        )
+        if identity:
+            poller.identity = identity
+            agent_identities[identity] = poller
+            address_book.set_identity(host, port, identity)
+
+        if poller.export_metrics:
+            from .metrics import async_register_metrics_view
+            async_register_metrics_view(hass)
+        from .metrics import async_register_json_views
+        async_register_json_views(hass)
 
         hass.data.setdefault(DATA_DEVICE_LISTENERS, dict())
-        hass.data[DATA_DEVICE_LISTENERS][(host, port)] = (update_entities, scan_interval, None)
-
-        hass.data.setdefault(DATA_DEVICE_ENTITIES, dict())
-        hass.data[DATA_DEVICE_ENTITIES][(host, port)] = added_entities
+        hass.data[DATA_DEVICE_LISTENERS][(host, port)] = poller
 
         async_add_entities(created_entities)
 
@@ -255,6 +456,10 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
         _LOGGER.warning('Device unavailable, retrying later')
         _LOGGER.exception('retry reason: %s' % str(e))
 
+        if config[CONF_VERSION] == SNMP_VERSION_3:
+            # Agent may have been replaced and have a different engine ID
+            key_cache.forget_engine_id(host, port)
+
         raise PlatformNotReady
 
 async def async_setup_entry(hass: HomeAssistantType, config_entry: ConfigEntry, async_add_devices):
@@ -270,22 +475,43 @@ async def async_setup_entry(hass: HomeAssistantType, config_entry: ConfigEntry,
         discovery_info=None
     )
 
-async def async_unload_entry(hass: HomeAssistantType, config_entry: ConfigEntry):
-    device_listeners = hass.data.get(DATA_DEVICE_LISTENERS)
-    host = config_entry.data[CONF_HOST]
-    port = config_entry.data[CONF_PORT]
-    _LOGGER.debug('Current device listeners: %s' % device_listeners)
-    _LOGGER.debug('Unloading sensor entry for %s:%d', host, port)
-    if device_listeners and (host, port) in device_listeners:
-        device_listeners[(host, port)]()
-
-    return True
-
 class _SNMPSensor(RestoreEntity):
     """Representation of a SNMP sensor."""
     single_sensor_types: List[str] = NotImplemented
     multi_sensor_types: Dict[str, str] = NotImplemented
     update_oid_mapping = NotImplemented
+    row_types: Dict[str, Type[Row]] = NotImplemented
+    walked_row_types: Dict[str, Type[Row]] = NotImplemented
+    default_deadbands: Dict[str, Dict[str, Any]] = {}
+    # Data keys entities of each sensor type are updated from
+    sensor_type_keys: Dict[str, Tuple[str, ...]] = NotImplemented
+    # Data keys retrieved on every poll, regardless of which entities are enabled
+    always_retrieved_keys: Tuple[str, ...] = ('info',)
+    # Table columns which rarely change and are cached instead of walked on every poll
+    static_columns: Dict[str, Tuple[str, ...]] = {}
+    # Table columns computed from retrieved ones
+    derived_columns: Dict[str, Tuple[str, ...]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.update_oid_mapping is not NotImplemented:
+            cls.row_types = {
+                key_name: make_row_type(
+                    cls.__name__ + ''.join(map(str.capitalize, key_name.split('_'))) + 'Row',
+                    (*sub_keys.keys(), *cls.derived_columns.get(key_name, ()))
+                )
+                for (key_name, index_oid), sub_keys in cls.update_oid_mapping.items()
+            }
+            # Rows of tables walked without their static columns
+            cls.walked_row_types = {
+                key_name: make_row_type(
+                    cls.row_types[key_name].__name__,
+                    (sub_key_name for sub_key_name in sub_keys if sub_key_name not in cls.static_columns[key_name])
+                )
+                for (key_name, index_oid), sub_keys in cls.update_oid_mapping.items()
+                if key_name in cls.static_columns
+            }
+
     def __init__(self, host, port, sensor_type, base_name: str, entity_index: Optional[int] = None,
                  received_data: Optional[dict] = None):
         """Initialize the sensor."""
@@ -298,6 +524,8 @@ class _SNMPSensor(RestoreEntity):
 
         self._icon = None
         self._last_data = None
+        self._colorant_index = None
+        self._static_attributes = None
         self._state = None
         self._attributes = None
         self._unit_of_measurement = None
@@ -312,9 +540,9 @@ class _SNMPSensor(RestoreEntity):
     def create_sensors(cls, host, port, base_name, sensor_types, received_data) -> List['_SNMPSensor']:
         new_entities = []
 
-        # @TODO: respect `sensor_types` argument
-
         for sensor_type in cls.single_sensor_types:
+            if sensor_types is not None and sensor_type not in sensor_types:
+                continue
             new_entities.append(cls(
                 host=host, port=port,
                 base_name=base_name,
@@ -323,6 +551,8 @@ class _SNMPSensor(RestoreEntity):
             ))
 
         for sensor_type, data_key in cls.multi_sensor_types.items():
+            if sensor_types is not None and sensor_type not in sensor_types:
+                continue
             this_data = received_data.get(data_key)
             if this_data:
                 for index in this_data.keys():
@@ -337,57 +567,163 @@ class _SNMPSensor(RestoreEntity):
         return new_entities
 
     @classmethod
-    def retrieve_data(cls, snmp_engine: 'SnmpEngine', community_data: 'CommunityData',
-                      transport_target: 'AbstractTransportTarget') -> Dict[str, Union[Dict[int, Dict[str, Any]], Dict[str, Any]]]:
-        from pysnmp.hlapi import ContextData
+    async def _async_retrieve_key(cls, client: SNMPClient, key_name: str, index_oid, sub_keys,
+                                  chunked_walk: Optional[ChunkedWalk] = None,
+                                  static_cache: Optional[StaticColumnCache] = None) -> Union[Table, Row]:
+        row_type = cls.row_types[key_name]
+        if not index_oid:
+            return row_type(*await async_pysnmp_get(client, sub_keys))
+
+        if static_cache is None or chunked_walk is not None or not static_cache.fresh:
+            table = await async_pysnmp_next(client, sub_keys, row_type, index_oid, chunked_walk)
+            if static_cache is not None:
+                static_cache.update(table)
+            return table
+
+        walked_row_type = cls.walked_row_types[key_name]
+        walked_keys = {sub_key_name: sub_keys[sub_key_name] for sub_key_name in walked_row_type.columns}
+        table = static_cache.merge(
+            await async_pysnmp_next(client, walked_keys, walked_row_type, index_oid),
+            row_type
+        )
+        if table is None:
+            _LOGGER.debug('New rows in %s of %s, retrieving all columns', key_name, client)
+            table = await async_pysnmp_next(client, sub_keys, row_type, index_oid)
+            static_cache.update(table)
+        return table
+
+    @classmethod
+    def create_chunked_walks(cls, max_rows: int) -> Dict[str, ChunkedWalk]:
+        """Create walk state for every table of the device."""
+        return {
+            key_name: ChunkedWalk(max_rows)
+            for (key_name, index_oid), sub_keys in cls.update_oid_mapping.items()
+            if index_oid
+        }
+
+    @classmethod
+    def create_static_column_caches(cls) -> Dict[str, StaticColumnCache]:
+        """Create caches for static columns of the device tables."""
+        return {
+            key_name: StaticColumnCache(columns, STATIC_COLUMNS_MAX_AGE)
+            for key_name, columns in cls.static_columns.items()
+        }
+
+    @classmethod
+    def retrieval_plan(cls, sensor_types: Iterable[str]) -> FrozenSet[str]:
+        """Return data keys required to update entities of the given sensor types."""
+        keys = set(cls.always_retrieved_keys)
+        for sensor_type in sensor_types:
+            keys.update(cls.sensor_type_keys.get(sensor_type, ()))
+        return frozenset(keys)
 
-        context_obj = ContextData()
-        received_data = dict()
+    @classmethod
+    async def async_retrieve_data(cls, client: SNMPClient, keys: Optional[Collection[str]] = None,
+                                  chunked_walks: Optional[Dict[str, ChunkedWalk]] = None,
+                                  deadline: Optional[float] = None,
+                                  static_caches: Optional[Dict[str, StaticColumnCache]] = None) \
+            -> Dict[str, Union[Table, Row]]:
+        """
+        Retrieve data keys concurrently, limited by the client request cap.
+
+        Only `keys` are retrieved when given, otherwise all of them. Tables
+        with an entry in `chunked_walks` are walked in bounded chunks, other
+        tables with an entry in `static_caches` without their static columns.
+
+        With a `deadline` in seconds, keys which failed or were not retrieved
+        in time are left out of the result; an error is raised only when
+        no key was retrieved at all.
+        """
+        loop = asyncio.get_event_loop()
+        started_at = loop.time()
+
+        fetches = {}
         for (key_name, index_oid), sub_keys in cls.update_oid_mapping.items():
-            received_data[key_name] = (
-                pysnmp_get(snmp_engine, community_data, transport_target, context_obj, sub_keys)
-                if not index_oid else
-                pysnmp_next(snmp_engine, community_data, transport_target, context_obj, sub_keys, index_oid)
+            if keys is not None and key_name not in keys:
+                continue
+            fetches[key_name] = cls._async_retrieve_key(
+                client, key_name, index_oid, sub_keys,
+                (chunked_walks or {}).get(key_name), (static_caches or {}).get(key_name)
             )
 
-        if hasattr(cls, 'get_additional_info_keys'):
+        if deadline is None:
+            received_data = dict(zip(fetches.keys(), await asyncio.gather(*fetches.values())))
+        else:
+            received_data = await async_gather_partial(fetches, deadline)
+
+        if hasattr(cls, 'get_additional_info_keys') and 'info' in received_data:
             sub_keys, base_info = cls.get_additional_info_keys(received_data)
             if sub_keys:
-                new_data = pysnmp_get(snmp_engine, community_data, transport_target, context_obj, sub_keys)
-                if base_info:
-                    base_info.update(new_data)
-                    received_data['additional_info'] = base_info
+                if deadline is None:
+                    new_values = await async_pysnmp_get(client, sub_keys)
                 else:
-                    received_data['additional_info'] = new_data
-            else:
-                received_data['additional_info'] = base_info if base_info else dict()
+                    new_values = (await async_gather_partial(
+                        {'additional_info': async_pysnmp_get(client, sub_keys)},
+                        deadline - (loop.time() - started_at), raise_empty=False
+                    )).get('additional_info')
+                if new_values is None:
+                    return received_data
+                base_info.update(zip(sub_keys.keys(), new_values))
+            received_data['additional_info'] = AdditionalInfoRow.from_mapping(base_info)
 
         return received_data
 
+    @classmethod
+    def is_active(cls, received_data: Dict[str, Union[Table, Row]]) -> bool:
+        """Whether retrieved data indicates the device is busy and should be polled often."""
+        return False
+
+    @classmethod
+    def update_forecasts(cls, forecasts: Dict[Any, SupplyForecast], received_data: Dict[str, Union[Table, Row]],
+                         timestamp: float) -> bool:
+        """Feed retrieved data to consumption forecasts; return whether their state changed."""
+        return False
+
     def update_sensor_attributes(self, new_data: dict) -> bool:
         raise NotImplementedError
 
+    @property
+    def sensor_type(self) -> str:
+        return self._sensor_type
+
+    @property
+    def last_data(self) -> Optional[Dict[str, Union[Table, Row]]]:
+        return self._last_data
+
+    @property
+    def data_sources(self) -> Iterable[DataSource]:
+        """Return `(key, index)` and `(key, column)` pairs the entity state depends on."""
+        raise NotImplementedError
+
     async def async_will_remove_from_hass(self) -> None:
-        key = (self._host, self._port)
-        entities = self.hass.data[DATA_DEVICE_ENTITIES][key]
-        entities.remove(self)
-        listener = self.hass.data[DATA_DEVICE_LISTENERS][key]
-        if not entities and listener[2] is not None:
-            _LOGGER.debug('Stopping update checker for %s:%d', *key)
-            # noinspection PyTypeChecker
-            listener[2]()
-            self.hass.data[DATA_DEVICE_LISTENERS][key] = (listener[0], listener[1], None)
+        poller: SNMPDevicePoller = self.hass.data[DATA_DEVICE_LISTENERS][(self._host, self._port)]
+        poller.remove_entity(self)
+
+    async def async_update(self) -> None:
+        """Refresh data the entity depends on, e.g. when `homeassistant.update_entity` is called."""
+        poller: SNMPDevicePoller = self.hass.data[DATA_DEVICE_LISTENERS][(self._host, self._port)]
+        await poller.async_refresh(self.retrieval_plan([self._sensor_type]))
 
     async def async_added_to_hass(self) -> None:
         _LOGGER.debug('Added %s to HomeAssistant', self)
-        key = (self._host, self._port)
-        self.hass.data[DATA_DEVICE_ENTITIES][key].append(self)
-        listener = self.hass.data[DATA_DEVICE_LISTENERS][key]
-        if listener[2] is None:
-            _LOGGER.debug('Starting update checker for %s:%d', *key)
-            # noinspection PyTypeChecker
-            tracker_stop = async_track_time_interval(self.hass, listener[0], interval=listener[1])
-            self.hass.data[DATA_DEVICE_LISTENERS][key] = (listener[0], listener[1], tracker_stop)
+        poller: SNMPDevicePoller = self.hass.data[DATA_DEVICE_LISTENERS][(self._host, self._port)]
+        poller.add_entity(self)
+
+    def _update_static_attributes(self, **static_attributes) -> None:
+        """Replace cached static metadata only when it differs from the current one."""
+        static_attributes = {key: value for key, value in static_attributes.items() if value is not None}
+        if static_attributes != self._static_attributes:
+            self._static_attributes = static_attributes
+
+    @property
+    def static_attributes(self) -> Optional[Dict[str, Any]]:
+        """
+        Return metadata which does not vary between polls.
+
+        It is kept out of state attributes, so it is not stored by the
+        recorder on every state change, and served by the diagnostics view.
+        """
+        return self._static_attributes
 
     @property
     def device_state_attributes(self):
@@ -432,17 +768,17 @@ class _SNMPSensor(RestoreEntity):
     @property
     def device_info_sw_version(self) -> Optional[str]:
         if self._last_data and 'additional_info' in self._last_data:
-            return self._last_data['additional_info'].get('sw_version')
+            return self._last_data['additional_info'].sw_version
 
     @property
     def device_info_model(self) -> Optional[str]:
         if self._last_data and 'additional_info' in self._last_data:
-            return self._last_data['additional_info'].get('model')
+            return self._last_data['additional_info'].model
 
     @property
     def device_info_manufacturer(self) -> Optional[str]:
         if self._last_data and 'additional_info' in self._last_data:
-            return self._last_data['additional_info'].get('manufacturer')
+            return self._last_data['additional_info'].manufacturer
 
     @property
     def device_info(self) -> Optional[Dict[str, Any]]:
@@ -455,11 +791,11 @@ class _SNMPSensor(RestoreEntity):
             "sw_version": self.device_info_sw_version,
         }
 
-        network_info: Optional[Dict[str, Dict[str, Any]]] = self._last_data.get('network_info')
+        network_info: Optional[Table] = self._last_data.get('network_info')
         if network_info:
             device_info["connections"] = {
-                (CONNECTION_NETWORK_MAC, network_info[interface]['phys_address'])
-                for interface in sorted(network_info.keys())
+                (CONNECTION_NETWORK_MAC, interface.phys_address)
+                for interface in network_info.values()
             }
 
         return device_info
@@ -473,6 +809,12 @@ class SNMPPrinterSensor(_SNMPSensor):
     """Representation of a printer SNMP sensor."""
     single_sensor_types = [SENSOR_TYPE_STATUS, SENSOR_TYPE_MILEAGE]
     multi_sensor_types = {SENSOR_TYPE_TONER: 'supplies', SENSOR_TYPE_PAPER_INPUT: 'paper_inputs'}
+    sensor_type_keys = {
+        SENSOR_TYPE_STATUS: ('info',),
+        SENSOR_TYPE_MILEAGE: ('info',),
+        SENSOR_TYPE_TONER: ('supplies', 'colorants'),
+        SENSOR_TYPE_PAPER_INPUT: ('paper_inputs',),
+    }
     update_oid_mapping = {
         ('info',                False): {
             'model':            ('1.3.6.1.2.1.25.3.2.1.3.1', str),
@@ -491,7 +833,7 @@ class SNMPPrinterSensor(_SNMPSensor):
             'marker_index':     ('1.3.6.1.2.1.43.11.1.1.2.1', int),
             'colorant_index':   ('1.3.6.1.2.1.43.11.1.1.3.1', int),
             'description':      ('1.3.6.1.2.1.43.11.1.1.6.1', str),
-            'class':            ('1.3.6.1.2.1.43.11.1.1.4.1', SuppliesClass),
+            'class_':           ('1.3.6.1.2.1.43.11.1.1.4.1', SuppliesClass),
             'type':             ('1.3.6.1.2.1.43.11.1.1.5.1', SuppliesType),
             'capacity':         ('1.3.6.1.2.1.43.11.1.1.8.1', CAPACITY_LEVEL_TYPE),
             'level':            ('1.3.6.1.2.1.43.11.1.1.9.1', CAPACITY_LEVEL_TYPE),
@@ -517,7 +859,7 @@ class SNMPPrinterSensor(_SNMPSensor):
         base_info = dict()
 
         if 'info' in retrieved_data:
-            description = retrieved_data['info'].get('description')
+            description = retrieved_data['info'].description
             if description:
                 lower_description = description.lower()
                 if 'panasonic' in lower_description:
@@ -531,6 +873,61 @@ class SNMPPrinterSensor(_SNMPSensor):
                     sub_keys['model'] = ('1.3.6.1.4.1.1347.43.5.1.1.1.1', str)
         return sub_keys, base_info
 
+    @classmethod
+    def is_active(cls, received_data: Dict[str, Union[Table, Row]]) -> bool:
+        info = received_data.get('info')
+        if info is None:
+            return False
+        return bool(info.error_state) or info.printer_status in ACTIVE_PRINTER_STATUSES
+
+    @classmethod
+    def update_forecasts(cls, forecasts: Dict[Any, SupplyForecast], received_data: Dict[str, Union[Table, Row]],
+                         timestamp: float) -> bool:
+        """Feed supply levels to their forecasts and add estimates to `received_data` as `forecasts`."""
+        supplies = received_data.get('supplies')
+        if supplies is None:
+            return False
+        info = received_data.get('info')
+        mileage = info.mileage if info is not None else None
+
+        changed = False
+        for index in [index for index in forecasts if index not in supplies]:
+            del forecasts[index]
+            changed = True
+
+        for index, supply in supplies.items():
+            level, capacity = supply.level, supply.capacity
+            if not isinstance(level, int) or not isinstance(capacity, int) or capacity <= 0:
+                # Untracked or unknown levels cannot be forecast
+                continue
+            forecast = forecasts.get(index)
+            if forecast is None:
+                forecast = forecasts[index] = SupplyForecast()
+            if forecast.update(100.0 * level / capacity, timestamp, mileage):
+                changed = True
+
+        indexes = [index for index in supplies.keys() if index in forecasts]
+        received_data['forecasts'] = Table(indexes, (
+            ForecastRow(forecasts[index].days_until_empty, forecasts[index].pages_per_percent)
+            for index in indexes
+        ))
+        return changed
+
+    @property
+    def data_sources(self) -> Iterable[DataSource]:
+        if self._sensor_type == SENSOR_TYPE_STATUS:
+            return ('info', 'error_state'), ('info', 'printer_status'), ('info', 'device_status')
+        elif self._sensor_type == SENSOR_TYPE_MILEAGE:
+            return ('info', 'mileage'),
+        elif self._sensor_type == SENSOR_TYPE_PAPER_INPUT:
+            return ('paper_inputs', self._entity_index),
+        elif self._sensor_type == SENSOR_TYPE_TONER:
+            if self._colorant_index:
+                return ('supplies', self._entity_index), ('forecasts', self._entity_index), \
+                       ('colorants', self._colorant_index)
+            return ('supplies', self._entity_index), ('forecasts', self._entity_index)
+        return ()
+
     def update_sensor_attributes(self, new_data):
         self._last_data = new_data
 
@@ -543,19 +940,19 @@ class SNMPPrinterSensor(_SNMPSensor):
         if self._sensor_type == SENSOR_TYPE_STATUS:
             new_name = 'Status'
             sensor_data = new_data['info']
-            error_state = sensor_data['error_state']
+            error_state = sensor_data.error_state
 
-            new_state = STATE_PROBLEM if error_state else sensor_data['printer_status'].friendly_name
+            new_state = STATE_PROBLEM if error_state else sensor_data.printer_status.friendly_name
             new_icon = 'mdi:printer-alert' if error_state else 'mdi:printer-check'
             new_attributes = {
-                'device_status': sensor_data['device_status'].friendly_name,
+                'device_status': sensor_data.device_status.friendly_name,
                 'error_state': [e.friendly_name for e in error_state] if error_state else None,
             }
 
         elif self._sensor_type == SENSOR_TYPE_MILEAGE:
             new_name = 'Mileage'
             sensor_data = new_data['info']
-            new_state = sensor_data['mileage']
+            new_state = sensor_data.mileage
             new_icon = 'mdi:counter'
             new_unit = 'sheets'
 
@@ -563,35 +960,48 @@ class SNMPPrinterSensor(_SNMPSensor):
             new_icon = 'mdi:tray-full'
             sensor_data = new_data['paper_inputs'].get(self._entity_index)
             if sensor_data:
-                new_name = sensor_data['model']
-                new_state, new_unit, capacity = level_capacity(sensor_data['level'], sensor_data['capacity'])
-                new_attributes = {
-                    'capacity': capacity,
-                    'type': sensor_data['type'].friendly_name,
-                    'model': sensor_data['model'],
-                }
+                new_name = sensor_data.model
+                new_state, new_unit, capacity = level_capacity(sensor_data.level, sensor_data.capacity)
+                new_attributes = None
+                self._update_static_attributes(
+                    capacity=capacity,
+                    type=sensor_data.type.friendly_name,
+                    model=sensor_data.model,
+                )
             else:
                 new_state = STATE_UNKNOWN
 
         elif self._sensor_type == SENSOR_TYPE_TONER:
             sensor_data = new_data['supplies'].get(self._entity_index)
             if sensor_data:
-                new_name = sensor_data['description']
-                new_icon = SUPPLIES_ICONS.get(sensor_data['type'], DEFAULT_SUPPLIES_ICON)
-                new_state, new_unit, capacity = level_capacity(sensor_data['level'], sensor_data['capacity'])
-                new_attributes = {
-                    'capacity': capacity,
-                    'type': sensor_data['type'].friendly_name,
-                    'model': sensor_data['description'],
-                }
-
-                if sensor_data['colorant_index'] > 0:
+                new_name = sensor_data.description
+                new_icon = SUPPLIES_ICONS.get(sensor_data.type, DEFAULT_SUPPLIES_ICON)
+                new_state, new_unit, capacity = level_capacity(sensor_data.level, sensor_data.capacity)
+                forecast = new_data.get('forecasts', Table()).get(self._entity_index)
+                new_attributes = None
+                if forecast is not None:
+                    new_attributes = {
+                        attribute: value
+                        for attribute, value in forecast.as_dict().items()
+                        if value is not None
+                    } or None
+
+                color = None
+                self._colorant_index = sensor_data.colorant_index
+                if sensor_data.colorant_index > 0:
                     colorants = new_data.get('colorants')
                     if colorants:
-                        colorant = colorants.get(sensor_data['colorant_index'])
+                        colorant = colorants.get(sensor_data.colorant_index)
                         if colorant:
-                            new_attributes['color'] = colorant['color']
-                            new_name = colorant['color'].capitalize() + ' ' + new_name
+                            color = colorant.color
+                            new_name = color.capitalize() + ' ' + new_name
+
+                self._update_static_attributes(
+                    capacity=capacity,
+                    type=sensor_data.type.friendly_name,
+                    model=sensor_data.description,
+                    color=color,
+                )
 
         needs_update = False
         for new_value, attribute in [
@@ -609,21 +1019,21 @@ class SNMPPrinterSensor(_SNMPSensor):
 
     @property
     def device_info_model(self) -> Optional[str]:
-        additional_info_model = self._last_data['additional_info'].get('model')
+        additional_info_model = self._last_data['additional_info'].model
         if additional_info_model:
             return additional_info_model
 
-        return self._last_data['info'].get('model') or None
+        return self._last_data['info'].model or None
 
     @property
     def device_info_manufacturer(self) -> Optional[str]:
-        additional_info_manufacturer = self._last_data['additional_info'].get('manufacturer')
+        additional_info_manufacturer = self._last_data['additional_info'].manufacturer
         if additional_info_manufacturer:
             return additional_info_manufacturer
 
         info = self._last_data.get('info')
         if info:
-            description = info.get('description')
+            description = info.description
             if description:
                 stripped_description = str(description).strip()
                 if stripped_description:
@@ -632,28 +1042,152 @@ class SNMPPrinterSensor(_SNMPSensor):
 
 
 class SNMPComputerSensor(_SNMPSensor):
-    single_sensor_types = [SENSOR_TYPE_STATUS]
-    multi_sensor_types = {}
+    single_sensor_types = [SENSOR_TYPE_STATUS, SENSOR_TYPE_CPU_LOAD, SENSOR_TYPE_PROCESSES]
+    multi_sensor_types = {SENSOR_TYPE_STORAGE: 'storage'}
+    sensor_type_keys = {
+        SENSOR_TYPE_STATUS: ('info',),
+        SENSOR_TYPE_CPU_LOAD: ('processors',),
+        SENSOR_TYPE_PROCESSES: ('system',),
+        SENSOR_TYPE_STORAGE: ('storage',),
+    }
+    default_deadbands = {
+        # uptime attribute changes on every poll
+        SENSOR_TYPE_STATUS: {CONF_MIN_INTERVAL: timedelta(minutes=5)},
+    }
     update_oid_mapping = {
         ('info', False): {
             'description':  ('1.3.6.1.2.1.1.1.0', str),
             'uptime':       ('1.3.6.1.2.1.1.3.0', str),
             'name':         ('1.3.6.1.2.1.1.5.0', str),
         },
+        # HOST-RESOURCES-MIB
+        ('system', False): {
+            'users':        ('1.3.6.1.2.1.25.1.5.0', optional_int),
+            'processes':    ('1.3.6.1.2.1.25.1.6.0', optional_int),
+        },
+        ('processors', True): {
+            'load':         ('1.3.6.1.2.1.25.3.3.1.2', int),
+        },
+        ('storage', True): {
+            'type':         ('1.3.6.1.2.1.25.2.3.1.2', StorageType.from_oid),
+            'description':  ('1.3.6.1.2.1.25.2.3.1.3', str),
+            'allocation_units': ('1.3.6.1.2.1.25.2.3.1.4', int),
+            'size':         ('1.3.6.1.2.1.25.2.3.1.5', unsigned_int),
+            'used':         ('1.3.6.1.2.1.25.2.3.1.6', unsigned_int),
+        },
+    }
+    static_columns = {
+        'storage': ('type', 'description', 'allocation_units', 'size'),
     }
+    derived_columns = {
+        'storage': ('size_bytes', 'used_bytes', 'used_percent'),
+    }
+
+    @classmethod
+    def create_sensors(cls, host, port, base_name, sensor_types, received_data) -> List['_SNMPSensor']:
+        # Agents without HOST-RESOURCES-MIB get no entities for values they do not report
+        available_types = set(cls.single_sensor_types).union(cls.multi_sensor_types)
+        if sensor_types is not None:
+            available_types.intersection_update(sensor_types)
+        if not received_data.get('processors'):
+            available_types.discard(SENSOR_TYPE_CPU_LOAD)
+        system = received_data.get('system')
+        if system is None or system.processes is None:
+            available_types.discard(SENSOR_TYPE_PROCESSES)
+
+        return super().create_sensors(host, port, base_name, available_types, received_data)
+
+    @classmethod
+    async def _async_retrieve_key(cls, client: SNMPClient, key_name: str, index_oid, sub_keys,
+                                  chunked_walk: Optional[ChunkedWalk] = None,
+                                  static_cache: Optional[StaticColumnCache] = None) -> Union[Table, Row]:
+        try:
+            data = await super()._async_retrieve_key(client, key_name, index_oid, sub_keys, chunked_walk, static_cache)
+        except SNMPError as e:
+            if key_name != 'system' or e.error_status != ERROR_STATUS_NO_SUCH_NAME:
+                raise
+            # SNMPv1 agents without HOST-RESOURCES-MIB reject the whole request
+            return cls.row_types[key_name]()
+
+        if key_name == 'storage':
+            cls.derive_storage_usage(data)
+        return data
+
+    @staticmethod
+    def derive_storage_usage(storage: Table) -> None:
+        """Convert allocation units of all storage rows to bytes and used percentages in one pass."""
+        for row in storage.rows:
+            units, size, used = row.allocation_units or 0, row.size or 0, row.used or 0
+            row.size_bytes = size * units
+            row.used_bytes = used * units
+            row.used_percent = round(100 * used / size, 1) if size else None
+
+    @property
+    def data_sources(self) -> Iterable[DataSource]:
+        if self._sensor_type == SENSOR_TYPE_STATUS:
+            return ('info', 'uptime'),
+        elif self._sensor_type == SENSOR_TYPE_CPU_LOAD:
+            processors = self._last_data.get('processors') if self._last_data else None
+            return tuple(('processors', index) for index in processors or ())
+        elif self._sensor_type == SENSOR_TYPE_PROCESSES:
+            return ('system', 'processes'), ('system', 'users')
+        elif self._sensor_type == SENSOR_TYPE_STORAGE:
+            return ('storage', self._entity_index),
+        return ()
 
     def update_sensor_attributes(self, new_data):
         self._last_data = new_data
 
         new_unit = self._unit_of_measurement
+        new_icon = self._icon
+        new_attributes = self._attributes
+        new_name = self._name
         if self._sensor_type == SENSOR_TYPE_STATUS:
             new_name = 'Status'
             new_state = STATE_OK  # @TODO: more attributes to yield state
 
             new_icon = 'mdi:desktop-tower'
             new_attributes = {
-                'uptime': new_data['info']['uptime'],
+                'uptime': new_data['info'].uptime,
+            }
+
+        elif self._sensor_type == SENSOR_TYPE_CPU_LOAD:
+            new_name = 'CPU Load'
+            new_icon = 'mdi:chip'
+            new_unit = '%'
+            loads = [processor.load for processor in new_data.get('processors', Table()).values()]
+            new_state = round(sum(loads) / len(loads), 1) if loads else STATE_UNKNOWN
+            new_attributes = {
+                'processors': len(loads),
+            }
+
+        elif self._sensor_type == SENSOR_TYPE_PROCESSES:
+            new_name = 'Processes'
+            new_icon = 'mdi:format-list-bulleted'
+            new_unit = 'processes'
+            system = new_data['system']
+            new_state = system.processes
+            new_attributes = {
+                'users': system.users,
             }
+
+        elif self._sensor_type == SENSOR_TYPE_STORAGE:
+            new_unit = '%'
+            sensor_data = new_data['storage'].get(self._entity_index)
+            if sensor_data:
+                new_name = sensor_data.description
+                new_icon = STORAGE_ICONS.get(sensor_data.type, DEFAULT_STORAGE_ICON)
+                new_state = sensor_data.used_percent
+                new_attributes = {
+                    'used': sensor_data.used_bytes,
+                }
+                self._update_static_attributes(
+                    capacity=sensor_data.size_bytes,
+                    type=sensor_data.type.friendly_name,
+                )
+            else:
+                new_state = STATE_UNKNOWN
+
         else:
             _LOGGER.error('Unsupported sensor type: %s' % self._sensor_type)
             return False
@@ -676,7 +1210,7 @@ class SNMPComputerSensor(_SNMPSensor):
     def get_additional_info_keys(cls, retrieved_data):
         sub_keys = dict()
         base_info = dict()
-        description = retrieved_data['info'].get('description')
+        description = retrieved_data['info'].description
         if description:
             lower_description = description.lower()
             if 'linux' in lower_description or 'unix' in lower_description:
@@ -0,0 +1,295 @@
+"""SNMPv3 user-based security model helpers"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+
+from homeassistant.const import CONF_HOST, CONF_PORT, CONF_USERNAME
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import HomeAssistantType
+
+from .const import DOMAIN, SNMP_VERSIONS, SNMP_VERSION_3, SNMP_AUTH_PROTOCOLS, SNMP_PRIV_PROTOCOLS, \
+    CONF_VERSION, CONF_COMMUNITY, CONF_AUTH_KEY, CONF_AUTH_PROTOCOL, CONF_PRIV_KEY, CONF_PRIV_PROTOCOL, \
+    DEFAULT_AUTH_PROTOCOL, DEFAULT_PRIV_PROTOCOL, DATA_USM_KEY_CACHE
+from .discovery import OID_SYS_DESCR
+from .ratelimit import TokenBucket, async_acquire
+
+if TYPE_CHECKING:
+    # noinspection PyProtectedMember
+    from pysnmp.hlapi.transport import AbstractTransportTarget
+    from pysnmp.hlapi import SnmpEngine, CommunityData, UsmUserData
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = DOMAIN + '_usm_keys'
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10
+
+LocalizedKeys = Tuple[Optional[bytes], Optional[bytes]]
+
+
+def _protocol_oid(protocols: Mapping[str, str], protocol: str) -> Tuple[int, ...]:
+    from pysnmp import hlapi
+    return getattr(hlapi, protocols[protocol])
+
+
+class USMKeyCache:
+    """
+    Cache of USM keys localized to SNMP engines.
+
+    Hashing a password into a master key digests 1 MB of data, so master keys
+    are memoized per protocol and password. Localized keys are kept per
+    engine ID in memory and persisted to storage, encrypted with a key
+    derived from the passwords they were generated from. Discovered engine
+    IDs are persisted per agent address, so known agents need neither
+    discovery nor hashing after a restart.
+    """
+
+    def __init__(self, hass: Optional[HomeAssistantType] = None):
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY, private=True) if hass else None
+        self._load_task: Optional[asyncio.Task] = None
+
+        self._master_keys: Dict[Tuple[Any, ...], bytes] = {}
+        self._localized_keys: Dict[Tuple[Any, ...], LocalizedKeys] = {}
+        self._engine_ids: Dict[str, str] = {}
+        self._stored_keys: Dict[str, str] = {}
+
+    async def async_load(self) -> None:
+        if self._store is None:
+            return
+        if self._load_task is None:
+            self._load_task = self._hass.async_create_task(self._async_load())
+        await self._load_task
+
+    async def _async_load(self) -> None:
+        data = await self._store.async_load()
+        if data:
+            self._engine_ids.update(data.get('engine_ids', {}))
+            self._stored_keys.update(data.get('keys', {}))
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Dict[str, str]]:
+        return {
+            'engine_ids': dict(self._engine_ids),
+            'keys': dict(self._stored_keys),
+        }
+
+    def _schedule_save(self) -> None:
+        if self._store is not None:
+            # May be called from executor threads
+            self._hass.add_job(self._store.async_delay_save, self._data_to_save, STORAGE_SAVE_DELAY)
+
+    @staticmethod
+    def _agent_key(host: str, port: int) -> str:
+        return '%s:%s' % (host, port)
+
+    def get_engine_id(self, host: str, port: int) -> Optional[bytes]:
+        engine_id = self._engine_ids.get(self._agent_key(host, port))
+        return bytes.fromhex(engine_id) if engine_id else None
+
+    def set_engine_id(self, host: str, port: int, engine_id: bytes) -> None:
+        agent_key = self._agent_key(host, port)
+        if self._engine_ids.get(agent_key) != engine_id.hex():
+            self._engine_ids[agent_key] = engine_id.hex()
+            self._schedule_save()
+
+    def forget_engine_id(self, host: str, port: int) -> None:
+        if self._engine_ids.pop(self._agent_key(host, port), None) is not None:
+            self._schedule_save()
+
+    def _master_key(self, cache_key: Tuple[Any, ...], password: str, hash_passphrase: Callable[[], Any]) -> bytes:
+        cache_key += (hashlib.sha256(password.encode()).digest(),)
+        master_key = self._master_keys.get(cache_key)
+        if master_key is None:
+            master_key = bytes(hash_passphrase())
+            self._master_keys[cache_key] = master_key
+        return master_key
+
+    @staticmethod
+    def _fernet(engine_id: bytes, auth_protocol: str, auth_key: Optional[str],
+                priv_protocol: str, priv_key: Optional[str]):
+        """Return the cipher of stored keys, or None when `cryptography` is not installed."""
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            _LOGGER.debug('Localized keys are not stored without the cryptography package')
+            return None
+
+        secret = hmac.new(
+            (auth_key or '').encode() + b'\0' + (priv_key or '').encode(),
+            engine_id + b'\0' + auth_protocol.encode() + b'\0' + priv_protocol.encode(),
+            hashlib.sha256
+        ).digest()
+        return Fernet(base64.urlsafe_b64encode(secret))
+
+    def _localize_keys(self, engine_id: bytes, auth_protocol: str, auth_key: Optional[str],
+                       priv_protocol: str, priv_key: Optional[str]) -> LocalizedKeys:
+        from pysnmp.proto.rfc1902 import OctetString
+        from pysnmp.proto.secmod.rfc3414.service import SnmpUSMSecurityModel
+
+        engine_id_obj = OctetString(engine_id)
+        auth_oid = _protocol_oid(SNMP_AUTH_PROTOCOLS, auth_protocol)
+        auth_service = SnmpUSMSecurityModel.authServices[auth_oid]
+        localized_auth_key = localized_priv_key = None
+
+        if auth_key:
+            master_key = self._master_key(
+                ('auth', auth_protocol), auth_key,
+                lambda: auth_service.hashPassphrase(auth_key)
+            )
+            localized_auth_key = bytes(auth_service.localizeKey(master_key, engine_id_obj))
+
+        if priv_key:
+            priv_service = SnmpUSMSecurityModel.privServices[_protocol_oid(SNMP_PRIV_PROTOCOLS, priv_protocol)]
+            master_key = self._master_key(
+                ('priv', auth_protocol, priv_protocol), priv_key,
+                lambda: priv_service.hashPassphrase(auth_oid, priv_key)
+            )
+            localized_priv_key = bytes(priv_service.localizeKey(auth_oid, master_key, engine_id_obj))
+
+        return localized_auth_key, localized_priv_key
+
+    def get_localized_keys(self, engine_id: bytes, user_name: str,
+                           auth_protocol: str, auth_key: Optional[str],
+                           priv_protocol: str, priv_key: Optional[str]) -> LocalizedKeys:
+        """Return authentication and privacy keys localized to the given engine."""
+        memory_key = (
+            engine_id, user_name, auth_protocol, priv_protocol,
+            hashlib.sha256((auth_key or '').encode() + b'\0' + (priv_key or '').encode()).digest()
+        )
+        localized_keys = self._localized_keys.get(memory_key)
+        if localized_keys is not None:
+            return localized_keys
+
+        storage_key = ':'.join((engine_id.hex(), user_name, auth_protocol, priv_protocol))
+        fernet = self._fernet(engine_id, auth_protocol, auth_key, priv_protocol, priv_key)
+
+        token = self._stored_keys.get(storage_key) if fernet is not None else None
+        if token is not None:
+            from cryptography.fernet import InvalidToken
+            try:
+                auth_hex, priv_hex = fernet.decrypt(token.encode()).decode().split(':')
+            except (InvalidToken, ValueError):
+                _LOGGER.debug('Stored keys for engine %s do not match configured passwords', engine_id.hex())
+            else:
+                localized_keys = (
+                    bytes.fromhex(auth_hex) if auth_hex else None,
+                    bytes.fromhex(priv_hex) if priv_hex else None,
+                )
+
+        if localized_keys is None:
+            _LOGGER.debug('Localizing keys for engine %s', engine_id.hex())
+            localized_keys = self._localize_keys(engine_id, auth_protocol, auth_key, priv_protocol, priv_key)
+            if fernet is not None:
+                self._stored_keys[storage_key] = fernet.encrypt(
+                    ':'.join(key.hex() if key else '' for key in localized_keys).encode()
+                ).decode()
+                self._schedule_save()
+
+        self._localized_keys[memory_key] = localized_keys
+        return localized_keys
+
+
+async def async_get_usm_key_cache(hass: HomeAssistantType) -> USMKeyCache:
+    key_cache = hass.data.get(DATA_USM_KEY_CACHE)
+    if key_cache is None:
+        key_cache = USMKeyCache(hass)
+        hass.data[DATA_USM_KEY_CACHE] = key_cache
+    await key_cache.async_load()
+    return key_cache
+
+
+async def async_discover_engine_id(snmp_engine: 'SnmpEngine', transport_target: 'AbstractTransportTarget',
+                                   rate_limits: Sequence[TokenBucket] = ()) -> Optional[bytes]:
+    """
+    Discover the authoritative engine ID of an agent with an unauthenticated
+    probe, taking a token from each of `rate_limits` before it is sent.
+    """
+    from pysnmp.hlapi import UsmUserData, ContextData, ObjectType, ObjectIdentity
+    from pysnmp.hlapi.asyncio import getCmd
+
+    await async_acquire(rate_limits)
+    observed = []
+
+    def _observer(_snmp_engine, _execpoint, variables, _cb_ctx):
+        observed.append(variables['securityEngineId'])
+
+    snmp_engine.observer.registerObserver(_observer, 'rfc3412.prepareDataElements:internal')
+    try:
+        await getCmd(snmp_engine, UsmUserData('__discovery__'), transport_target, ContextData(),
+                     ObjectType(ObjectIdentity(OID_SYS_DESCR)), lookupMib=False)
+    finally:
+        snmp_engine.observer.unregisterObserver(_observer)
+
+    for engine_id in observed:
+        if engine_id:
+            return bytes(engine_id)
+    return None
+
+
+async def async_build_auth_data(snmp_engine: 'SnmpEngine', transport_target: 'AbstractTransportTarget',
+                                config: Mapping[str, Any], key_cache: Optional[USMKeyCache] = None,
+                                rate_limits: Sequence[TokenBucket] = ()) -> Union['CommunityData', 'UsmUserData']:
+    """
+    Build pysnmp authentication data for a device configuration.
+
+    For SNMPv3 with authentication and a key cache, the agent engine ID is
+    discovered once, within `rate_limits`, and keys are passed to pysnmp
+    already localized, which skips password hashing inside the SNMP engine.
+    """
+    from pysnmp import hlapi
+
+    version = config[CONF_VERSION]
+    if version != SNMP_VERSION_3:
+        return hlapi.CommunityData(config[CONF_COMMUNITY], mpModel=SNMP_VERSIONS[version])
+
+    user_name = config[CONF_USERNAME]
+    auth_protocol = config.get(CONF_AUTH_PROTOCOL, DEFAULT_AUTH_PROTOCOL)
+    priv_protocol = config.get(CONF_PRIV_PROTOCOL, DEFAULT_PRIV_PROTOCOL)
+    auth_key = config.get(CONF_AUTH_KEY) if auth_protocol != 'none' else None
+    priv_key = config.get(CONF_PRIV_KEY) if priv_protocol != 'none' else None
+
+    if auth_protocol != 'none' and not auth_key:
+        raise ValueError('Authentication key is required for protocol %s' % auth_protocol)
+    if priv_protocol != 'none' and (not priv_key or not auth_key):
+        raise ValueError('Privacy protocol %s requires authentication and privacy keys' % priv_protocol)
+
+    auth_oid = _protocol_oid(SNMP_AUTH_PROTOCOLS, auth_protocol)
+    priv_oid = _protocol_oid(SNMP_PRIV_PROTOCOLS, priv_protocol)
+
+    if not auth_key:
+        return hlapi.UsmUserData(user_name)
+
+    if key_cache is None:
+        return hlapi.UsmUserData(user_name, authKey=auth_key, privKey=priv_key,
+                                 authProtocol=auth_oid, privProtocol=priv_oid)
+
+    host, port = config[CONF_HOST], config[CONF_PORT]
+    engine_id = key_cache.get_engine_id(host, port)
+    if engine_id is None:
+        engine_id = await async_discover_engine_id(snmp_engine, transport_target, rate_limits)
+        if engine_id is None:
+            raise Exception('Could not discover SNMP engine ID of %s:%s' % (host, port))
+        _LOGGER.debug('Discovered engine ID %s for %s:%s', engine_id.hex(), host, port)
+        key_cache.set_engine_id(host, port, engine_id)
+
+    # Hashing passwords of unknown engines is CPU-bound
+    localized_auth_key, localized_priv_key = await asyncio.get_event_loop().run_in_executor(
+        None, key_cache.get_localized_keys,
+        engine_id, user_name, auth_protocol, auth_key, priv_protocol, priv_key
+    )
+
+    return hlapi.UsmUserData(
+        user_name,
+        authKey=localized_auth_key,
+        privKey=localized_priv_key,
+        authProtocol=auth_oid,
+        privProtocol=priv_oid,
+        securityEngineId=hlapi.OctetString(engine_id),
+        authKeyType=hlapi.usmKeyTypeLocalized,
+        privKeyType=hlapi.usmKeyTypeLocalized,
+    )
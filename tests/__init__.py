@@ -0,0 +1 @@
+"""Tests for the SNMP device integration."""
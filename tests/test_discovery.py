@@ -0,0 +1,44 @@
+"""Tests for discovery and classification of devices."""
+from custom_components.snmp_device.const import DEVICE_TYPE_COMPUTER, DEVICE_TYPE_PRINTER
+from custom_components.snmp_device.discovery import OIDPrefixTrie, classify_device
+
+
+def test_trie_longest_match():
+    trie = OIDPrefixTrie([
+        ('1.3.6.1.4.1', 'enterprise'),
+        ('1.3.6.1.4.1.311', 'microsoft'),
+        ('1.3.6.1.4.1.311.1.1.3', 'windows'),
+    ])
+
+    assert trie.longest_match('1.3.6.1.4.1.311.1.1.3.1.2') == 'windows'
+    assert trie.longest_match('1.3.6.1.4.1.311.1.2') == 'microsoft'
+    assert trie.longest_match('1.3.6.1.4.1.2435.2') == 'enterprise'
+    assert trie.longest_match('1.3.6.1.2.1') is None
+    assert trie.longest_match('1.3.6.1.2.1', 'unknown') == 'unknown'
+
+
+def test_trie_matches_whole_arcs():
+    trie = OIDPrefixTrie([('1.3.6.1.4.1.253', 'xerox')])
+
+    assert trie.longest_match('1.3.6.1.4.1.2530.1') is None
+    assert trie.longest_match('.1.3.6.1.4.1.253.8') == 'xerox'
+    assert trie.longest_match((1, 3, 6, 1, 4, 1, 253)) == 'xerox'
+
+
+def test_trie_insert_replaces_value():
+    trie = OIDPrefixTrie()
+    trie.insert('1.3.6.1', 'internet')
+    trie.insert((1, 3, 6, 1), 'replaced')
+
+    assert trie.longest_match('1.3.6.1.2') == 'replaced'
+
+
+def test_classify_device_by_sys_object_id():
+    assert classify_device('1.3.6.1.4.1.11.2.3.9.1', 'Linux printer appliance') == DEVICE_TYPE_PRINTER
+    assert classify_device('1.3.6.1.4.1.8072.3.2.10', None) == DEVICE_TYPE_COMPUTER
+
+
+def test_classify_device_falls_back_to_sys_descr():
+    assert classify_device('1.3.6.1.4.1.99999', 'Generic Printer Server') == DEVICE_TYPE_PRINTER
+    assert classify_device(None, 'Hardware: x86 - Software: Windows') == DEVICE_TYPE_COMPUTER
+    assert classify_device(None, 'Managed switch') is None
@@ -0,0 +1,72 @@
+"""Tests for supply consumption forecasts."""
+import pytest
+
+from custom_components.snmp_device.forecast import SECONDS_PER_DAY, EWRegression, SupplyForecast
+
+
+def test_regression_needs_two_samples():
+    regression = EWRegression()
+    assert regression.slope is None
+
+    regression.update(0, 10)
+    assert regression.slope is None
+
+    regression.update(1, 8)
+    assert regression.slope == pytest.approx(-2)
+
+
+def test_regression_follows_recent_trend():
+    regression = EWRegression(decay=0.5)
+    for x in range(10):
+        regression.update(x, -x)
+    for x in range(10, 20):
+        regression.update(x, -10 - 3 * (x - 10))
+
+    assert regression.slope < -2.5
+
+
+def test_forecast_days_until_empty():
+    forecast = SupplyForecast()
+    for day, level in enumerate((80, 79, 78, 77)):
+        assert forecast.update(level, day * SECONDS_PER_DAY)
+
+    assert forecast.days_until_empty == pytest.approx(77.0)
+
+
+def test_forecast_pages_per_percent():
+    forecast = SupplyForecast()
+    for day, level in enumerate((80, 79, 78)):
+        forecast.update(level, day * SECONDS_PER_DAY, mileage=1000 + day * 100)
+
+    assert forecast.pages_per_percent == pytest.approx(100.0)
+
+
+def test_forecast_ignores_unchanged_level():
+    forecast = SupplyForecast()
+    forecast.update(80, 0)
+
+    assert not forecast.update(80, SECONDS_PER_DAY)
+    assert forecast.by_time.samples == 1
+
+
+def test_forecast_restarts_after_replacement():
+    forecast = SupplyForecast()
+    for day, level in enumerate((20, 15, 10)):
+        forecast.update(level, day * SECONDS_PER_DAY)
+
+    forecast.update(100, 3 * SECONDS_PER_DAY)
+
+    assert forecast.origin_time == 3 * SECONDS_PER_DAY
+    assert forecast.by_time.samples == 1
+    assert forecast.days_until_empty is None
+
+
+def test_forecast_round_trip():
+    forecast = SupplyForecast()
+    for day, level in enumerate((80, 79, 78)):
+        forecast.update(level, day * SECONDS_PER_DAY, mileage=day * 100)
+
+    restored = SupplyForecast.from_dict(forecast.as_dict())
+
+    assert restored.as_dict() == forecast.as_dict()
+    assert restored.days_until_empty == forecast.days_until_empty
@@ -0,0 +1,67 @@
+"""Tests for the in-memory history of numeric values."""
+from custom_components.snmp_device.enums import SuppliesType
+from custom_components.snmp_device.history import DeviceHistory, HistoryBudget, RingBuffer
+from custom_components.snmp_device.rows import Table, make_row_type
+
+SupplyRow = make_row_type('SupplyRow', ('description', 'type', 'level'))
+InfoRow = make_row_type('InfoRow', ('model', 'mileage'))
+
+
+def test_ring_buffer_keeps_most_recent_samples():
+    buffer = RingBuffer(3)
+    assert buffer.samples() == []
+
+    buffer.append(1.0, 10.0)
+    buffer.append(2.0, 20.0)
+    assert buffer.samples() == [(1.0, 10.0), (2.0, 20.0)]
+
+    for timestamp in (3.0, 4.0, 5.0):
+        buffer.append(timestamp, timestamp * 10)
+    assert buffer.samples() == [(3.0, 30.0), (4.0, 40.0), (5.0, 50.0)]
+    assert buffer.count == 3
+
+
+def test_budget_allocation_and_release():
+    budget = HistoryBudget(max_samples=10)
+
+    assert budget.allocate(4) is not None
+    assert budget.allocate(4) is not None
+    assert budget.allocate(4) is None
+    assert budget.allocated == 8
+
+    budget.release(4)
+    assert budget.allocate(4) is not None
+    budget.release(100)
+    assert budget.allocated == 0
+
+
+def test_device_history_records_numeric_columns():
+    history = DeviceHistory(HistoryBudget(max_samples=100), size=2)
+    data = {
+        'supplies': Table((1,), (SupplyRow('Black', SuppliesType.TONER, 50),)),
+        'info': InfoRow('LaserJet', 1000),
+    }
+
+    history.record(data, 1.0)
+    history.record(data, 2.0)
+    history.record(data, 3.0)
+
+    assert history.as_dict() == {
+        'supplies.1.type': [(2.0, float(SuppliesType.TONER.value)), (3.0, float(SuppliesType.TONER.value))],
+        'supplies.1.level': [(2.0, 50.0), (3.0, 50.0)],
+        'info.mileage': [(2.0, 1000.0), (3.0, 1000.0)],
+    }
+
+
+def test_device_history_stops_recording_when_budget_is_used_up():
+    budget = HistoryBudget(max_samples=4)
+    history = DeviceHistory(budget, size=3)
+
+    history.record({'info': InfoRow('LaserJet', 1000), 'supplies': Table((1,), (SupplyRow(None, None, 50),))}, 1.0)
+
+    assert list(history.as_dict()) == ['info.mileage']
+    assert budget.allocated == 3
+
+    history.clear()
+    assert history.as_dict() == {}
+    assert budget.allocated == 0
@@ -0,0 +1,77 @@
+"""Tests for per-device polling."""
+from datetime import timedelta
+
+from custom_components.snmp_device.const import CONF_MIN_DELTA, CONF_MIN_INTERVAL
+from custom_components.snmp_device.poller import SNMPDevicePoller
+
+
+class FakeSensor:
+    def __init__(self, sensor_type, state, name='Printer', icon=None, unit_of_measurement=None):
+        self.sensor_type = sensor_type
+        self.state = state
+        self.name = name
+        self.icon = icon
+        self.unit_of_measurement = unit_of_measurement
+
+
+async def _retrieve_data(keys=None):
+    return {}
+
+
+def make_poller(deadbands):
+    return SNMPDevicePoller(None, 'printer.local', 161, _retrieve_data, timedelta(seconds=30), deadbands=deadbands)
+
+
+def test_deadband_passes_first_write():
+    poller = make_poller({'supply': {CONF_MIN_DELTA: 5}})
+
+    assert poller._passes_deadband(FakeSensor('supply', 50), 0.0)
+
+
+def test_deadband_passes_without_deadband_for_sensor_type():
+    poller = make_poller({'supply': {CONF_MIN_DELTA: 5}})
+    sensor = FakeSensor('status', 'idle')
+    poller._mark_written(sensor, 0.0)
+
+    sensor.state = 'printing'
+    assert poller._passes_deadband(sensor, 1.0)
+
+
+def test_deadband_min_delta():
+    poller = make_poller({'supply': {CONF_MIN_DELTA: 5}})
+    sensor = FakeSensor('supply', 50)
+    poller._mark_written(sensor, 0.0)
+
+    sensor.state = 47
+    assert not poller._passes_deadband(sensor, 1.0)
+    sensor.state = 45
+    assert poller._passes_deadband(sensor, 1.0)
+
+
+def test_deadband_passes_non_numeric_change():
+    poller = make_poller({'supply': {CONF_MIN_DELTA: 5}})
+    sensor = FakeSensor('supply', 50)
+    poller._mark_written(sensor, 0.0)
+
+    sensor.state = 'unknown'
+    assert poller._passes_deadband(sensor, 1.0)
+
+
+def test_deadband_passes_changed_descriptors():
+    poller = make_poller({'supply': {CONF_MIN_DELTA: 5}})
+    sensor = FakeSensor('supply', 50, unit_of_measurement='%')
+    poller._mark_written(sensor, 0.0)
+
+    sensor.state = 49
+    sensor.unit_of_measurement = 'pages'
+    assert poller._passes_deadband(sensor, 1.0)
+
+
+def test_deadband_min_interval():
+    poller = make_poller({'uptime': {CONF_MIN_INTERVAL: timedelta(minutes=1)}})
+    sensor = FakeSensor('uptime', 100)
+    poller._mark_written(sensor, 0.0)
+
+    sensor.state = 130
+    assert not poller._passes_deadband(sensor, 30.0)
+    assert poller._passes_deadband(sensor, 60.0)
@@ -0,0 +1,112 @@
+"""Tests for token-bucket rate limiting."""
+import asyncio
+
+import pytest
+
+from custom_components.snmp_device import ratelimit
+from custom_components.snmp_device.const import CONF_RATE
+from custom_components.snmp_device.ratelimit import RateLimiter, RateLimitExceeded, TokenBucket, async_acquire
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(ratelimit.asyncio, 'sleep', sleep)
+    return delays
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_bucket_burst_and_refill(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+
+    clock[0] += 1.0
+    assert bucket.reserve() == 0.0
+
+
+def test_bucket_strictest_limits_apply(clock):
+    bucket = TokenBucket(rate=10, burst=10, max_delay=5)
+
+    bucket.set_limits('printer', 5, 20, 5)
+    bucket.set_limits('router', 20, 4, 1)
+    assert (bucket.rate, bucket.burst, bucket.max_delay) == (5, 4, 1)
+
+    bucket.release('router')
+    assert (bucket.rate, bucket.burst, bucket.max_delay) == (5, 20, 5)
+
+    bucket.release('printer')
+    assert (bucket.rate, bucket.burst, bucket.max_delay) == (10, 10, 5)
+
+
+def test_acquire_sleeps_for_slowest_bucket(clock, sleeps):
+    agent = TokenBucket(rate=10, burst=1)
+    subnet = TokenBucket(rate=2, burst=1)
+
+    assert run(async_acquire((agent, subnet))) == 0.0
+    assert run(async_acquire((agent, subnet))) == pytest.approx(0.5)
+    assert sleeps == [pytest.approx(0.5)]
+    assert (agent.acquired, agent.throttled) == (2, 1)
+    assert (subnet.acquired, subnet.throttled) == (2, 1)
+
+
+def test_acquire_drops_requests_delayed_too_long(clock, sleeps):
+    agent = TokenBucket(rate=10, burst=1, max_delay=5)
+    subnet = TokenBucket(rate=1, burst=1, max_delay=0.5)
+
+    run(async_acquire((agent, subnet)))
+    with pytest.raises(RateLimitExceeded):
+        run(async_acquire((agent, subnet)))
+
+    assert sleeps == []
+    assert (agent.dropped, subnet.dropped) == (0, 1)
+    assert agent.reserve() == pytest.approx(0.1)
+
+
+def test_acquire_without_buckets(sleeps):
+    assert run(async_acquire(())) == 0.0
+    assert sleeps == []
+
+
+def test_rate_limiter_shares_subnet_buckets():
+    rate_limiter = RateLimiter()
+
+    printer_agent, printer_subnet = rate_limiter.buckets_for(('192.168.1.10', 161))
+    router_agent, router_subnet = rate_limiter.buckets_for(('192.168.1.1', 161))
+    host_buckets = rate_limiter.buckets_for(('printer.local', 161))
+
+    assert printer_agent is not router_agent
+    assert printer_subnet is router_subnet
+    assert len(host_buckets) == 1
+
+
+def test_rate_limiter_release_relaxes_limits():
+    rate_limiter = RateLimiter()
+    default_rate = rate_limiter.buckets_for(('192.168.1.10', 161))[0].rate
+
+    agent, _ = rate_limiter.buckets_for(('192.168.1.10', 161), {CONF_RATE: default_rate / 2})
+    assert agent.rate == default_rate / 2
+
+    rate_limiter.release(('192.168.1.10', 161))
+    assert agent.rate == default_rate
@@ -0,0 +1,104 @@
+"""Tests for row storage of retrieved data."""
+from custom_components.snmp_device import rows
+from custom_components.snmp_device.rows import ChunkedWalk, Table, diff_snapshots, make_row_type
+
+SupplyRow = make_row_type('SupplyRow', ('description', 'level'))
+InfoRow = make_row_type('InfoRow', ('model', 'mileage'))
+
+
+def test_diff_snapshots_without_previous_data():
+    new_data = {
+        'supplies': Table((1, 2), (SupplyRow('Black', 50), SupplyRow('Cyan', 20))),
+        'info': InfoRow('LaserJet', 1000),
+    }
+
+    assert diff_snapshots(None, new_data) == {
+        ('supplies', 1), ('supplies', 2), ('info', 'model'), ('info', 'mileage')
+    }
+
+
+def test_diff_snapshots_identical_data():
+    supplies = Table((1, 2), (SupplyRow('Black', 50), SupplyRow('Cyan', 20)))
+    old_data = {'supplies': supplies, 'info': InfoRow('LaserJet', 1000)}
+    new_data = {'supplies': Table(supplies.indexes, supplies.rows), 'info': InfoRow('LaserJet', 1000)}
+
+    assert diff_snapshots(old_data, new_data) == set()
+
+
+def test_diff_snapshots_changed_rows_and_columns():
+    old_data = {
+        'supplies': Table((1, 2), (SupplyRow('Black', 50), SupplyRow('Cyan', 20))),
+        'info': InfoRow('LaserJet', 1000),
+    }
+    new_data = {
+        'supplies': Table((1, 2), (SupplyRow('Black', 49), SupplyRow('Cyan', 20))),
+        'info': InfoRow('LaserJet', 1010),
+    }
+
+    assert diff_snapshots(old_data, new_data) == {('supplies', 1), ('info', 'mileage')}
+
+
+def test_diff_snapshots_added_and_removed_rows():
+    old_data = {'supplies': Table((1, 2), (SupplyRow('Black', 50), SupplyRow('Cyan', 20)))}
+    new_data = {'supplies': Table((1, 3), (SupplyRow('Black', 50), SupplyRow('Magenta', 80)))}
+
+    assert diff_snapshots(old_data, new_data) == {('supplies', 2), ('supplies', 3)}
+
+
+def test_diff_snapshots_changed_row_type():
+    OtherInfoRow = make_row_type('OtherInfoRow', ('model', 'mileage'))
+
+    assert diff_snapshots({'info': InfoRow('LaserJet', 1000)}, {'info': OtherInfoRow('LaserJet', 1000)}) == {
+        ('info', 'model'), ('info', 'mileage')
+    }
+
+
+def _walk_rows(chunked_walk, indexes):
+    for index in indexes:
+        chunked_walk.update(index, SupplyRow('Supply %d' % index, index), [(1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 6, index)])
+
+
+def test_chunked_walk_first_pass_is_unbounded():
+    chunked_walk = ChunkedWalk(max_rows=2)
+    assert chunked_walk.row_limit is None
+
+    _walk_rows(chunked_walk, (1, 2, 3))
+    chunked_walk.finish_pass()
+
+    assert chunked_walk.row_limit == 2
+    assert chunked_walk.position is None
+    assert chunked_walk.table().indexes == (1, 2, 3)
+
+
+def test_chunked_walk_keeps_rows_between_chunks():
+    chunked_walk = ChunkedWalk(max_rows=2)
+    _walk_rows(chunked_walk, (1, 2, 3))
+    chunked_walk.finish_pass()
+
+    _walk_rows(chunked_walk, (3, 2))
+    assert chunked_walk.position == [(1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 6, 2)]
+    assert chunked_walk.table().indexes == (1, 2, 3)
+
+
+def test_chunked_walk_drops_rows_missing_from_pass():
+    chunked_walk = ChunkedWalk(max_rows=2)
+    _walk_rows(chunked_walk, (1, 2, 3))
+    chunked_walk.finish_pass()
+
+    _walk_rows(chunked_walk, (1, 3))
+    chunked_walk.finish_pass()
+
+    assert chunked_walk.table().indexes == (1, 3)
+    assert chunked_walk.passes == 2
+
+
+def test_chunked_walk_row_ages(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rows, 'monotonic', lambda: now[0])
+    chunked_walk = ChunkedWalk(max_rows=2)
+    _walk_rows(chunked_walk, (1, 2))
+    now[0] = 130.0
+    _walk_rows(chunked_walk, (2,))
+    now[0] = 160.0
+
+    assert chunked_walk.row_ages() == {1: 60.0, 2: 30.0}